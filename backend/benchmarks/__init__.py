@@ -0,0 +1 @@
+# Benchmark suite: load tests and micro-benchmarks run against an offline Gemini stand-in
@@ -0,0 +1,107 @@
+"""Offline stand-in for ``google.generativeai`` used by the benchmarks.
+
+``install()`` swaps ``genai.configure``/``genai.GenerativeModel`` so the real
+``GeminiService``/``GeminiBackend`` code paths (prompt building, JSON parsing,
+validation, metrics) run unchanged while responses come from this module with
+a configurable latency and streaming rate.
+"""
+import json
+import os
+import time
+from typing import Iterator
+
+CAREER_RESPONSE = {
+    "recommended_careers": [
+        {
+            "title": "Data Analyst",
+            "industry": "Technology",
+            "skill_match_score": 0.82,
+            "interest_alignment_score": 0.74,
+            "overall_score": 0.79,
+            "description": "Turn raw data into business insight",
+            "required_skills": ["SQL", "Python", "Statistics"],
+            "growth_potential": "High",
+            "salary_range": "$55,000 - $95,000",
+        },
+        {
+            "title": "Software Developer",
+            "industry": "Technology",
+            "skill_match_score": 0.78,
+            "interest_alignment_score": 0.7,
+            "overall_score": 0.75,
+            "description": "Develop and maintain software applications",
+            "required_skills": ["Programming", "Problem Solving"],
+            "growth_potential": "High",
+            "salary_range": "$60,000 - $120,000",
+        },
+    ],
+    "career_progression_path": {"short_term": ["Certification"], "long_term": ["Team Lead"]},
+    "skill_development_plan": {"priority_skills": ["SQL"], "learning_resources": ["Courses"], "timeline": "6 months"},
+    "market_trend_analysis": {"industry_trends": ["AI"], "demand_forecast": "High", "emerging_roles": ["ML Engineer"]},
+    "rationale": "Benchmark response",
+}
+
+APTITUDE_RESPONSE = {
+    "logical_reasoning": 70.0,
+    "verbal_ability": 65.0,
+    "numerical_ability": 80.0,
+    "spatial_reasoning": 55.0,
+    "analytical_thinking": 75.0,
+}
+
+CHAT_RESPONSE = (
+    "Based on your profile, a role in data analytics would build on your numerical strengths. "
+    "Start with SQL and spreadsheet modelling, then add Python for automation and statistics. "
+    "A portfolio of two or three small projects is usually enough to land interviews."
+)
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Mimics ``genai.GenerativeModel.generate_content`` for streaming and non-streaming calls"""
+
+    latency = 0.5
+    stream_chunk_chars = 12
+    stream_chunks_per_second = 50.0
+
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream(CHAT_RESPONSE)
+        time.sleep(self.latency)
+        return FakeResponse(json.dumps(self._response_for(str(prompt))))
+
+    def _stream(self, text: str) -> Iterator[FakeResponse]:
+        # Time to first token is modelled as a fraction of the full latency
+        time.sleep(self.latency / 4)
+        delay = 1.0 / self.stream_chunks_per_second if self.stream_chunks_per_second > 0 else 0.0
+        for start in range(0, len(text), self.stream_chunk_chars):
+            if delay:
+                time.sleep(delay)
+            yield FakeResponse(text[start:start + self.stream_chunk_chars])
+
+    @staticmethod
+    def _response_for(prompt: str):
+        if "aptitude test evaluator" in prompt:
+            return APTITUDE_RESPONSE
+        return CAREER_RESPONSE
+
+
+def install(latency: float = 0.5, stream_chunks_per_second: float = 50.0, stream_chunk_chars: int = 12) -> None:
+    """Route every ``GeminiService`` created from now on to the fake model"""
+    import google.generativeai as genai
+
+    # GeminiBackend only builds a model when a key is configured
+    os.environ["LLM_BACKEND"] = "gemini"
+    os.environ["GEMINI_API_KEY"] = "offline-benchmark"
+    FakeGenerativeModel.latency = latency
+    FakeGenerativeModel.stream_chunks_per_second = stream_chunks_per_second
+    FakeGenerativeModel.stream_chunk_chars = stream_chunk_chars
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
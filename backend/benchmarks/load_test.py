@@ -0,0 +1,250 @@
+"""End-to-end load test against the FastAPI app from ``main.py``.
+
+The app is served by uvicorn on a local port with a throwaway SQLite database
+and the offline Gemini stand-in, then driven by concurrent virtual users that
+register, log in and run a weighted mix of assessment, skill evaluation,
+recommendation, listing and chat traffic.
+
+    cd backend
+    python -m benchmarks.load_test --users 20 --duration 30 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+DEFAULT_MIX = {
+    "submit_aptitude": 8,
+    "submit_interest": 6,
+    "submit_personality": 6,
+    "evaluate_skills": 15,
+    "generate_recommendations": 10,
+    "list_recommendations": 15,
+    "list_assessments": 15,
+    "profile": 15,
+    "chat": 10,
+}
+
+APTITUDE_QUESTIONS = [
+    {"id": i, "category": category, "question": f"Question {i}", "options": ["A", "B", "C", "D"], "correct": i % 4}
+    for i, category in enumerate(
+        ["logical_reasoning", "verbal_ability", "numerical_ability", "spatial_reasoning", "analytical_thinking"] * 4,
+        start=1,
+    )
+]
+
+# Item ids of the interest and personality instruments (GET /api/assessments/instruments/{name})
+INTEREST_ITEMS = [f"{prefix}{n}" for prefix in ("T", "B", "H", "ED", "A", "S", "EN", "SW") for n in (1, 2, 3)]
+PERSONALITY_ITEMS = [f"{trait}{n}" for trait in "EACNO" for n in (1, 2, 3, 4)]
+SKILLS = {
+    "technical_skills": ["Python", "SQL", "JavaScript", "Data Analysis", "Cloud", "Machine Learning"],
+    "soft_skills": ["Communication", "Leadership", "Teamwork", "Problem Solving"],
+    "industry_skills": ["Finance", "Healthcare IT", "E-commerce"],
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.time_to_first_chunk: List[float] = []
+
+    def record(self, operation: str, elapsed: float, status_code: int) -> None:
+        if status_code >= 400:
+            self.errors[operation][str(status_code)] += 1
+        else:
+            self.latencies[operation].append(elapsed)
+
+
+def prepare_environment(args):
+    """Point the app at a temporary database and the fake Gemini before ``main`` is imported"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="career-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["USE_FIREBASE"] = "false"
+    if not args.keep_rate_limits:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    if args.llm_backend == "fake":
+        from benchmarks import fake_gemini
+
+        fake_gemini.install(latency=args.llm_latency, stream_chunks_per_second=args.stream_rate)
+    else:
+        os.environ["LLM_BACKEND"] = args.llm_backend
+
+    import main
+
+    return main.app, db_path
+
+
+def start_server(app, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request_for(operation: str, rng: random.Random):
+    """Return (method, path, json body) for a traffic-mix operation"""
+    if operation == "submit_aptitude":
+        answers = {str(q["id"]): rng.randrange(4) for q in APTITUDE_QUESTIONS}
+        return "POST", "/api/assessments", {"assessment_type": "aptitude", "questions": APTITUDE_QUESTIONS, "answers": answers}
+    if operation == "submit_interest":
+        answers = {item_id: rng.randint(1, 5) for item_id in INTEREST_ITEMS}
+        return "POST", "/api/assessments", {"assessment_type": "interest", "answers": answers}
+    if operation == "submit_personality":
+        answers = {item_id: rng.randint(1, 5) for item_id in PERSONALITY_ITEMS}
+        return "POST", "/api/assessments", {"assessment_type": "personality", "answers": answers}
+    if operation == "evaluate_skills":
+        body = {group: {skill: rng.randint(1, 5) for skill in skills} for group, skills in SKILLS.items()}
+        return "POST", "/api/skills/evaluate", body
+    if operation == "generate_recommendations":
+        return "POST", "/api/recommendations/generate", None
+    if operation == "list_recommendations":
+        return "GET", "/api/recommendations", None
+    if operation == "list_assessments":
+        return "GET", "/api/assessments", None
+    if operation == "profile":
+        return "GET", "/api/users/profile", None
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+async def virtual_user(client, index: int, deadline: float, mix: Dict[str, int], recorder: Recorder, seed: int):
+    rng = random.Random(seed + index)
+    email = f"bench-{seed}-{index}@example.com"
+    password = "benchmark-password"
+
+    start = time.perf_counter()
+    response = await client.post("/api/users/register", json={"email": email, "password": password, "full_name": f"Bench User {index}"})
+    recorder.record("register", time.perf_counter() - start, response.status_code)
+
+    start = time.perf_counter()
+    response = await client.post("/api/users/login", json={"email": email, "password": password})
+    recorder.record("login", time.perf_counter() - start, response.status_code)
+    if response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == "chat":
+            status_code = await _chat(client, headers, recorder, start)
+        else:
+            method, path, body = _request_for(operation, rng)
+            response = await client.request(method, path, json=body, headers=headers)
+            status_code = response.status_code
+        recorder.record(operation, time.perf_counter() - start, status_code)
+
+
+async def _chat(client, headers, recorder: Recorder, start: float) -> int:
+    body = {"message": "Which careers suit someone who enjoys statistics?"}
+    async with client.stream("POST", "/api/chat/stream", json=body, headers=headers) as response:
+        first = True
+        async for _ in response.aiter_raw():
+            if first:
+                recorder.time_to_first_chunk.append(time.perf_counter() - start)
+                first = False
+        return response.status_code
+
+
+async def run_load(base_url: str, args) -> Dict:
+    import httpx
+
+    mix = dict(DEFAULT_MIX)
+    for override in args.mix or []:
+        name, _, weight = override.partition("=")
+        mix[name] = int(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, i, deadline, mix, recorder, args.seed) for i in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+
+    from benchmarks.report import summarize_latencies
+
+    operations = {name: summarize_latencies(values) for name, values in sorted(recorder.latencies.items())}
+    total_ok = sum(len(values) for values in recorder.latencies.values())
+    total_errors = sum(sum(codes.values()) for codes in recorder.errors.values())
+    return {
+        "config": {
+            "users": args.users,
+            "duration_s": args.duration,
+            "llm_backend": args.llm_backend,
+            "llm_latency_s": args.llm_latency,
+            "stream_chunks_per_second": args.stream_rate,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "elapsed_s": elapsed,
+        "requests": total_ok + total_errors,
+        "errors": {name: dict(codes) for name, codes in recorder.errors.items()},
+        "throughput_rps": (total_ok + total_errors) / elapsed if elapsed else 0.0,
+        "chat_time_to_first_chunk": summarize_latencies(recorder.time_to_first_chunk),
+        "operations": operations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the career guidance API with an offline Gemini stand-in")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic after login")
+    parser.add_argument("--llm-backend", default="fake", choices=["fake", "local", "openai_compatible"],
+                        help="fake: Gemini code path with the offline stand-in; otherwise an LLM_BACKEND value")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake Gemini response latency in seconds")
+    parser.add_argument("--stream-rate", type=float, default=50.0, help="Fake Gemini streamed chunks per second")
+    parser.add_argument("--mix", action="append", metavar="OP=WEIGHT", help="Override a traffic mix weight, e.g. chat=30")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Leave per-user rate limiting enabled")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    app, db_path = prepare_environment(args)
+    port = _free_port()
+    server, thread = start_server(app, port)
+    try:
+        results = asyncio.run(run_load(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    from benchmarks.report import print_table, save_results
+
+    print(f"\n{results['requests']} requests in {results['elapsed_s']:.1f}s "
+          f"({results['throughput_rps']:.1f} req/s), errors: {results['errors'] or 'none'}\n")
+    print_table(results["operations"], ["count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    ttfc = results["chat_time_to_first_chunk"]
+    if ttfc["count"]:
+        print(f"\nchat time to first chunk: p50 {ttfc['p50_ms']:.1f} ms, p95 {ttfc['p95_ms']:.1f} ms")
+    print(f"\nResults written to {save_results('load', results, args.output)}")
+    print(f"Database: {db_path}")
+
+
+if __name__ == "__main__":
+    main()
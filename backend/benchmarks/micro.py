@@ -0,0 +1,97 @@
+"""Micro-benchmarks for scoring, gap analysis and response serialization.
+
+    cd backend
+    python -m benchmarks.micro --repeat 5
+"""
+import argparse
+import os
+import statistics
+import timeit
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+from benchmarks.load_test import APTITUDE_QUESTIONS, INTEREST_ITEMS, PERSONALITY_ITEMS, SKILLS
+
+
+def _benchmarks() -> Dict[str, Callable[[], object]]:
+    from schemas import AssessmentResponse, CareerRecommendationResponse, SkillEvaluationCreate
+    from services.assessment_service import AssessmentService
+    from services.psychometrics import get_instrument
+    from services.skill_evaluation_service import SkillEvaluationService
+    from benchmarks.fake_gemini import CAREER_RESPONSE
+
+    # Scoring and gap analysis do not touch the session
+    assessment_service = AssessmentService(db=None)
+    skill_service = SkillEvaluationService(db=None)
+
+    aptitude_answers = {str(q["id"]): q["id"] % 3 for q in APTITUDE_QUESTIONS}
+    interest_answers = {item_id: (i % 5) + 1 for i, item_id in enumerate(INTEREST_ITEMS)}
+    personality_answers = {item_id: (i % 5) + 1 for i, item_id in enumerate(PERSONALITY_ITEMS)}
+    personality_batch = [{item_id: (i + j) % 5 + 1 for i, item_id in enumerate(PERSONALITY_ITEMS)} for j in range(100)]
+    skills = SkillEvaluationCreate(**{
+        group: {f"{skill} {n}": (n % 5) + 1 for n in range(10) for skill in names}
+        for group, names in SKILLS.items()
+    })
+
+    now = datetime.now(timezone.utc)
+    assessment_row = {
+        "id": 1, "user_id": 1, "assessment_type": "aptitude", "questions": APTITUDE_QUESTIONS,
+        "scores": {"logical_reasoning": 70.0, "verbal_ability": 60.0}, "total_score": 65.0, "completed_at": now,
+    }
+    recommendation_row = {
+        "id": 1, "user_id": 1, "skill_match_score": 0.6, "interest_alignment_score": 0.4,
+        "overall_recommendation_score": 0.52, "generated_at": now, **CAREER_RESPONSE,
+    }
+
+    return {
+        "calculate_scores.aptitude_rule_based": lambda: assessment_service._fallback_rule_based(aptitude_answers, APTITUDE_QUESTIONS),
+        "calculate_scores.interest": lambda: assessment_service.calculate_scores("interest", interest_answers),
+        "calculate_scores.personality": lambda: assessment_service.calculate_scores("personality", personality_answers),
+        "psychometrics.personality_batch_100": lambda: get_instrument("personality").score_many(personality_batch),
+        "analyze_skill_gaps": lambda: skill_service.analyze_skill_gaps(skills),
+        "serialize.assessment_response": lambda: AssessmentResponse.model_validate(assessment_row).model_dump_json(),
+        "serialize.recommendation_response": lambda: CareerRecommendationResponse.model_validate(recommendation_row).model_dump_json(),
+        "serialize.recommendation_list_20": lambda: [
+            CareerRecommendationResponse.model_validate(recommendation_row).model_dump_json() for _ in range(20)
+        ],
+    }
+
+
+def run(repeat: int, min_time: float, only: str | None = None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, func in _benchmarks().items():
+        if only and only not in name:
+            continue
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        # Scale the loop count so each repeat runs for at least ``min_time``
+        number = max(number, int(number * min_time / 0.2))
+        per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+        results[name] = {
+            "loops": number,
+            "best_us": min(per_call) * 1e6,
+            "mean_us": statistics.mean(per_call) * 1e6,
+            "stdev_us": (statistics.stdev(per_call) * 1e6) if len(per_call) > 1 else 0.0,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scoring and serialization micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--only", help="Run benchmarks whose name contains this string")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/micro-<timestamp>.json)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    results = run(args.repeat, args.min_time, args.only)
+
+    from benchmarks.report import print_table, save_results
+
+    print_table(results, ["loops", "best_us", "mean_us", "stdev_us"])
+    print(f"\nResults written to {save_results('micro', {'operations': results}, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Result summaries, JSON persistence and run-to-run comparison for the benchmarks"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": (sum(values) / len(values) * 1000.0) if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000.0,
+        "p95_ms": percentile(values, 95) * 1000.0,
+        "p99_ms": percentile(values, 99) * 1000.0,
+        "max_ms": (values[-1] * 1000.0) if values else 0.0,
+    }
+
+
+def save_results(kind: str, results: Dict[str, Any], output: str | None = None) -> str:
+    """Write results with run metadata to ``output`` or ``benchmarks/results/<kind>-<timestamp>.json``"""
+    payload = {
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{kind}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    return output
+
+
+def print_table(rows: Dict[str, Dict[str, Any]], columns: List[str]) -> None:
+    name_width = max([len(name) for name in rows] + [10]) + 2
+    print(f"{'name':<{name_width}}" + "".join(f"{col:>12}" for col in columns))
+    for name, stats in rows.items():
+        cells = "".join(
+            f"{stats.get(col, 0):>12}" if isinstance(stats.get(col, 0), int) else f"{stats.get(col, 0):>12.2f}"
+            for col in columns
+        )
+        print(f"{name:<{name_width}}{cells}")
+
+
+def compare(baseline_path: str, candidate_path: str, metric: str) -> None:
+    """Print the relative change of ``metric`` for every operation present in both runs"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(candidate_path) as f:
+        candidate = json.load(f)["results"]
+
+    base_ops = baseline.get("operations", baseline)
+    cand_ops = candidate.get("operations", candidate)
+    print(f"{'operation':<32}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name in sorted(set(base_ops) & set(cand_ops)):
+        old = base_ops[name].get(metric)
+        new = cand_ops[name].get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100.0
+        print(f"{name:<32}{old:>12.3f}{new:>12.3f}{change:>+9.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", help="Field to compare, e.g. p50_ms, p95_ms, mean_us")
+    args = parser.parse_args()
+    compare(args.baseline, args.candidate, args.metric)
@@ -0,0 +1,43 @@
+"""Conditional GET support (ETag / If-None-Match).
+
+Read endpoints compute a validator from cheap version data (row counts, max
+ids and timestamps) before loading or serializing anything. When the client's
+``If-None-Match`` matches, the handler returns ``not_modified`` and the body is
+never built. Responses are per user, so they are marked ``private`` and vary
+on ``Authorization``; ``no-cache`` makes clients revalidate on every use.
+"""
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+
+CACHE_HEADERS = {
+    "Cache-Control": "private, no-cache",
+    "Vary": "Authorization",
+}
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak validator from version parts; weak because bodies are re-encoded, not byte-identical"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers.update(CACHE_HEADERS)
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from fastapi import Request
 import os
+import threading
+import time
+from typing import Any, Callable, Dict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,16 +18,253 @@ load_dotenv()
 # You can override with Oracle by setting DATABASE_URL in .env
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./career.db")
 
-# For SQLite, need connect_args; for others it's ignored
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def pool_profile(url: str) -> str:
+    """``oracle`` (tuned production pool) for Oracle URLs, else ``default``; DB_POOL_PROFILE overrides"""
+    return os.getenv("DB_POOL_PROFILE") or ("oracle" if make_url(url).get_backend_name() == "oracle" else "default")
+
+
+def engine_options(url: str, profile: str | None = None) -> Dict[str, Any]:
+    """Keyword arguments for ``create_engine(url)``.
+
+    The ``oracle`` profile sizes and recycles the pool from DB_POOL_* settings;
+    on Oracle it also sets the statement cache and fetch array size, and with
+    ORACLE_DRIVER_POOL=true hands pooling to an oracledb session pool. The
+    profile can be applied to a file SQLite URL to exercise the pool settings
+    locally. Nothing here connects.
+    """
+    parsed = make_url(url)
+    profile = profile or pool_profile(url)
+    backend = parsed.get_backend_name()
+    options: Dict[str, Any] = {}
+    # For SQLite, need connect_args; for others it's ignored
+    if backend == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if profile != "oracle":
+        return options
+
+    pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    recycle = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    timeout = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    if backend == "oracle":
+        options["arraysize"] = int(os.getenv("ORACLE_ARRAYSIZE", "500"))
+        stmt_cache_size = int(os.getenv("ORACLE_STMT_CACHE_SIZE", "50"))
+        if os.getenv("ORACLE_DRIVER_POOL", "false").lower() == "true":
+            # oracledb owns the sessions (min/max/increment, lifetime, liveness pings);
+            # SQLAlchemy opens and closes handles to it per checkout
+            driver_pool = _driver_pool_factory(parsed, {
+                "min": pool_size,
+                "max": pool_size + max_overflow,
+                "increment": 1,
+                "max_lifetime_session": recycle,
+                "wait_timeout": int(timeout * 1000),
+                "ping_interval": 60,
+                "stmtcachesize": stmt_cache_size,
+            })
+            options.update(creator=lambda: driver_pool().acquire(), poolclass=NullPool)
+            return options
+        options["connect_args"] = {"stmtcachesize": stmt_cache_size}
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a singleton pool that takes no sizing
+        return options
+    options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=recycle,
+        pool_timeout=timeout,
+        pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        pool_use_lifo=True,  # Idle connections beyond the steady load age out via recycle
+    )
+    return options
+
+
+def _driver_pool_factory(url: URL, params: Dict[str, Any]) -> Callable[[], Any]:
+    """Lazily created oracledb.ConnectionPool for ``url`` (the driver is optional).
+
+    The pool belongs to the process that created it: a forked worker builds its
+    own on first use instead of sharing the parent's sessions and sockets.
+    """
+    pool = None
+    owner_pid = None
+    lock = threading.Lock()
+
+    def get_pool():
+        nonlocal pool, owner_pid
+        with lock:
+            if pool is None or owner_pid != os.getpid():
+                import oracledb
+                # Same reading of the URL as SQLAlchemy's oracle dialect: the path is a SID,
+                # ?service_name=... names a service, a bare host is a TNS alias
+                if url.query.get("service_name"):
+                    dsn = oracledb.makedsn(url.host, url.port or 1521, service_name=url.query["service_name"])
+                elif url.database:
+                    dsn = oracledb.makedsn(url.host, url.port or 1521, sid=url.database)
+                else:
+                    dsn = url.host
+                pool = oracledb.create_pool(
+                    user=url.username, password=url.password, dsn=dsn, getmode=oracledb.POOL_GETMODE_TIMEDWAIT, **params
+                )
+                owner_pid = os.getpid()
+                driver_pools[url.render_as_string()] = pool
+            return pool
+
+    def reset():
+        nonlocal pool, owner_pid, lock
+        # Dropped, not closed: closing would log off sessions the parent still uses
+        pool, owner_pid, lock = None, None, threading.Lock()
+
+    _driver_pool_resets.append(reset)
+    return get_pool
+
+
+# oracledb session pools in use by engine URL, reported by pool_stats()
+driver_pools: Dict[str, Any] = {}
+_driver_pool_resets: list = []
+
+
+def reset_driver_pools() -> None:
+    """Forget oracledb pools inherited from a parent process (call in a forked worker)"""
+    for reset in _driver_pool_resets:
+        reset()
+    driver_pools.clear()
+
+
+def create_tuned_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    key = engine.url.render_as_string()
+    connections_opened.setdefault(key, 0)
+
+    @event.listens_for(engine, "connect")
+    def _count_connect(dbapi_connection, connection_record):
+        connections_opened[key] += 1
+
+    return engine
+
+
+# Connections SQLAlchemy's pool opened per engine URL; a steadily rising count means the pool churns
+connections_opened: Dict[str, int] = {}
+
+engine = create_tuned_engine(DATABASE_URL)
+
+
+def _read_database_url() -> str | None:
+    """READ_DATABASE_URL (e.g. an Oracle standby), or a read-only URI to the same SQLite file"""
+    url = os.getenv("READ_DATABASE_URL")
+    if url:
+        return url
+    if os.getenv("SQLITE_READ_ONLY_POOL", "false").lower() == "true" and DATABASE_URL.startswith("sqlite:///"):
+        path = DATABASE_URL.removeprefix("sqlite:///")
+        if path and path != ":memory:" and not path.startswith("file:"):
+            return f"sqlite:///file:{path}?mode=ro&uri=true"
+    return None
+
+
+# Reads of GET requests go here; the same engine as writes unless a read URL is configured
+READ_DATABASE_URL = _read_database_url()
+read_engine = create_tuned_engine(READ_DATABASE_URL) if READ_DATABASE_URL else engine
+
+
+def pool_stats() -> Dict[str, Dict[str, float]]:
+    """Connection counts per engine ("primary", "read") for the metrics endpoint"""
+    stats = {}
+    for name, bind in (("primary", engine), ("read", read_engine)):
+        if name == "read" and bind is engine:
+            continue
+        key = bind.url.render_as_string()
+        pool = bind.pool
+        driver_pool = driver_pools.get(key)
+        if driver_pool is not None:
+            stats[name] = {
+                "size": driver_pool.max,
+                "checked_out": driver_pool.busy,
+                "idle": driver_pool.opened - driver_pool.busy,
+                "overflow": 0,
+                "connections_opened": driver_pool.opened,
+            }
+        elif isinstance(pool, QueuePool):
+            stats[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "connections_opened": connections_opened.get(key, 0),
+            }
+    return stats
+
+
+class RoutingSession(Session):
+    """Session that sends reads to ``read_engine`` while ``info["read_only"]`` is set.
+
+    Flushes and DML always go to the primary, and once a session has written it
+    stays on the primary so it reads its own changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+        if self.info.get("read_only") and not self.info.get("wrote"):
+            return read_engine
+        return engine
+
+
+class ReadYourWrites:
+    """Pins a user's reads to the primary for a short while after they write, covering replica lag.
+
+    Pins are per worker process; a read landing on another worker can still hit
+    the replica within the window.
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+        self._pinned_until: dict = {}
+        self._lock = threading.Lock()
+
+    def pin(self, user_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._pinned_until[user_id] = now + self.window
+            if len(self._pinned_until) > 10000:
+                self._pinned_until = {key: until for key, until in self._pinned_until.items() if until > now}
+
+    def is_pinned(self, user_id: int) -> bool:
+        with self._lock:
+            until = self._pinned_until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+read_your_writes = ReadYourWrites()
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_writer(session):
+    if session.info.get("wrote") and session.info.get("user_id") is not None and read_engine is not engine:
+        read_your_writes.pin(session.info["user_id"])
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+
+def read_session() -> Session:
+    """Session for read-only work outside a request (exports, reports)"""
+    db = SessionLocal()
+    db.info["read_only"] = True
+    return db
+
+
+def bind_user(db: Session, user_id: int) -> None:
+    """Attach the authenticated user: their writes pin them to the primary, and a pinned user reads from it"""
+    db.info["user_id"] = user_id
+    if db.info.get("read_only") and read_your_writes.is_pinned(user_id):
+        db.info["read_only"] = False
+
+
+def get_db(request: Request):
     db = SessionLocal()
+    # GET/HEAD handlers read from the replica (if any); everything else uses the primary
+    db.info["read_only"] = request.method in ("GET", "HEAD")
     try:
         yield db
     finally:
@@ -0,0 +1,218 @@
+"""``Idempotency-Key`` support for expensive POST endpoints.
+
+The first request with a key claims it by inserting a ``pending``
+``IdempotencyRecord``; when its handler succeeds the response body is stored
+and the record marked ``done``. A retry with the same key and body gets the
+stored body back (``Idempotent-Replayed: true``) without running the handler,
+so no new rows and no Gemini calls. A retry that arrives while the first
+request is still running waits for its result: on an in-process event when
+both land on the same worker, otherwise by polling the record. Finished
+records are also kept in a small in-memory cache so most replays skip the
+database.
+
+Failed handlers release their claim, so the client can retry. A pending claim
+older than ``IDEMPOTENCY_LOCK_SECONDS`` (its worker died) can be taken over.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import engine
+from models import IdempotencyRecord
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.25
+PURGE_EVERY = 200  # Claims between deletes of expired records
+
+
+class IdempotencyStore:
+    def __init__(self):
+        self.ttl = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")) * 3600
+        self.lock_timeout = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+        self.wait_timeout = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+        self.cache_size = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024"))
+        # Finished records: record key -> (request hash, response body, expires_at)
+        self._done: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        # Requests running in this process: record key -> set when they finish
+        self._in_flight: Dict[str, asyncio.Event] = {}
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    async def run(
+        self,
+        request: Request,
+        response: Response,
+        user_id: int,
+        route: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run ``handler`` once per ``Idempotency-Key``; without the header it just runs"""
+        key = request.headers.get(HEADER)
+        if not key:
+            return await handler()
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{HEADER} is longer than {MAX_KEY_LENGTH} characters")
+
+        record_key = f"{user_id}:{route}:{key}"
+        request_hash = hashlib.sha256(json.dumps(jsonable_encoder(payload), sort_keys=True).encode("utf-8")).hexdigest()
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            stored = self._cached(record_key)
+            if stored is None:
+                event = self._in_flight.get(record_key)
+                if event is not None:
+                    # Same worker is already running this request
+                    await _wait(event, deadline - time.monotonic())
+                    stored = self._cached(record_key)
+                    if stored is None and time.monotonic() < deadline:
+                        continue
+            if stored is None:
+                claimed, stored = await run_in_threadpool(self._claim, record_key, request_hash)
+                if claimed:
+                    return await self._execute(record_key, request_hash, response, handler)
+            if stored is not None:
+                return self._replay(stored, request_hash, response)
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "5"},
+                )
+            # Another worker holds the claim; poll until it finishes or goes stale
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _execute(self, record_key: str, request_hash: str, response: Response, handler) -> Any:
+        event = asyncio.Event()
+        self._in_flight[record_key] = event
+        try:
+            try:
+                result = await handler()
+            except BaseException:
+                await run_in_threadpool(self._release, record_key)
+                raise
+            body = jsonable_encoder(result)
+            expires_at = await run_in_threadpool(self._complete, record_key, body)
+            self._remember(record_key, request_hash, body, expires_at)
+            return result
+        finally:
+            self._in_flight.pop(record_key, None)
+            event.set()
+
+    def _replay(self, stored: Tuple[str, Any], request_hash: str, response: Response) -> Any:
+        stored_hash, body = stored
+        if stored_hash != request_hash:
+            raise HTTPException(
+                # Literal: the constant was renamed (..._CONTENT) in newer Starlette and is deprecated under the old name
+                status_code=422,
+                detail=f"{HEADER} was already used with a different request body",
+            )
+        response.headers["Idempotent-Replayed"] = "true"
+        return body
+
+    def _cached(self, record_key: str) -> Tuple[str, Any] | None:
+        with self._lock:
+            entry = self._done.get(record_key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._done[record_key]
+                return None
+            self._done.move_to_end(record_key)
+            return entry[0], entry[1]
+
+    def _remember(self, record_key: str, request_hash: str, body: Any, expires_at: float) -> None:
+        with self._lock:
+            self._done[record_key] = (request_hash, body, expires_at)
+            while len(self._done) > self.cache_size:
+                self._done.popitem(last=False)
+
+    def _claim(self, record_key: str, request_hash: str) -> Tuple[bool, Tuple[str, Any] | None]:
+        """(True, None) when this request now owns the key, (False, stored) when it has a result, else (False, None)"""
+        table = IdempotencyRecord.__table__
+        now = time.time()
+        self._purge_expired(now)
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(table).values(
+                    record_key=record_key, request_hash=request_hash, status="pending",
+                    claimed_at=now, expires_at=now + self.ttl
+                ))
+            return True, None
+        except IntegrityError:
+            pass
+
+        with engine.begin() as conn:
+            row = conn.execute(
+                select(table.c.request_hash, table.c.status, table.c.response_body, table.c.claimed_at, table.c.expires_at)
+                .where(table.c.record_key == record_key)
+            ).first()
+            if row is None:
+                # Released between our insert and select; claim again on the next pass
+                return False, None
+            if row.status == "done" and row.expires_at > now:
+                self._remember(record_key, row.request_hash, row.response_body, row.expires_at)
+                return False, (row.request_hash, row.response_body)
+            if row.status == "pending" and row.claimed_at > now - self.lock_timeout and row.expires_at > now:
+                return False, None
+            # Expired record or a claim abandoned by a dead worker: take it over (CAS on claimed_at)
+            result = conn.execute(
+                update(table)
+                .where(table.c.record_key == record_key, table.c.claimed_at == row.claimed_at)
+                .values(request_hash=request_hash, status="pending", response_body=None,
+                        claimed_at=now, expires_at=now + self.ttl)
+            )
+            return result.rowcount == 1, None
+
+    def _complete(self, record_key: str, body: Any) -> float:
+        table = IdempotencyRecord.__table__
+        expires_at = time.time() + self.ttl
+        with engine.begin() as conn:
+            conn.execute(
+                update(table).where(table.c.record_key == record_key)
+                .values(status="done", response_body=body, expires_at=expires_at)
+            )
+        return expires_at
+
+    def _release(self, record_key: str) -> None:
+        table = IdempotencyRecord.__table__
+        try:
+            with engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.record_key == record_key, table.c.status == "pending"))
+        except Exception as e:
+            # The claim goes stale after IDEMPOTENCY_LOCK_SECONDS anyway
+            logging.error(f"Could not release idempotency claim {record_key}: {e}")
+
+    def _purge_expired(self, now: float) -> None:
+        self._claims += 1
+        if self._claims % PURGE_EVERY:
+            return
+        table = IdempotencyRecord.__table__
+        with engine.begin() as conn:
+            result = conn.execute(delete(table).where(table.c.expires_at <= now))
+        if result.rowcount:
+            logging.info(f"Purged {result.rowcount} expired idempotency records")
+
+
+async def _wait(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout=max(timeout, 0))
+    except asyncio.TimeoutError:
+        pass
+
+
+idempotency_store = IdempotencyStore()
@@ -1,40 +1,105 @@
-from fastapi import FastAPI, HTTPException, Depends, status
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, BackgroundTasks, UploadFile, File, status
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import uvicorn
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import logging
 import os
 
 
-from database import get_db, engine, Base
+from database import get_db, bind_user, read_session, engine, read_engine, Base, SessionLocal
 from models import User, Assessment, CareerRecommendation, SkillEvaluation
 from schemas import (
     UserCreate, UserResponse, AssessmentCreate, AssessmentResponse,
     CareerRecommendationResponse, SkillEvaluationCreate, SkillEvaluationResponse,
-    LoginRequest
+    LoginRequest, ChatSessionCreate, ChatSessionResponse, ChatMessageResponse,
+    LatestRecommendationResponse, SkillGapReportRequest, VideoRecommendation
 )
 # Import services from their modules
 from services.user_service import UserService
 from services.assessment_service import AssessmentService
-from services.recommendation_service import RecommendationService
+from services.recommendation_service import RecommendationService, claim_regeneration, regenerate_recommendations
 from services.skill_evaluation_service import SkillEvaluationService
 from services.gemini_service import GeminiService
+from services.chat_service import ChatService
+from services.skill_gap_analyzer import role_profiles
+from services.export_service import ExportService, MEDIA_TYPES, DEFAULT_BATCH_SIZE, validate_export
+from services.user_import_service import UserImportService, read_rows
+from services.percentile_service import PercentileService, flush_score_sketches
+from services.archive_service import ArchiveService
+from services.psychometrics import get_instrument
+from services.video_service import VideoService, warm_career_videos
+from services.llm_backends import get_llm_backend
+from services.skill_normalizer import skill_index
 from firebase_admin_init import initialize_firebase_admin
+from rate_limiter import enforce_rate_limit, rate_limiter
+from metrics import MetricsMiddleware, instrument_engine, registry as metrics_registry
+from sql_profiler import SQLProfilerMiddleware, sql_profiler
+from tracing import TracedRoute, TracingMiddleware, traced, tracer
+from streaming import SSE_HEADERS, cancellable_stream, sse_chat_events, sse_events
+from conditional import etag_matches, make_etag, not_modified, set_etag
+from idempotency import idempotency_store
+from workloads import configure_crud_pool, llm_pool
 
 load_dotenv()
 initialize_firebase_admin() # Initialize Firebase Admin SDK only if USE_FIREBASE=true
 os.environ["GRPC_VERBOSITY"] = os.getenv("GRPC_VERBOSITY", "NONE")
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# create_all skips indexes on tables that already exist
+for index in [*CareerRecommendation.__table__.indexes, *Assessment.__table__.indexes]:
+    index.create(bind=engine, checkfirst=True)
+# Build percentile sketches from existing assessments the first time the app starts with them;
+# one worker claims the backfill, the rest start with whatever sketches exist
+with SessionLocal() as startup_db:
+    PercentileService(startup_db).rebuild_if_empty()
+for bind in {engine, read_engine}:
+    instrument_engine(bind)
+    sql_profiler.instrument(bind)
+    tracer.instrument(bind)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-worker warm-up: open a pooled DB connection and build the LLM backend
+    # in this process, then report ready
+    for bind in {engine, read_engine}:
+        with bind.connect():
+            pass
+    get_llm_backend()
+    skill_index.warm()
+    configure_crud_pool()
+    flusher = asyncio.create_task(flush_score_sketches_periodically())
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    flusher.cancel()
+    await run_in_threadpool(flush_score_sketches)
+    tracer.shutdown()
+
+async def flush_score_sketches_periodically():
+    interval = float(os.getenv("PERCENTILE_FLUSH_SECONDS", "5"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(flush_score_sketches)
+        except Exception as e:
+            logging.error(f"Score sketch flush failed: {e}")
 
 app = FastAPI(
     title="AI Career Guidance System",
     description="Comprehensive AI-driven career guidance and recommendation system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+# Times endpoint functions and response serialization separately for Server-Timing
+app.router.route_class = TracedRoute
 
 # CORS middleware
 app.add_middleware(
@@ -45,6 +110,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(SQLProfilerMiddleware)
+# Added last so it is outermost and its total covers the other middleware
+app.add_middleware(TracingMiddleware)
+
 security = HTTPBearer()
 
 # Dependency to get current user
@@ -52,6 +122,7 @@ from jose import jwt as jose_jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
 from datetime import datetime, timezone
 
+@traced("auth", "authenticate")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -72,6 +143,7 @@ async def get_current_user(
             if not user:
                 user_data = UserCreate(email=email, full_name=decoded_token.get('name', ''))
                 user = user_service.create_user_from_firebase(uid, user_data)
+            bind_user(db, user.id)
             return user
         except auth.InvalidIdTokenError:
             raise HTTPException(
@@ -96,12 +168,29 @@ async def get_current_user(
             user = db.query(User).filter(User.email == email).first()
             if not user:
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+            bind_user(db, user.id)
             return user
         except ExpiredSignatureError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+def _admin_emails() -> set:
+    return {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Dependency for organisation-level endpoints; admins are listed in ADMIN_EMAILS"""
+    if (current_user.email or "").lower() not in _admin_emails():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+def rate_limited(route_class: str):
+    """Dependency that authenticates the user and applies the per-user limit for ``route_class``"""
+    async def dependency(current_user: User = Depends(get_current_user)) -> User:
+        await enforce_rate_limit(current_user.id, route_class)
+        return current_user
+    return dependency
+
 # User endpoints
 @app.post("/api/users/register", response_model=UserResponse)
 async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
@@ -120,91 +209,418 @@ async def login_user(user_data: LoginRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/users/profile", response_model=UserResponse)
-async def get_user_profile(current_user: User = Depends(get_current_user)):
+async def get_user_profile(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    # The user row is already loaded for authentication, so this costs no extra query
+    etag = make_etag("profile", current_user.id, current_user.email, current_user.created_at, current_user.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return current_user
 
 # Assessment endpoints
 @app.post("/api/assessments", response_model=AssessmentResponse)
 async def create_assessment(
     assessment_data: AssessmentCreate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    assessment_service = AssessmentService(db)
-    return assessment_service.create_assessment(assessment_data, current_user.id)
+    async def create():
+        # Only aptitude scoring calls Gemini; interest and personality are scored locally
+        assessment_service = AssessmentService(db)
+        if assessment_data.assessment_type == "aptitude":
+            llm_pool.check_capacity()
+            await enforce_rate_limit(current_user.id, "assessment")
+            return await llm_pool.run(assessment_service.create_assessment, assessment_data, current_user.id)
+        try:
+            return assessment_service.create_assessment(assessment_data, current_user.id)
+        except ValueError as e:
+            # Answers in a shape the instrument doesn't accept
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await idempotency_store.run(request, response, current_user.id, "assessments", assessment_data, create)
+
+@app.get("/api/assessments/instruments/{name}")
+async def get_instrument_items(name: str):
+    """Items of the interest or personality instrument; answer with ``{item_id: response}``"""
+    try:
+        return get_instrument(name).describe()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 @app.get("/api/assessments/{assessment_id}", response_model=AssessmentResponse)
 async def get_assessment(
     assessment_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     assessment_service = AssessmentService(db)
-    return assessment_service.get_assessment(assessment_id, current_user.id)
+    version = assessment_service.assessment_version(assessment_id, current_user)
+    if version is not None:
+        etag = make_etag("assessment", *version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        return assessment_service.get_assessment(assessment_id, current_user.id)
+    # Not in the hot table: it may have been moved to the archive
+    archived = ArchiveService(db).archived_assessment(assessment_id, current_user.id)
+    if archived is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Assessment not found")
+    return PercentileService(db).attach_percentiles([archived], current_user)[0]
 # List assessments for current user (used by dashboard)
 @app.get("/api/assessments", response_model=list[AssessmentResponse])
 async def list_assessments(
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # Percentiles are part of the body; the version carries a coarse sketch epoch for them
+    version = AssessmentService(db).list_version(current_user)
+    if include_archived:
+        version += ArchiveService(db).archive_version("assessments", current_user.id)
+    etag = make_etag("assessments", include_archived, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     assessments = (
         db.query(Assessment)
         .filter(Assessment.user_id == current_user.id)
         .order_by(Assessment.completed_at.desc())
         .all()
     )
-    return [AssessmentResponse.model_validate(a) for a in assessments]
+    responses = [AssessmentResponse.model_validate(a) for a in assessments]
+    if include_archived:
+        responses += ArchiveService(db).archived_assessments(current_user.id)
+    return PercentileService(db).attach_percentiles(responses, current_user)
 
 # Skill evaluation endpoints
 @app.post("/api/skills/evaluate", response_model=SkillEvaluationResponse)
 async def evaluate_skills(
     skill_data: SkillEvaluationCreate,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    async def evaluate():
+        skill_service = SkillEvaluationService(db)
+        try:
+            return skill_service.evaluate_skills(skill_data, current_user.id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await idempotency_store.run(request, response, current_user.id, "skills/evaluate", skill_data, evaluate)
+
+@app.get("/api/skills/roles")
+async def list_skill_roles():
+    """Role requirement profiles available as gap-analysis targets"""
+    return [profile.to_dict() for profile in role_profiles().values()]
+
+@app.get("/api/skills/gaps")
+async def get_skill_gaps(
+    role: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    skill_service = SkillEvaluationService(db)
-    return skill_service.evaluate_skills(skill_data, current_user.id)
+    try:
+        return SkillEvaluationService(db).analyze_user_gaps(current_user.id, role)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@app.post("/api/admin/skills/gap-report")
+async def skill_gap_report(
+    report_request: SkillGapReportRequest,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Organisation-level training needs for one role across many users"""
+    try:
+        return SkillEvaluationService(db).gap_report(report_request.role, report_request.user_ids, report_request.top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 # Career recommendation endpoints
 @app.post("/api/recommendations/generate", response_model=CareerRecommendationResponse)
 async def generate_recommendations(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    recommendation_service = RecommendationService(db)
-    return recommendation_service.generate_recommendations(current_user.id)
+    async def generate():
+        # Limited inside the idempotent call so replayed retries don't spend tokens
+        llm_pool.check_capacity()
+        await enforce_rate_limit(current_user.id, "recommendations")
+        recommendation_service = RecommendationService(db)
+        recommendation = await llm_pool.run(recommendation_service.generate_recommendations, current_user.id)
+        attach_videos([recommendation], background_tasks, db)
+        return recommendation
+
+    return await idempotency_store.run(request, response, current_user.id, "recommendations/generate", None, generate)
+
+@app.post("/api/recommendations/stream")
+async def stream_recommendations(
+    request: Request,
+    current_user: User = Depends(rate_limited("recommendations"))
+):
+    """Generate recommendations as Server-Sent Events.
+
+    A ``career`` event is sent as soon as each recommended career is decoded
+    from the model's output; the stored result follows as a ``recommendation``
+    event (the same body as ``/api/recommendations/generate``).
+    """
+    user_id = current_user.id
+    llm_pool.check_capacity()
+
+    def events():
+        # Own session: the stream outlives the request's dependency scope
+        with SessionLocal() as stream_db:
+            for kind, data in RecommendationService(stream_db).stream_recommendations(user_id):
+                if kind == "recommendation":
+                    VideoService(stream_db).attach_cached([data])
+                    data = data.model_dump(mode="json")
+                yield kind, data
+
+    return StreamingResponse(sse_events(request, events, pool=llm_pool), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/recommendations/latest", response_model=LatestRecommendationResponse)
+async def get_latest_recommendation(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stale-while-revalidate: return the stored recommendation at once and
+    refresh it in the background when the user's inputs have changed"""
+    latest = RecommendationService(db).get_latest_recommendation(current_user.id)
+    if latest.status != "fresh" and not latest.regenerating:
+        # Background refreshes draw from the same bucket as explicit generation, without queueing,
+        # and are skipped while the LLM pool is saturated
+        allowed = llm_pool.has_capacity() and (
+            not rate_limiter.enabled or await rate_limiter.acquire(current_user.id, "recommendations", wait=False) <= 0
+        )
+        if allowed and claim_regeneration(current_user.id):
+            background_tasks.add_task(llm_pool.run, regenerate_recommendations, current_user.id, shed=False)
+            latest.regenerating = True
+    if latest.recommendation:
+        attach_videos([latest.recommendation], background_tasks, db)
+    return latest
 
 @app.get("/api/recommendations", response_model=list[CareerRecommendationResponse])
 async def get_recommendations(
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     recommendation_service = RecommendationService(db)
-    return recommendation_service.get_user_recommendations(current_user.id)
+    version = recommendation_service.recommendations_version(current_user.id)
+    if include_archived:
+        version += ArchiveService(db).archive_version("recommendations", current_user.id)
+    etag = make_etag("recommendations", include_archived, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    recommendations = recommendation_service.get_user_recommendations(current_user.id)
+    if include_archived:
+        recommendations += ArchiveService(db).archived_recommendations(current_user.id)
+    return recommendations
+
+def attach_videos(recommendations, background_tasks: BackgroundTasks, db: Session) -> None:
+    """Videos come from the cache only; careers with nothing cached are looked up after the response is sent"""
+    missing = VideoService(db).attach_cached(recommendations)
+    if missing:
+        background_tasks.add_task(warm_career_videos, missing)
+
+# Video recommendation endpoints (sync: lookups on a cache miss call the YouTube API)
+@app.get("/api/videos/career/{title}", response_model=list[VideoRecommendation])
+def get_career_videos(title: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return VideoService(db).career_videos(title)
+
+@app.get("/api/videos/skill/{name}", response_model=list[VideoRecommendation])
+def get_skill_videos(name: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return VideoService(db).skill_videos(name)
+
+@app.get("/api/videos/trending", response_model=list[VideoRecommendation])
+def get_trending_videos(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return VideoService(db).trending_videos()
+
+# Admin data exports
+@app.get("/api/admin/export/{table}")
+async def export_table(
+    table: str,
+    format: str = "ndjson",
+    after_id: int | None = None,
+    until_id: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    include_header: bool | None = None,
+    admin_user: User = Depends(get_admin_user)
+):
+    """Stream a full table dump; resume an interrupted export with ``after_id`` set to the last id received.
+
+    The CSV header is sent only on a fresh export unless ``include_header`` says otherwise,
+    so a resumed download can be appended to the first file.
+    """
+    try:
+        validate_export(table, format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def export_chunks():
+        # Own session: the export outlives the request's dependency scope
+        with read_session() as export_db:
+            yield from ExportService(export_db).stream(
+                table, format, after_id, until_id, batch_size,
+                include_header=after_id is None if include_header is None else include_header
+            )
+
+    return StreamingResponse(
+        export_chunks(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
+
+@app.post("/api/admin/users/import")
+def import_users(
+    file: UploadFile = File(...),
+    format: str | None = None,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Bulk-create accounts from a CSV or NDJSON upload; returns a per-row result"""
+    import_format = format or ("ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv")
+    if import_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown import format: {import_format}")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig")
+    try:
+        return UserImportService(db).import_users(read_rows(stream, import_format))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not read import file: {e}")
 
 # Health check
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "message": "AI Career Guidance System is running"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness of this worker process; 503 until its startup warm-up has finished"""
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Worker is starting")
+    return {"status": "ready", "pid": os.getpid()}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+# Chat session endpoints
+@app.post("/api/chat/sessions", response_model=ChatSessionResponse)
+async def create_chat_session(
+    session_data: ChatSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return ChatService(db).create_session(current_user.id, session_data.title)
+
+@app.get("/api/chat/sessions", response_model=list[ChatSessionResponse])
+async def list_chat_sessions(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return ChatService(db).list_sessions(current_user.id)
+
+@app.get("/api/chat/sessions/{session_id}/messages", response_model=list[ChatMessageResponse])
+async def get_chat_messages(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        return ChatService(db).get_messages(session_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.post("/api/chat/stream")
 async def chat_stream(
     body: dict,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str | None = None,
+    current_user: User = Depends(rate_limited("chat")),
+    db: Session = Depends(get_db),
 ):
-    """Stream AI chat responses token-by-token to the client."""
-    prompt = body.get("message", "")
-    if not prompt:
+    """Stream AI chat responses token-by-token to the client.
+
+    Returns raw text chunks by default. With ``?format=sse`` or
+    ``Accept: text/event-stream`` the answer is sent as Server-Sent Events with
+    coalesced ``token`` frames, heartbeats and a final ``done`` event. Either
+    way the upstream stream is cancelled as soon as the client disconnects.
+
+    When ``session_id`` is given the message and reply are stored in that chat
+    session and the prompt carries its bounded history and the user's context digest.
+    """
+    message = body.get("message", "")
+    if not message:
         raise HTTPException(status_code=400, detail="message is required")
 
+    llm_pool.check_capacity()
     gemini = GeminiService()
+    session_id = body.get("session_id")
+    prompt = message
+    if session_id is not None:
+        try:
+            # Stores the message and builds the bounded prompt
+            prompt = await llm_pool.run(ChatService(db, gemini).prepare_turn, int(session_id), current_user.id, message)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        # Summarizing older turns is another model call; run it after the response has finished
+        background_tasks.add_task(llm_pool.run, compact_chat_session, int(session_id), shed=False)
+
+    def make_iterator():
+        if session_id is None:
+            return gemini.stream_chat(prompt)
+        return _stream_and_record(gemini, prompt, int(session_id))
 
-    def token_generator():
-        for chunk in gemini.stream_chat(prompt):
-            # Send Server-Sent Events style or raw text chunks; here we send raw text
-            yield chunk
+    if format == "sse" or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            sse_chat_events(request, make_iterator, pool=llm_pool),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    async def token_generator():
+        async for chunk in cancellable_stream(request, make_iterator, pool=llm_pool):
+            if chunk is not None:
+                yield chunk
 
     return StreamingResponse(token_generator(), media_type="text/plain")
 
+def _stream_and_record(gemini: GeminiService, prompt: str, session_id: int):
+    """Yield the reply and store it in the session once it completes (skipped if the client disconnects)"""
+    chunks = []
+    for chunk in gemini.stream_chat(prompt):
+        chunks.append(chunk)
+        yield chunk
+    db = SessionLocal()
+    try:
+        ChatService(db, gemini).record_reply(session_id, "".join(chunks))
+    finally:
+        db.close()
+
+def compact_chat_session(session_id: int) -> None:
+    """Fold old turns into the session summary if the history outgrew the budget"""
+    db = SessionLocal()
+    try:
+        ChatService(db).compact(session_id)
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
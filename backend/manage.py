@@ -0,0 +1,148 @@
+"""Administrative commands.
+
+    cd backend
+    python manage.py export assessments --format csv --output assessments.csv
+    python manage.py export assessments --output assessments.ndjson --resume
+    python manage.py import-users partner_users.csv --report import-report.ndjson
+    python manage.py rebuild-percentiles
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def export(args) -> None:
+    from database import read_session
+    from services.export_service import ExportService, prepare_resume
+
+    after_id = args.after_id
+    mode = "wb"
+    include_header = True
+    if args.resume:
+        if not args.output:
+            sys.exit("--resume needs --output")
+        if os.path.exists(args.output):
+            after_id = prepare_resume(args.output, args.format)
+            include_header = os.path.getsize(args.output) == 0
+            mode = "ab"
+            print(f"Resuming {args.table} after id {after_id}", file=sys.stderr)
+
+    out = open(args.output, mode) if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        with read_session() as db:
+            for chunk in ExportService(db).stream(
+                args.table, args.format, after_id, args.until_id, args.batch_size, include_header
+            ):
+                out.write(chunk)
+                out.flush()
+                written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"Exported {args.table}: {written} bytes", file=sys.stderr)
+
+
+def import_users(args) -> None:
+    from database import SessionLocal
+    from services.user_import_service import UserImportService, read_rows
+
+    fmt = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(args.file, newline="", encoding="utf-8-sig") as f, SessionLocal() as db:
+        report = UserImportService(db, workers=args.workers, batch_size=args.batch_size).import_users(read_rows(f, fmt))
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as out:
+            for row in report["rows"]:
+                out.write(json.dumps(row) + "\n")
+    else:
+        for row in report["rows"]:
+            if row["status"] != "created":
+                print(json.dumps(row), file=sys.stderr)
+    print(
+        f"{report['total']} rows: {report['created']} created, {report['duplicate']} duplicate, "
+        f"{report['invalid']} invalid",
+        file=sys.stderr,
+    )
+
+
+def rebuild_percentiles(args) -> None:
+    from database import SessionLocal
+    from services.percentile_service import PercentileService
+
+    with SessionLocal() as db:
+        processed = PercentileService(db).rebuild()
+    print(f"Rebuilt percentile sketches from {processed} assessments", file=sys.stderr)
+
+
+def archive(args) -> None:
+    from database import SessionLocal
+    from services.archive_service import ArchiveService, TIERS
+
+    tables = sorted(TIERS) if args.table == "all" else [args.table]
+    with SessionLocal() as db:
+        service = ArchiveService(db)
+        if args.keep_latest is not None:
+            service.keep_latest = args.keep_latest
+        if args.keep_days is not None:
+            service.keep_days = args.keep_days
+        for table in tables:
+            moved = service.archive(table, args.batch_size, args.dry_run)
+            verb = "Would archive" if args.dry_run else "Archived"
+            print(f"{verb} {moved} {table}", file=sys.stderr)
+
+
+def main() -> None:
+    from services.export_service import EXPORTS, FORMATS, DEFAULT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description="Career guidance backend administration")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subcommands.add_parser("export", help="Stream a table to NDJSON, CSV, Parquet or Arrow")
+    export_parser.add_argument("table", choices=sorted(EXPORTS))
+    export_parser.add_argument("--format", default="ndjson", choices=FORMATS)
+    export_parser.add_argument("--output", help="Output file (default: stdout)")
+    export_parser.add_argument("--after-id", type=int, help="Only rows with id greater than this")
+    export_parser.add_argument("--until-id", type=int, help="Only rows with id up to and including this")
+    export_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    export_parser.add_argument("--resume", action="store_true",
+                               help="Append to an existing NDJSON/CSV --output after the last id it contains")
+    export_parser.set_defaults(handler=export)
+
+    import_parser = subcommands.add_parser("import-users", help="Bulk-create users from CSV or NDJSON")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"], help="Default: from the file extension")
+    import_parser.add_argument("--report", help="Write per-row results as NDJSON (default: print failures)")
+    import_parser.add_argument("--workers", type=int, help="Password hashing processes (default: BULK_IMPORT_WORKERS or CPU count)")
+    import_parser.add_argument("--batch-size", type=int, default=500)
+    import_parser.set_defaults(handler=import_users)
+
+    rebuild_parser = subcommands.add_parser("rebuild-percentiles", help="Recompute percentile sketches from assessment history")
+    rebuild_parser.set_defaults(handler=rebuild_percentiles)
+
+    archive_parser = subcommands.add_parser(
+        "archive", help="Move assessment/recommendation history past the retention window to the archive tables"
+    )
+    archive_parser.add_argument("table", nargs="?", default="all", choices=["all", "assessments", "recommendations"])
+    archive_parser.add_argument("--keep-latest", type=int, help="Rows kept per user (default: ARCHIVE_KEEP_LATEST)")
+    archive_parser.add_argument("--keep-days", type=float, help="Rows newer than this are kept (default: ARCHIVE_KEEP_DAYS)")
+    archive_parser.add_argument("--batch-size", type=int, default=500, help="Rows moved per transaction")
+    archive_parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+    archive_parser.set_defaults(handler=archive)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        args.handler(args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
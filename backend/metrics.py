@@ -0,0 +1,364 @@
+"""Lightweight in-process metrics exposed in Prometheus text format.
+
+Instruments are plain dicts guarded by a lock, which keeps the per-request cost
+to a couple of dictionary updates so metrics can stay on in production. Each
+worker process keeps its own registry; Prometheus aggregates across workers.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+from tracing import record_span
+
+# Seconds. Covers sub-millisecond DB statements up to slow Gemini generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, *labels: str, value: float) -> None:
+        """Overwrite a series, used to mirror counters kept by another component"""
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> float:
+        series = self._values.get(labels)
+        return sum(series[:-1]) if series else 0.0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        out = []
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                out.append((
+                    f"{self.name}_bucket",
+                    _format_labels(self.labelnames + ("le",), labels + (le,)),
+                    cumulative,
+                ))
+            label_str = _format_labels(self.labelnames, labels)
+            out.append((f"{self.name}_count", label_str, cumulative))
+            out.append((f"{self.name}_sum", label_str, series[-1]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every scrape, e.g. to copy gauges from another component"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, method and status",
+    ("method", "route", "status"),
+))
+HTTP_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served", ("method",),
+))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "SQL statements executed", ("operation",),
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("operation",),
+))
+LLM_CALL_DURATION = registry.register(Histogram(
+    "llm_call_duration_seconds", "Gemini call latency by service method", ("method",),
+))
+LLM_CALLS = registry.register(Counter(
+    "llm_calls_total", "Gemini service calls by method", ("method",),
+))
+LLM_FALLBACKS = registry.register(Counter(
+    "llm_fallbacks_total", "Gemini service calls answered by the fallback path", ("method",),
+))
+LLM_STREAM_CHUNKS = registry.register(Counter(
+    "llm_stream_chunks_total", "Chunks streamed to chat clients",
+))
+LLM_STREAM_BYTES = registry.register(Counter(
+    "llm_stream_bytes_total", "UTF-8 bytes streamed to chat clients",
+))
+LLM_TIME_TO_FIRST_TOKEN = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from starting a chat stream to its first token",
+))
+LLM_STREAM_FRAMES = registry.register(Counter(
+    "llm_stream_frames_total", "Server-Sent Events token frames sent after coalescing",
+))
+LLM_STREAMS_CANCELLED = registry.register(Counter(
+    "llm_streams_cancelled_total", "Chat streams stopped early because the client disconnected",
+))
+RATE_LIMIT_REQUESTS = registry.register(Counter(
+    "rate_limit_requests_total", "Rate limiter decisions by route class", ("route_class", "decision"),
+))
+RATE_LIMIT_QUEUE_DEPTH = registry.register(Gauge(
+    "rate_limit_queue_depth", "Requests waiting for a rate limit token", ("route_class",),
+))
+WORKLOAD_POOL_WORKERS = registry.register(Gauge(
+    "workload_pool_workers", "Worker threads per workload pool (llm, crud)", ("pool",),
+))
+WORKLOAD_POOL_ACTIVE = registry.register(Gauge(
+    "workload_pool_active", "Calls running on each workload pool", ("pool",),
+))
+WORKLOAD_POOL_QUEUED = registry.register(Gauge(
+    "workload_pool_queued", "Calls waiting for a worker in each workload pool", ("pool",),
+))
+WORKLOAD_POOL_REJECTED = registry.register(Counter(
+    "workload_pool_rejected_total", "Calls shed with 503 (saturated, queue_timeout)", ("pool", "reason"),
+))
+WORKLOAD_POOL_QUEUE_WAIT = registry.register(Histogram(
+    "workload_pool_queue_wait_seconds", "Time calls waited for a worker", ("pool",),
+))
+DB_POOL_SIZE = registry.register(Gauge(
+    "db_pool_size", "Configured steady-state connections per engine", ("engine",),
+))
+DB_POOL_CONNECTIONS = registry.register(Gauge(
+    "db_pool_connections", "Pooled connections by state (checked_out, idle, overflow)", ("engine", "state"),
+))
+DB_POOL_CONNECTIONS_OPENED = registry.register(Counter(
+    "db_pool_connections_opened_total", "Database connections opened by the pool", ("engine",),
+))
+PERCENTILE_SKETCH_PENDING = registry.register(Gauge(
+    "percentile_sketch_pending_samples", "Assessment scores buffered in this worker, not yet merged into sketches",
+))
+PERCENTILE_SKETCH_FLUSHES = registry.register(Counter(
+    "percentile_sketch_flushes_total", "Sketch keys per flush outcome (merged, conflict = retried next flush)", ("outcome",),
+))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and in-flight counts per route.
+
+    Routes are labelled by their template (``/api/assessments/{assessment_id}``)
+    to keep label cardinality bounded. Streaming responses are timed until the
+    last body chunk has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = str(message["status"])
+            await send(message)
+
+        # The route template is only known after routing, so in-flight is per method
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route_path, status_holder[0])
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement executed through ``engine``"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = statement.lstrip().split(" ", 1)[0].upper() or "OTHER"
+        DB_QUERIES.inc(operation)
+        DB_QUERY_DURATION.observe(elapsed, operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+
+
+def observe_llm_call(method: str, started: float, fallback: bool = False) -> None:
+    ended = time.perf_counter()
+    LLM_CALLS.inc(method)
+    LLM_CALL_DURATION.observe(ended - started, method)
+    record_span("llm", f"llm {method}", started, ended, {"llm.fallback": fallback})
+    if fallback:
+        LLM_FALLBACKS.inc(method)
+
+
+def observe_stream_chunk(chunk: str) -> None:
+    LLM_STREAM_CHUNKS.inc()
+    LLM_STREAM_BYTES.inc(amount=len(chunk.encode("utf-8")))
+
+
+def observe_time_to_first_token(seconds: float) -> None:
+    LLM_TIME_TO_FIRST_TOKEN.observe(seconds)
+
+
+def observe_stream_frame() -> None:
+    LLM_STREAM_FRAMES.inc()
+
+
+def observe_stream_cancelled() -> None:
+    LLM_STREAMS_CANCELLED.inc()
+
+
+def observe_pool_wait(pool: str, seconds: float) -> None:
+    WORKLOAD_POOL_QUEUE_WAIT.observe(seconds, pool)
+
+
+def _collect_rate_limits() -> None:
+    # Imported lazily so metrics has no dependency on the limiter's database store
+    from rate_limiter import rate_limiter
+
+    for route_class, stats in rate_limiter.stats().items():
+        RATE_LIMIT_REQUESTS.set(route_class, "allowed", value=stats["allowed"])
+        RATE_LIMIT_REQUESTS.set(route_class, "rejected", value=stats["rejected"])
+        RATE_LIMIT_QUEUE_DEPTH.set(route_class, value=stats["queue_depth"])
+
+
+registry.add_collector(_collect_rate_limits)
+
+
+def _collect_db_pools() -> None:
+    from database import pool_stats
+
+    for engine_name, stats in pool_stats().items():
+        DB_POOL_SIZE.set(engine_name, value=stats["size"])
+        for state in ("checked_out", "idle", "overflow"):
+            DB_POOL_CONNECTIONS.set(engine_name, state, value=stats[state])
+        DB_POOL_CONNECTIONS_OPENED.set(engine_name, value=stats["connections_opened"])
+
+
+registry.add_collector(_collect_db_pools)
+
+
+def _collect_workload_pools() -> None:
+    from workloads import pool_stats
+
+    for pool, stats in pool_stats().items():
+        WORKLOAD_POOL_WORKERS.set(pool, value=stats["workers"])
+        WORKLOAD_POOL_ACTIVE.set(pool, value=stats["active"])
+        WORKLOAD_POOL_QUEUED.set(pool, value=stats["queued"])
+        for reason, count in stats["rejected"].items():
+            WORKLOAD_POOL_REJECTED.set(pool, reason, value=count)
+
+
+registry.add_collector(_collect_workload_pools)
+
+
+def _collect_percentile_sketches() -> None:
+    from services.percentile_service import sketch_buffer
+
+    stats = sketch_buffer.stats()
+    PERCENTILE_SKETCH_PENDING.set(value=stats["pending_samples"])
+    PERCENTILE_SKETCH_FLUSHES.set("merged", value=stats["merged"])
+    PERCENTILE_SKETCH_FLUSHES.set("conflict", value=stats["conflicts"])
+
+
+registry.add_collector(_collect_percentile_sketches)
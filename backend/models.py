@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -37,6 +37,11 @@ class Assessment(Base):
     # Relationships
     user = relationship("User", back_populates="assessments")
 
+    __table_args__ = (
+        # Per-user listing (newest first) and its conditional-GET version check
+        Index("ix_assessments_user_completed", "user_id", "completed_at"),
+    )
+
 class SkillEvaluation(Base):
     __tablename__ = "skill_evaluations"
     
@@ -69,3 +74,145 @@ class CareerRecommendation(Base):
     
     # Relationships
     user = relationship("User", back_populates="career_recommendations")
+
+    __table_args__ = (
+        # Latest recommendation per user is a single index probe
+        Index("ix_career_recommendations_user_generated", "user_id", "generated_at"),
+    )
+
+class RecommendationInput(Base):
+    __tablename__ = "recommendation_inputs"
+
+    # Inputs the user's newest recommendation was generated from: score snapshot
+    # source ids and a hash of the profile fields, compared on /latest for staleness
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    recommendation_id = Column(Integer, nullable=False)
+    input_key = Column(String(100), nullable=False)
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    
+    # "<route_class>:<user_id>" so every worker process shares the same bucket
+    bucket_key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix timestamp of the last refill
+
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    title = Column(String(255))
+    # Rolling summary of every message up to summarized_through_id
+    summary = Column(Text)
+    summarized_through_id = Column(Integer, default=0, nullable=False)
+    # Compact digest of the user's assessments/recommendations and the row ids it was built from
+    context_digest = Column(Text)
+    context_digest_key = Column(String(100))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    messages = relationship("ChatMessage", back_populates="session", order_by="ChatMessage.id")
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False, index=True)
+    role = Column(String(20), nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False)  # Estimated prompt tokens
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    session = relationship("ChatSession", back_populates="messages")
+
+class UserScoreSnapshot(Base):
+    __tablename__ = "user_score_snapshots"
+    
+    # Latest result of each assessment type and the latest skill evaluation,
+    # written in the same transaction as the source row
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    aptitude_assessment_id = Column(Integer)
+    aptitude_scores = Column(JSON)
+    interest_assessment_id = Column(Integer)
+    interest_scores = Column(JSON)
+    personality_assessment_id = Column(Integer)
+    personality_scores = Column(JSON)
+    skill_evaluation_id = Column(Integer)
+    technical_skills = Column(JSON)
+    soft_skills = Column(JSON)
+    industry_skills = Column(JSON)
+    skill_gaps = Column(JSON)
+    overall_skill_score = Column(Float)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ScoreSketch(Base):
+    __tablename__ = "score_sketches"
+    
+    # "<sketch type>:all" or "<sketch type>:<cohort field>=<value>"; the sketch type is the
+    # assessment type, plus "@<version>" for server-keyed instruments (interest, personality)
+    sketch_key = Column(String(255), primary_key=True)
+    assessment_type = Column(String(100), nullable=False)
+    cohort = Column(String(255), nullable=False)
+    sketches = Column(JSON, nullable=False)  # {category: serialized t-digest}
+    version = Column(Integer, nullable=False, default=0)  # Compare-and-swap guard for concurrent updates
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class InstrumentRelease(Base):
+    __tablename__ = "instrument_releases"
+
+    # When each version of a server-keyed instrument first scored an assessment;
+    # assessments completed earlier are not ranked against it
+    instrument = Column(String(100), primary_key=True)
+    version = Column(String(50), primary_key=True)
+    released_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class VideoCache(Base):
+    __tablename__ = "video_cache"
+    
+    # "career:<title>", "skill:<canonical skill>" or "trending", lower-cased
+    cache_key = Column(String(255), primary_key=True)
+    videos = Column(JSON, nullable=False)
+    expires_at = Column(Float, nullable=False)  # Unix timestamp; expired rows are still served if the API fails
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_records"
+    
+    # "<user_id>:<route>:<Idempotency-Key header>"
+    record_key = Column(String(400), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # Same key with a different body is rejected
+    status = Column(String(20), nullable=False)  # pending, done
+    response_body = Column(JSON)
+    claimed_at = Column(Float, nullable=False)  # Unix timestamp; stale pending claims can be taken over
+    expires_at = Column(Float, nullable=False, index=True)
+
+class ArchivedAssessment(Base):
+    __tablename__ = "archived_assessments"
+    
+    # Cold tier: assessments moved out of "assessments" by the archive job (same id)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    assessment_type = Column(String(100), nullable=False)
+    completed_at = Column(DateTime(timezone=True))
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON of the full row
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_archived_assessments_user_completed", "user_id", "completed_at"),
+    )
+
+class ArchivedRecommendation(Base):
+    __tablename__ = "archived_recommendations"
+    
+    # Cold tier: recommendations moved out of "career_recommendations" by the archive job (same id)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    generated_at = Column(DateTime(timezone=True))
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON of the full row
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_archived_recommendations_user_generated", "user_id", "generated_at"),
+    )
@@ -0,0 +1,135 @@
+"""Mergeable t-digest for approximate percentile ranks.
+
+A digest summarises any number of values in roughly ``compression / 2``
+weighted centroids, kept small near the tails where rank accuracy matters
+most. Digests serialise to plain JSON so they can be stored in a database
+column and updated one value at a time.
+"""
+import bisect
+import math
+from typing import Any, Dict, List, Optional
+
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    def __init__(
+        self,
+        compression: float = DEFAULT_COMPRESSION,
+        centroids: Optional[List[List[float]]] = None,
+        count: float = 0.0,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+    ):
+        self.compression = compression
+        self.centroids: List[List[float]] = centroids or []  # [mean, weight], sorted by mean
+        self.count = count
+        self.min = min_value
+        self.max = max_value
+        self._buffer: List[List[float]] = []
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        value = float(value)
+        self._buffer.append([value, weight])
+        self.count += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        if not other.count:
+            return
+        self._buffer.extend([mean, weight] for mean, weight in other.centroids)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def cdf(self, value: float) -> Optional[float]:
+        """Fraction of values below ``value``, counting ties as half (mid-rank)"""
+        self._compress()
+        if not self.count:
+            return None
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+
+        below = 0.0
+        equal = 0.0
+        for mean, weight in self.centroids:
+            if mean < value:
+                below += weight
+            elif mean == value:
+                equal += weight
+            else:
+                break
+        if equal:
+            return (below + equal / 2) / self.count
+
+        # Interpolate between the centres of the neighbouring centroids, using
+        # min/max as the outer anchors
+        means = [mean for mean, _ in self.centroids]
+        i = bisect.bisect_left(means, value)
+        cumulative = 0.0
+        centres = []
+        for mean, weight in self.centroids:
+            centres.append(cumulative + weight / 2)
+            cumulative += weight
+        left_mean, left_rank = (self.min, 0.0) if i == 0 else (means[i - 1], centres[i - 1])
+        right_mean, right_rank = (self.max, self.count) if i == len(means) else (means[i], centres[i])
+        if right_mean <= left_mean:
+            return right_rank / self.count
+        fraction = (value - left_mean) / (right_mean - left_mean)
+        return (left_rank + fraction * (right_rank - left_rank)) / self.count
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        merged: List[List[float]] = []
+        cumulative = 0.0
+        k_left = self._scale(0.0)
+        current_mean, current_weight = points[0]
+        for mean, weight in points[1:]:
+            # A centroid may span at most one unit of the arcsine scale, which
+            # keeps centroids near the tails small
+            k_right = self._scale((cumulative + current_weight + weight) / total)
+            if mean == current_mean or k_right - k_left <= 1:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                merged.append([current_mean, current_weight])
+                cumulative += current_weight
+                k_left = self._scale(cumulative / total)
+                current_mean, current_weight = mean, weight
+        merged.append([current_mean, current_weight])
+        self.centroids = merged
+
+    def _scale(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(max(-1.0, min(1.0, 2 * q - 1)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._compress()
+        return {
+            "c": [[round(mean, 6), weight] for mean, weight in self.centroids],
+            "n": self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any] | None, compression: float = DEFAULT_COMPRESSION) -> "TDigest":
+        if not data:
+            return cls(compression)
+        return cls(
+            compression,
+            centroids=[list(c) for c in data.get("c", [])],
+            count=data.get("n", 0.0),
+            min_value=data.get("min"),
+            max_value=data.get("max"),
+        )
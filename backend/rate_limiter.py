@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import engine
+from models import RateLimitBucket
+
+# Route classes that fan out to Gemini. Each class has its own bucket per user,
+# so a burst of chat messages does not block recommendation generation.
+# Values are (burst, refill per minute) and can be overridden from env, e.g.
+# RATE_LIMIT_CHAT_BURST=10 / RATE_LIMIT_CHAT_PER_MINUTE=20
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "chat": (10, 20),
+    "recommendations": (3, 6),
+    "assessment": (5, 10),
+}
+
+
+class MemoryBucketStore:
+    """Token buckets held in process memory (single worker only)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, burst: float, refill_per_second: float, now: float) -> float:
+        """Take one token from the bucket. Returns 0 when allowed, otherwise seconds until a token is available"""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens, retry_after = _take_token(tokens, updated_at, burst, refill_per_second, now)
+            self._buckets[key] = (tokens, now)
+            return retry_after
+
+
+class DatabaseBucketStore:
+    """Token buckets shared by every worker through the application database.
+
+    Updates use compare-and-swap on ``updated_at`` so two workers racing on the
+    same bucket can never both spend the last token.
+    """
+
+    max_retries = 5
+
+    def __init__(self, bind=engine):
+        self.engine = bind
+
+    def consume(self, key: str, burst: float, refill_per_second: float, now: float) -> float:
+        for _ in range(self.max_retries):
+            try:
+                with self.engine.begin() as conn:
+                    retry_after = self._try_consume(conn, key, burst, refill_per_second, now)
+            except IntegrityError:
+                # Another worker created the bucket first; retry against its row
+                continue
+            if retry_after is not None:
+                return retry_after
+        # Heavy contention on a single bucket is itself a sign of abuse
+        logging.warning(f"Rate limit bucket {key} contended; rejecting request")
+        return 1.0 / refill_per_second if refill_per_second > 0 else 1.0
+
+    def _try_consume(self, conn, key: str, burst: float, refill_per_second: float, now: float) -> float | None:
+        """One compare-and-swap attempt. Returns None when another worker won the race"""
+        table = RateLimitBucket.__table__
+        row = conn.execute(
+            select(table.c.tokens, table.c.updated_at).where(table.c.bucket_key == key)
+        ).first()
+        if row is None:
+            tokens, retry_after = _take_token(burst, now, burst, refill_per_second, now)
+            conn.execute(insert(table).values(bucket_key=key, tokens=tokens, updated_at=now))
+            return retry_after
+
+        tokens, retry_after = _take_token(row.tokens, row.updated_at, burst, refill_per_second, now)
+        # Always move updated_at forward so a concurrent writer's CAS cannot match
+        # the same row version, even when worker clocks are slightly skewed
+        result = conn.execute(
+            update(table)
+            .where(table.c.bucket_key == key, table.c.updated_at == row.updated_at)
+            .values(tokens=tokens, updated_at=max(now, row.updated_at + 1e-6))
+        )
+        return retry_after if result.rowcount == 1 else None
+
+
+def _take_token(
+    tokens: float, updated_at: float, burst: float, refill_per_second: float, now: float
+) -> Tuple[float, float]:
+    """Refill a bucket up to ``now`` and try to spend one token"""
+    elapsed = max(0.0, now - updated_at)
+    tokens = min(burst, tokens + elapsed * refill_per_second)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    if refill_per_second <= 0:
+        return tokens, math.inf
+    return tokens, (1.0 - tokens) / refill_per_second
+
+
+class RateLimiter:
+    """Per-user token-bucket limiter with a small bounded wait queue.
+
+    A request that is only slightly over the limit may wait up to
+    ``max_wait`` seconds for its token instead of being rejected, as long as
+    fewer than ``max_queue`` requests of the same route class are waiting.
+    """
+
+    def __init__(self, store=None, max_wait: float | None = None, max_queue: int | None = None):
+        self.store = store or self._store_from_env()
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "0"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("RATE_LIMIT_MAX_QUEUE", "20"))
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.limits = {name: self._limit_from_env(name, default) for name, default in DEFAULT_LIMITS.items()}
+        self.queue_depth: Dict[str, int] = {name: 0 for name in self.limits}
+        self.allowed: Dict[str, int] = {name: 0 for name in self.limits}
+        self.rejected: Dict[str, int] = {name: 0 for name in self.limits}
+
+    @staticmethod
+    def _store_from_env():
+        backend = os.getenv("RATE_LIMIT_BACKEND", "database").lower()
+        if backend == "memory":
+            return MemoryBucketStore()
+        return DatabaseBucketStore()
+
+    @staticmethod
+    def _limit_from_env(name: str, default: Tuple[float, float]) -> Tuple[float, float]:
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        burst = float(os.getenv(f"{prefix}_BURST", default[0]))
+        per_minute = float(os.getenv(f"{prefix}_PER_MINUTE", default[1]))
+        return burst, per_minute / 60.0
+
+    async def acquire(self, user_id: int, route_class: str, wait: bool = True) -> float:
+        """Admit a request or return the number of seconds the client should wait"""
+        burst, refill_per_second = self.limits[route_class]
+        key = f"{route_class}:{user_id}"
+        retry_after = await self._consume(key, burst, refill_per_second)
+
+        if wait and 0 < retry_after <= self.max_wait and self.queue_depth[route_class] < self.max_queue:
+            self.queue_depth[route_class] += 1
+            try:
+                await asyncio.sleep(retry_after)
+                retry_after = await self._consume(key, burst, refill_per_second)
+            finally:
+                self.queue_depth[route_class] -= 1
+
+        if retry_after > 0:
+            self.rejected[route_class] += 1
+        else:
+            self.allowed[route_class] += 1
+        return retry_after
+
+    async def _consume(self, key: str, burst: float, refill_per_second: float) -> float:
+        if isinstance(self.store, MemoryBucketStore):
+            return self.store.consume(key, burst, refill_per_second, time.time())
+        return await run_in_threadpool(self.store.consume, key, burst, refill_per_second, time.time())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {
+                "allowed": self.allowed[name],
+                "rejected": self.rejected[name],
+                "queue_depth": self.queue_depth[name],
+            }
+            for name in self.limits
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+async def enforce_rate_limit(user_id: int, route_class: str) -> None:
+    """Raise 429 with ``Retry-After`` when ``user_id`` is over the ``route_class`` limit"""
+    if not rate_limiter.enabled:
+        return
+    retry_after = await rate_limiter.acquire(user_id, route_class)
+    if retry_after > 0:
+        retry_seconds = 3600 if math.isinf(retry_after) else max(1, math.ceil(retry_after))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please slow down.",
+            headers={"Retry-After": str(retry_seconds)},
+        )
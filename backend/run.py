@@ -1,28 +1,136 @@
-
 import uvicorn
 import os
+import logging
+import multiprocessing
 from dotenv import load_dotenv
 load_dotenv()
 
 
+def _production_defaults():
+    """Serving options for production mode, all overridable from the environment"""
+    return {
+        "workers": int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count())),
+        "max_requests": int(os.getenv("MAX_REQUESTS", 5000)),
+        "max_requests_jitter": int(os.getenv("MAX_REQUESTS_JITTER", 500)),
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", 120)),
+        "keepalive": int(os.getenv("KEEPALIVE", 5)),
+    }
+
+
+def _event_loop_settings():
+    """Prefer uvloop and httptools when installed (they ship with uvicorn[standard])"""
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    return loop, http
+
+
+def _warn_about_per_process_state(workers: int):
+    if workers > 1 and os.getenv("RATE_LIMIT_BACKEND", "database").lower() == "memory":
+        logging.warning(
+            "RATE_LIMIT_BACKEND=memory keeps a separate bucket per worker; "
+            "use RATE_LIMIT_BACKEND=database to enforce limits across all workers."
+        )
+
+
+def run_production(host: str, port: int):
+    """Serve with gunicorn + uvicorn workers.
+
+    The app is preloaded in the master so imports, config and table creation
+    happen once before fork. Because of the preload, SIGHUP only re-forks
+    workers from the already loaded code; deploy new code with SIGUSR2 (start a
+    new master) then SIGWINCH and SIGQUIT to the old one. Workers are recycled
+    after ``max_requests`` to contain leaks. Falls back to
+    uvicorn's own multi-process mode where gunicorn is unavailable (Windows).
+    """
+    options = _production_defaults()
+    loop, http = _event_loop_settings()
+    _warn_about_per_process_state(options["workers"])
+
+    try:
+        from gunicorn.app.base import BaseApplication
+        from uvicorn.workers import UvicornWorker
+    except ImportError:
+        logging.warning("gunicorn not installed; using uvicorn workers without app preloading or rolling restarts.")
+        uvicorn.run(
+            "main:app",
+            host=host,
+            port=port,
+            workers=options["workers"],
+            loop=loop,
+            http=http,
+            limit_max_requests=options["max_requests"],
+            timeout_graceful_shutdown=options["graceful_timeout"],
+            timeout_keep_alive=options["keepalive"],
+            log_level="info",
+        )
+        return
+
+    class TunedUvicornWorker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": loop, "http": http, "lifespan": "on"}
+
+    def post_fork(server, worker):
+        # Connections opened in the master (e.g. by create_all) must not be shared with children
+        from database import engine, read_engine, reset_driver_pools
+        for bind in {engine, read_engine}:
+            bind.dispose(close=False)
+        # ORACLE_DRIVER_POOL sessions live outside SQLAlchemy's pool, so dispose() doesn't cover them
+        reset_driver_pools()
+
+    class ProductionApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    ProductionApplication({
+        "bind": f"{host}:{port}",
+        "worker_class": TunedUvicornWorker,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "loglevel": "info",
+        **options,
+    }).run()
+
+
 if __name__ == "__main__":
     # Get configuration from environment variables
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
-    debug = os.getenv("DEBUG", "True").lower() == "true"
-    
+    debug = os.getenv("DEBUG", "False").lower() == "true"
+    server_mode = os.getenv("SERVER_MODE", "development" if debug else "production").lower()
+
     print(f"Starting Career Guidance System Backend...")
     print(f"Server will be available at: http://{host}:{port}")
     print(f"API Documentation: http://{host}:{port}/docs")
     print(f"Debug mode: {debug}")
+    print(f"Server mode: {server_mode}")
     from database import DATABASE_URL
     print(f"Database URL: {DATABASE_URL}")
-    
-    # Run the server
-    uvicorn.run(
-        "main:app",
-        host=host,
-        port=port,
-        reload=debug,
-        log_level="info" if not debug else "debug"
-    )
\ No newline at end of file
+
+    if server_mode == "production":
+        run_production(host, port)
+    else:
+        # Single process with auto-reload for local development
+        uvicorn.run(
+            "main:app",
+            host=host,
+            port=port,
+            reload=debug,
+            log_level="info" if not debug else "debug"
+        )
@@ -42,6 +42,11 @@ class AssessmentResponse(BaseModel):
     scores: Dict[str, Any]
     total_score: float
     completed_at: datetime
+    # Percentile rank (0-100) of each score among all users and within the user's cohorts
+    percentiles: Optional[Dict[str, float]] = None
+    cohort_percentiles: Optional[Dict[str, Dict[str, float]]] = None
+    # True when served from the archive (include_archived)
+    archived: bool = False
     
     class Config:
         from_attributes = True
@@ -51,6 +56,8 @@ class SkillEvaluationCreate(BaseModel):
     technical_skills: Dict[str, Any]
     soft_skills: Dict[str, Any]
     industry_skills: Dict[str, Any]
+    # Catalog role to measure gaps against; a flat target level is used when omitted
+    target_role: Optional[str] = None
 
 class SkillEvaluationResponse(BaseModel):
     id: int
@@ -78,10 +85,24 @@ class CareerRecommendationResponse(BaseModel):
     video_recommendations: Optional[List[Dict[str, Any]]] = None
     rationale: str
     generated_at: datetime
+    # True when served from the archive (include_archived)
+    archived: bool = False
     
     class Config:
         from_attributes = True
 
+class LatestRecommendationResponse(BaseModel):
+    # fresh: generated after the latest inputs; stale: inputs changed since; missing: none generated yet
+    status: str
+    regenerating: bool
+    recommendation: Optional[CareerRecommendationResponse] = None
+
+class SkillGapReportRequest(BaseModel):
+    role: str
+    # Defaults to every user with a skill evaluation
+    user_ids: Optional[List[int]] = None
+    top_k: int = 5
+
 # Video recommendation schemas
 class VideoRecommendation(BaseModel):
     video_id: str
@@ -110,3 +131,25 @@ class LoginResponse(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+
+# Chat session schemas
+class ChatSessionCreate(BaseModel):
+    title: Optional[str] = None
+
+class ChatSessionResponse(BaseModel):
+    id: int
+    title: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ChatMessageResponse(BaseModel):
+    id: int
+    role: str
+    content: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,141 @@
+"""Hot/cold tiering for assessment and recommendation history.
+
+The archive job keeps, per user, the latest ``ARCHIVE_KEEP_LATEST`` rows (per
+assessment type for assessments) plus anything newer than
+``ARCHIVE_KEEP_DAYS`` in the hot tables. Older rows are moved, in batches of
+one transaction each, to ``archived_assessments`` / ``archived_recommendations``
+with the full row stored as zlib-compressed JSON under its original id. Hot-path
+queries never touch the archive; list endpoints read it only when asked for
+``include_archived``.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, func
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+import json
+import logging
+import os
+import zlib
+
+from models import User, Assessment, CareerRecommendation, ArchivedAssessment, ArchivedRecommendation
+from schemas import AssessmentResponse, CareerRecommendationResponse
+
+DEFAULT_BATCH_SIZE = 500
+
+# hot model, cold model, timestamp column name, extra partition columns, extra cold columns
+TIERS = {
+    "assessments": (Assessment, ArchivedAssessment, "completed_at", ("assessment_type",), ("assessment_type",)),
+    "recommendations": (CareerRecommendation, ArchivedRecommendation, "generated_at", (), ()),
+}
+
+
+def pack(row: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(row, default=_json_default, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ArchiveService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.keep_latest = int(os.getenv("ARCHIVE_KEEP_LATEST", "5"))
+        self.keep_days = float(os.getenv("ARCHIVE_KEEP_DAYS", "90"))
+
+    def archive(self, table: str, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False) -> int:
+        """Move rows past the retention window of ``table`` to its archive; returns how many moved"""
+        if table not in TIERS:
+            raise ValueError(f"Unknown table '{table}'; expected one of {', '.join(sorted(TIERS))}")
+        hot, cold, timestamp_name, partition_names, _ = TIERS[table]
+        ids = self._expired_ids(hot, timestamp_name, partition_names)
+        if dry_run:
+            return len(ids)
+
+        moved = 0
+        for start in range(0, len(ids), batch_size):
+            moved += self._move(table, ids[start:start + batch_size])
+            logging.info(f"Archived {moved}/{len(ids)} {table}")
+        return moved
+
+    def _expired_ids(self, hot, timestamp_name: str, partition_names: Tuple[str, ...]) -> List[int]:
+        """Ids outside both the latest-N and the last-X-days windows, oldest first"""
+        table = hot.__table__
+        timestamp = table.c[timestamp_name]
+        rank = func.row_number().over(
+            partition_by=[table.c.user_id, *(table.c[name] for name in partition_names)],
+            order_by=[timestamp.desc(), table.c.id.desc()],
+        ).label("rank")
+        ranked = select(table.c.id, timestamp.label("ts"), rank).subquery()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+        if self.db.get_bind().dialect.name == "sqlite":
+            # SQLite stores naive UTC timestamps (server_default CURRENT_TIMESTAMP)
+            cutoff = cutoff.replace(tzinfo=None)
+        return list(self.db.execute(
+            select(ranked.c.id).where(ranked.c.rank > self.keep_latest, ranked.c.ts < cutoff).order_by(ranked.c.id)
+        ).scalars())
+
+    def _move(self, table: str, ids: List[int]) -> int:
+        hot, cold, timestamp_name, _, cold_names = TIERS[table]
+        hot_table = hot.__table__
+        rows = self.db.execute(select(hot_table).where(hot_table.c.id.in_(ids))).mappings().all()
+        if not rows:
+            return 0
+        self.db.execute(insert(cold.__table__), [
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                timestamp_name: row[timestamp_name],
+                **{name: row[name] for name in cold_names},
+                "payload": pack(dict(row)),
+            }
+            for row in rows
+        ])
+        # Copy and delete commit together, so an interrupted job leaves each row in exactly one tier
+        self.db.execute(delete(hot_table).where(hot_table.c.id.in_([row["id"] for row in rows])))
+        self.db.commit()
+        return len(rows)
+
+    def archived_assessments(self, user_id: int) -> List[AssessmentResponse]:
+        payloads = self.db.execute(
+            select(ArchivedAssessment.payload)
+            .where(ArchivedAssessment.user_id == user_id)
+            .order_by(ArchivedAssessment.completed_at.desc())
+        ).scalars()
+        return [AssessmentResponse.model_validate({**unpack(payload), "archived": True}) for payload in payloads]
+
+    def archived_assessment(self, assessment_id: int, user_id: int) -> AssessmentResponse | None:
+        payload = self.db.execute(
+            select(ArchivedAssessment.payload)
+            .where(ArchivedAssessment.id == assessment_id, ArchivedAssessment.user_id == user_id)
+        ).scalar()
+        return AssessmentResponse.model_validate({**unpack(payload), "archived": True}) if payload is not None else None
+
+    def archived_recommendations(self, user_id: int) -> List[CareerRecommendationResponse]:
+        payloads = self.db.execute(
+            select(ArchivedRecommendation.payload)
+            .where(ArchivedRecommendation.user_id == user_id)
+            .order_by(ArchivedRecommendation.generated_at.desc())
+        ).scalars()
+        return [CareerRecommendationResponse.model_validate({**unpack(payload), "archived": True}) for payload in payloads]
+
+    def archive_version(self, table: str, user_id: int) -> Tuple[Any, ...]:
+        """Validator part for a user's archived rows (rows only ever arrive, by the archive job)"""
+        cold = TIERS[table][1]
+        return tuple(self.db.execute(
+            select(func.count(cold.id), func.max(cold.archived_at)).where(cold.user_id == user_id)
+        ).one())
+
+    def iter_archived_assessment_scores(self, cohort_columns: List[Any], batch_size: int = 1000) -> Iterator[Tuple[Any, ...]]:
+        """(assessment_type, completed_at, scores, *cohort values) for every archived assessment, for percentile rebuilds"""
+        rows = self.db.query(
+            ArchivedAssessment.assessment_type, ArchivedAssessment.completed_at, ArchivedAssessment.payload, *cohort_columns
+        ).join(User, User.id == ArchivedAssessment.user_id).yield_per(batch_size)
+        for assessment_type, completed_at, payload, *cohort_values in rows:
+            yield (assessment_type, completed_at, unpack(payload).get("scores"), *cohort_values)
@@ -1,10 +1,17 @@
 from sqlalchemy.orm import Session
-from models import Assessment
+from sqlalchemy import func
+from models import Assessment, User
 from schemas import AssessmentCreate, AssessmentResponse
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import json
+import logging
+import time
 
+from metrics import observe_llm_call
 from services.gemini_service import GeminiService
+from services.score_snapshot_service import ScoreSnapshotService
+from services.percentile_service import PercentileService
+from services.psychometrics import INSTRUMENTS, get_instrument
 
 
 class AssessmentService:
@@ -19,6 +26,9 @@ class AssessmentService:
             assessment_data.questions,
         )
         total_score = sum(scores.values()) / len(scores) if scores else 0
+        percentile_service = PercentileService(self.db)
+        if assessment_data.assessment_type in INSTRUMENTS:
+            percentile_service.register_release(assessment_data.assessment_type)
         
         db_assessment = Assessment(
             user_id=user_id,
@@ -29,10 +39,14 @@ class AssessmentService:
         )
         
         self.db.add(db_assessment)
+        ScoreSnapshotService(self.db).record_assessment(db_assessment)
         self.db.commit()
         self.db.refresh(db_assessment)
+        percentile_service.record_assessment(db_assessment)
         
-        return AssessmentResponse.model_validate(db_assessment)
+        response = AssessmentResponse.model_validate(db_assessment)
+        percentile_service.attach_percentiles([response], self.db.get(User, user_id))
+        return response
     
     def get_assessment(self, assessment_id: int, user_id: int) -> AssessmentResponse:
         assessment = self.db.query(Assessment).filter(
@@ -43,8 +57,27 @@ class AssessmentService:
         if not assessment:
             raise ValueError("Assessment not found")
         
-        return AssessmentResponse.model_validate(assessment)
+        response = AssessmentResponse.model_validate(assessment)
+        PercentileService(self.db).attach_percentiles([response], assessment.user)
+        return response
     
+    def list_version(self, user: User) -> Tuple[Any, ...]:
+        """Validator for the user's assessment list, from index-only aggregates"""
+        count, last_id, last_completed = self.db.query(
+            func.count(Assessment.id), func.max(Assessment.id), func.max(Assessment.completed_at)
+        ).filter(Assessment.user_id == user.id).one()
+        return (count, last_id, last_completed, *PercentileService(self.db).sketch_epoch(user))
+
+    def assessment_version(self, assessment_id: int, user: User) -> Tuple[Any, ...] | None:
+        """Validator for one assessment, or None when it doesn't exist for this user"""
+        completed_at = self.db.query(Assessment.completed_at).filter(
+            Assessment.id == assessment_id,
+            Assessment.user_id == user.id
+        ).first()
+        if completed_at is None:
+            return None
+        return (assessment_id, completed_at[0], *PercentileService(self.db).sketch_epoch(user))
+
     def calculate_scores(
         self,
         assessment_type: str,
@@ -60,7 +93,12 @@ class AssessmentService:
             scores = self.calculate_interest_scores(answers)
         elif assessment_type == "personality":
             scores = self.calculate_personality_scores(answers)
-        
+
+        if assessment_type in INSTRUMENTS and not scores:
+            raise ValueError(
+                f"No answered items of the {assessment_type} instrument; "
+                f"see /api/assessments/instruments/{assessment_type}"
+            )
         return scores
     
     def calculate_aptitude_scores(
@@ -107,17 +145,16 @@ class AssessmentService:
                 prompt += "User Answer: Not answered\n\n"
 
         gemini = GeminiService()
+        started = time.perf_counter()
         try:
-            ai_output = gemini.chat(prompt)
-            scores = json.loads(ai_output)
+            scores = coerce_aptitude_scores(gemini.score_aptitude(prompt, answers, questions), categories)
+            observe_llm_call("score_aptitude", started)
         except Exception as e:
             # Fallback to rule-based calculation
+            logging.warning(f"AI aptitude scoring unusable, using rule-based scores: {e}")
+            observe_llm_call("score_aptitude", started, fallback=True)
             scores = self._fallback_rule_based(answers, questions)
 
-        # Ensure all categories exist
-        for cat in categories.keys():
-            scores.setdefault(cat, 0.0)
-
         return scores
     
     def _fallback_rule_based(
@@ -126,78 +163,71 @@ class AssessmentService:
         questions: Dict[str, Any] | list | None
     ) -> Dict[str, float]:
         """Fallback rule-based aptitude scoring if AI fails"""
-        categories = {
-            "logical_reasoning": 0.0,
-            "verbal_ability": 0.0,
-            "numerical_ability": 0.0,
-            "spatial_reasoning": 0.0,
-            "analytical_thinking": 0.0,
-        }
+        return score_aptitude_rule_based(answers, questions)
+    
+    def calculate_interest_scores(self, answers: Dict[str, Any]) -> Dict[str, float]:
+        """Interest scores (0-100 per category answered) from the server-keyed interest instrument"""
+        return get_instrument("interest").score(answers)
+    
+    def calculate_personality_scores(self, answers: Dict[str, Any]) -> Dict[str, float]:
+        """Big Five scores (0-100 per trait answered) from the Mini-IPIP personality instrument"""
+        return get_instrument("personality").score(answers)
 
-        if not isinstance(questions, list):
-            return categories
+def coerce_aptitude_scores(result: Any, categories: Dict[str, float]) -> Dict[str, float]:
+    """Model output as exactly the aptitude categories, floats clamped to 0-100 (missing ones 0).
 
-        id_to_q = {str(q.get("id")): q for q in questions}
-        total_by_cat: Dict[str, int] = {k: 0 for k in categories.keys()}
-        correct_by_cat: Dict[str, int] = {k: 0 for k in categories.keys()}
+    Raises ValueError when the output isn't a JSON object of category scores or a score isn't a number.
+    """
+    if not isinstance(result, dict):
+        raise ValueError(f"expected a JSON object of scores, got {type(result).__name__}")
+    if not any(cat in result for cat in categories):
+        raise ValueError(f"no aptitude categories in {sorted(result)[:5]}")
+    scores = {}
+    for cat in categories:
+        value = result.get(cat, 0.0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+            raise ValueError(f"score for '{cat}' is not a number: {value!r}")
+        scores[cat] = min(max(float(value), 0.0), 100.0)
+    return scores
 
-        for qid, selected in answers.items():
-            q = id_to_q.get(str(qid))
-            if not q:
-                continue
-            cat = q.get("category")
-            if cat not in categories:
-                continue
-            total_by_cat[cat] += 1
-            try:
-                selected_index = int(selected)
-            except Exception:
-                selected_index = -1
-            if selected_index == q.get("correct"):
-                correct_by_cat[cat] += 1
-
-        for cat in categories.keys():
-            total = total_by_cat[cat]
-            correct = correct_by_cat[cat]
-            categories[cat] = round((correct / total) * 100.0, 2) if total > 0 else 0.0
+def score_aptitude_rule_based(
+    answers: Dict[str, Any],
+    questions: Dict[str, Any] | list | None
+) -> Dict[str, float]:
+    """Percentage of correctly answered questions per aptitude category"""
+    categories = {
+        "logical_reasoning": 0.0,
+        "verbal_ability": 0.0,
+        "numerical_ability": 0.0,
+        "spatial_reasoning": 0.0,
+        "analytical_thinking": 0.0,
+    }
 
+    if not isinstance(questions, list):
         return categories
-    
-    def calculate_interest_scores(self, answers: Dict[str, Any]) -> Dict[str, float]:
-        """Calculate interest assessment scores"""
-        interest_categories = {
-            "technology": 0,
-            "business": 0,
-            "healthcare": 0,
-            "education": 0,
-            "arts": 0,
-            "science": 0,
-            "engineering": 0,
-            "social_work": 0
-        }
-        
-        for question_id, answer in answers.items():
-            if isinstance(answer, dict):
-                for category, score in answer.items():
-                    if category in interest_categories:
-                        interest_categories[category] += float(score)
-        
-        return interest_categories
-    
-    def calculate_personality_scores(self, answers: Dict[str, Any]) -> Dict[str, float]:
-        """Calculate personality test scores (Big Five model)"""
-        personality_traits = {
-            "openness": 0,
-            "conscientiousness": 0,
-            "extraversion": 0,
-            "agreeableness": 0,
-            "neuroticism": 0
-        }
-        
-        for question_id, answer in answers.items():
-            if isinstance(answer, dict):
-                for trait, score in answer.items():
-                    if trait in personality_traits:
-                        personality_traits[trait] += float(score)
-        
-        return personality_traits
+
+    id_to_q = {str(q.get("id")): q for q in questions}
+    total_by_cat: Dict[str, int] = {k: 0 for k in categories.keys()}
+    correct_by_cat: Dict[str, int] = {k: 0 for k in categories.keys()}
+
+    for qid, selected in answers.items():
+        q = id_to_q.get(str(qid))
+        if not q:
+            continue
+        cat = q.get("category")
+        if cat not in categories:
+            continue
+        total_by_cat[cat] += 1
+        try:
+            selected_index = int(selected)
+        except Exception:
+            selected_index = -1
+        if selected_index == q.get("correct"):
+            correct_by_cat[cat] += 1
+
+    for cat in categories.keys():
+        total = total_by_cat[cat]
+        correct = correct_by_cat[cat]
+        categories[cat] = round((correct / total) * 100.0, 2) if total > 0 else 0.0
+
+    return categories
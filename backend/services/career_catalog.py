@@ -0,0 +1,126 @@
+"""Static career catalog used for local (non-LLM) recommendations and role profiles.
+
+Skill levels use the same 1-5 scale as skill evaluations. Aptitude weights
+refer to aptitude categories and interest weights to interest categories; both
+sum to 1 per career.
+"""
+from typing import Any, Dict, List
+
+CAREER_CATALOG: List[Dict[str, Any]] = [
+    {
+        "title": "Software Developer",
+        "industry": "Technology",
+        "description": "Design, build and maintain software applications",
+        "required_skills": {"Programming": 4, "Problem Solving": 4, "System Design": 3, "Communication": 3},
+        "aptitude_weights": {"logical_reasoning": 0.4, "analytical_thinking": 0.4, "numerical_ability": 0.2},
+        "interest_weights": {"technology": 0.7, "engineering": 0.3},
+        "growth_potential": "High",
+        "salary_range": "$60,000 - $120,000",
+    },
+    {
+        "title": "Data Analyst",
+        "industry": "Technology",
+        "description": "Turn raw data into insight for business decisions",
+        "required_skills": {"SQL": 4, "Statistics": 4, "Data Visualization": 3, "Communication": 3},
+        "aptitude_weights": {"numerical_ability": 0.5, "analytical_thinking": 0.3, "logical_reasoning": 0.2},
+        "interest_weights": {"technology": 0.4, "business": 0.3, "science": 0.3},
+        "growth_potential": "High",
+        "salary_range": "$55,000 - $95,000",
+    },
+    {
+        "title": "Data Scientist",
+        "industry": "Technology",
+        "description": "Build statistical and machine learning models to answer business questions",
+        "required_skills": {"Python": 4, "Statistics": 5, "Machine Learning": 4, "SQL": 3},
+        "aptitude_weights": {"numerical_ability": 0.4, "analytical_thinking": 0.4, "logical_reasoning": 0.2},
+        "interest_weights": {"science": 0.5, "technology": 0.5},
+        "growth_potential": "High",
+        "salary_range": "$80,000 - $150,000",
+    },
+    {
+        "title": "Mechanical Engineer",
+        "industry": "Engineering",
+        "description": "Design and test mechanical systems and products",
+        "required_skills": {"CAD": 4, "Physics": 4, "Problem Solving": 4, "Project Management": 2},
+        "aptitude_weights": {"spatial_reasoning": 0.5, "numerical_ability": 0.3, "logical_reasoning": 0.2},
+        "interest_weights": {"engineering": 0.8, "science": 0.2},
+        "growth_potential": "Medium",
+        "salary_range": "$65,000 - $110,000",
+    },
+    {
+        "title": "Business Analyst",
+        "industry": "Business",
+        "description": "Bridge business needs and technical solutions",
+        "required_skills": {"Requirements Analysis": 4, "Communication": 4, "SQL": 2, "Stakeholder Management": 3},
+        "aptitude_weights": {"verbal_ability": 0.4, "analytical_thinking": 0.4, "logical_reasoning": 0.2},
+        "interest_weights": {"business": 0.7, "technology": 0.3},
+        "growth_potential": "Medium",
+        "salary_range": "$55,000 - $100,000",
+    },
+    {
+        "title": "Marketing Specialist",
+        "industry": "Business",
+        "description": "Plan and run campaigns that grow brand awareness and sales",
+        "required_skills": {"Communication": 5, "Content Creation": 4, "Data Analysis": 2, "Creativity": 4},
+        "aptitude_weights": {"verbal_ability": 0.6, "analytical_thinking": 0.2, "spatial_reasoning": 0.2},
+        "interest_weights": {"business": 0.6, "arts": 0.4},
+        "growth_potential": "Medium",
+        "salary_range": "$45,000 - $85,000",
+    },
+    {
+        "title": "Registered Nurse",
+        "industry": "Healthcare",
+        "description": "Provide and coordinate patient care",
+        "required_skills": {"Patient Care": 5, "Communication": 4, "Teamwork": 4, "Biology": 3},
+        "aptitude_weights": {"verbal_ability": 0.4, "analytical_thinking": 0.3, "numerical_ability": 0.3},
+        "interest_weights": {"healthcare": 0.8, "social_work": 0.2},
+        "growth_potential": "High",
+        "salary_range": "$60,000 - $95,000",
+    },
+    {
+        "title": "Teacher",
+        "industry": "Education",
+        "description": "Plan lessons and help students learn",
+        "required_skills": {"Communication": 5, "Subject Knowledge": 4, "Leadership": 3, "Patience": 4},
+        "aptitude_weights": {"verbal_ability": 0.6, "logical_reasoning": 0.2, "analytical_thinking": 0.2},
+        "interest_weights": {"education": 0.8, "social_work": 0.2},
+        "growth_potential": "Medium",
+        "salary_range": "$40,000 - $75,000",
+    },
+    {
+        "title": "Graphic Designer",
+        "industry": "Arts & Media",
+        "description": "Create visual concepts for print and digital media",
+        "required_skills": {"Design Tools": 4, "Creativity": 5, "Typography": 3, "Communication": 3},
+        "aptitude_weights": {"spatial_reasoning": 0.6, "verbal_ability": 0.2, "analytical_thinking": 0.2},
+        "interest_weights": {"arts": 0.9, "technology": 0.1},
+        "growth_potential": "Medium",
+        "salary_range": "$40,000 - $80,000",
+    },
+    {
+        "title": "Social Worker",
+        "industry": "Social Services",
+        "description": "Support individuals and families through difficult situations",
+        "required_skills": {"Empathy": 5, "Communication": 4, "Case Management": 3, "Teamwork": 3},
+        "aptitude_weights": {"verbal_ability": 0.6, "analytical_thinking": 0.2, "logical_reasoning": 0.2},
+        "interest_weights": {"social_work": 0.8, "healthcare": 0.2},
+        "growth_potential": "Medium",
+        "salary_range": "$40,000 - $70,000",
+    },
+]
+
+
+# Catalog skills that belong in the "soft_skills" evaluation group
+SOFT_SKILLS = {
+    "Communication", "Problem Solving", "Teamwork", "Leadership", "Creativity",
+    "Empathy", "Patience", "Stakeholder Management",
+}
+
+
+def find_career(title: str) -> Dict[str, Any] | None:
+    """Case-insensitive lookup of a catalog entry by title"""
+    wanted = (title or "").strip().lower()
+    for career in CAREER_CATALOG:
+        if career["title"].lower() == wanted:
+            return career
+    return None
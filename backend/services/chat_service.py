@@ -0,0 +1,207 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from models import ChatSession, ChatMessage, Assessment, SkillEvaluation, CareerRecommendation
+from schemas import ChatSessionResponse, ChatMessageResponse
+from services.gemini_service import GeminiService
+from typing import List, Dict, Any
+import os
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for context budgeting"""
+    return len(text or "") // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a word boundary so ``estimate_tokens`` stays within ``max_tokens``"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, (max_tokens - 1) * 4 - 3)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "..."
+
+
+class ChatService:
+    """Server-side chat sessions with a bounded prompt.
+
+    Each prompt is the user's context digest, the session's rolling summary and
+    as many recent messages as fit in ``CHAT_CONTEXT_TOKEN_BUDGET``. Once the
+    unsummarized history outgrows the budget, the oldest messages are folded
+    into the summary in one LLM call and the result is stored, so the summary
+    is computed once per compaction rather than per message.
+    """
+
+    def __init__(self, db: Session, gemini_service: GeminiService | None = None):
+        self.db = db
+        self.gemini_service = gemini_service
+        self.token_budget = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+        # After compaction, keep roughly this share of the budget as verbatim recent turns
+        self.keep_recent_ratio = float(os.getenv("CHAT_KEEP_RECENT_RATIO", "0.5"))
+
+    def create_session(self, user_id: int, title: str | None = None) -> ChatSessionResponse:
+        session = ChatSession(user_id=user_id, title=title)
+        self.db.add(session)
+        self.db.commit()
+        self.db.refresh(session)
+        return ChatSessionResponse.model_validate(session)
+
+    def list_sessions(self, user_id: int) -> List[ChatSessionResponse]:
+        sessions = self.db.query(ChatSession).filter(
+            ChatSession.user_id == user_id
+        ).order_by(ChatSession.id.desc()).all()
+        return [ChatSessionResponse.model_validate(s) for s in sessions]
+
+    def get_messages(self, session_id: int, user_id: int) -> List[ChatMessageResponse]:
+        session = self._get_session(session_id, user_id)
+        messages = self.db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id
+        ).order_by(ChatMessage.id).all()
+        return [ChatMessageResponse.model_validate(m) for m in messages]
+
+    def prepare_turn(self, session_id: int, user_id: int, message: str) -> str:
+        """Store the user's message and return the prompt for the model's reply"""
+        session = self._get_session(session_id, user_id)
+        self._add_message(session, "user", message)
+        digest = self._context_digest(session, user_id)
+        self.db.commit()
+
+        recent = self._recent_messages(session, self.token_budget - estimate_tokens(session.summary or ""))
+        parts = [
+            "You are a career guidance assistant. Answer the user's latest message using the context below.",
+            f"User context: {digest}",
+        ]
+        if session.summary:
+            parts.append(f"Summary of earlier conversation: {session.summary}")
+        parts.append("Conversation:")
+        parts.extend(f"{m.role.capitalize()}: {m.content}" for m in recent)
+        parts.append("Assistant:")
+        return "\n".join(parts)
+
+    def record_reply(self, session_id: int, reply: str) -> None:
+        """Store the assistant's reply; compaction runs separately (``compact``) after the response"""
+        session = self.db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not session:
+            return
+        self._add_message(session, "assistant", reply)
+        self.db.commit()
+
+    def compact(self, session_id: int) -> bool:
+        session = self.db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        return self.compact_if_needed(session) if session else False
+
+    def compact_if_needed(self, session: ChatSession) -> bool:
+        """Fold the oldest unsummarized messages into the session summary when over budget"""
+        pending = self.db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id,
+            ChatMessage.id > session.summarized_through_id
+        ).order_by(ChatMessage.id).all()
+
+        summary_tokens = estimate_tokens(session.summary or "")
+        if summary_tokens + sum(m.token_count for m in pending) <= self.token_budget:
+            return False
+
+        # Keep the newest messages verbatim; everything older goes into the summary
+        keep_budget = int(self.token_budget * self.keep_recent_ratio)
+        kept_tokens = 0
+        split = len(pending)
+        while split > 0 and kept_tokens + pending[split - 1].token_count <= keep_budget:
+            split -= 1
+            kept_tokens += pending[split].token_count
+        to_fold = pending[:split]
+        if not to_fold:
+            return False
+
+        summary_budget = keep_budget // 2
+        gemini_service = self.gemini_service or GeminiService()
+        summary = gemini_service.summarize_conversation(
+            session.summary or "",
+            [{"role": m.role, "content": m.content} for m in to_fold],
+            max_tokens=summary_budget,
+        )
+        # The model may overshoot the requested length; an oversized summary would re-trigger compaction every turn
+        session.summary = truncate_to_tokens(summary, summary_budget)
+        session.summarized_through_id = to_fold[-1].id
+        self.db.commit()
+        return True
+
+    def _get_session(self, session_id: int, user_id: int) -> ChatSession:
+        session = self.db.query(ChatSession).filter(
+            ChatSession.id == session_id,
+            ChatSession.user_id == user_id
+        ).first()
+        if not session:
+            raise ValueError("Chat session not found")
+        return session
+
+    def _add_message(self, session: ChatSession, role: str, content: str) -> ChatMessage:
+        message = ChatMessage(session_id=session.id, role=role, content=content, token_count=estimate_tokens(content))
+        self.db.add(message)
+        session.updated_at = func.now()
+        self.db.flush()
+        return message
+
+    def _recent_messages(self, session: ChatSession, budget: int) -> List[ChatMessage]:
+        """Newest unsummarized messages that fit in ``budget`` tokens, oldest first"""
+        messages = self.db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id,
+            ChatMessage.id > session.summarized_through_id
+        ).order_by(ChatMessage.id.desc()).all()
+
+        selected = []
+        used = 0
+        for message in messages:
+            if selected and used + message.token_count > budget:
+                break
+            selected.append(message)
+            used += message.token_count
+        return list(reversed(selected))
+
+    def _context_digest(self, session: ChatSession, user_id: int) -> str:
+        """Digest of the user's latest results, rebuilt only when new results exist"""
+        key_row = self.db.query(
+            self.db.query(func.max(Assessment.id)).filter(Assessment.user_id == user_id).scalar_subquery(),
+            self.db.query(func.max(SkillEvaluation.id)).filter(SkillEvaluation.user_id == user_id).scalar_subquery(),
+            self.db.query(func.max(CareerRecommendation.id)).filter(CareerRecommendation.user_id == user_id).scalar_subquery(),
+        ).one()
+        key = ":".join(str(value or 0) for value in key_row)
+        if session.context_digest is not None and session.context_digest_key == key:
+            return session.context_digest
+
+        session.context_digest = build_context_digest(self.db, user_id)
+        session.context_digest_key = key
+        return session.context_digest
+
+
+def build_context_digest(db: Session, user_id: int) -> str:
+    """One-line summary of the latest assessment of each type, skills and recommendations"""
+    parts = []
+    for assessment_type in ("aptitude", "interest", "personality"):
+        latest = db.query(Assessment).filter(
+            Assessment.user_id == user_id,
+            Assessment.assessment_type == assessment_type
+        ).order_by(Assessment.id.desc()).first()
+        if latest and latest.scores:
+            parts.append(f"{assessment_type}: {_top_scores(latest.scores)}")
+
+    skill_eval = db.query(SkillEvaluation).filter(
+        SkillEvaluation.user_id == user_id
+    ).order_by(SkillEvaluation.id.desc()).first()
+    if skill_eval:
+        gaps = [g.get("skill") for g in (skill_eval.skill_gaps or {}).get("priority_skills", [])[:3]]
+        parts.append(f"skills overall {skill_eval.overall_score or 0:.1f}/5" + (f", gaps: {', '.join(gaps)}" if gaps else ""))
+
+    recommendation = db.query(CareerRecommendation).filter(
+        CareerRecommendation.user_id == user_id
+    ).order_by(CareerRecommendation.id.desc()).first()
+    if recommendation and recommendation.recommended_careers:
+        titles = [c.get("title") for c in recommendation.recommended_careers[:3] if isinstance(c, dict)]
+        parts.append(f"recommended careers: {', '.join(t for t in titles if t)}")
+
+    return "; ".join(parts) if parts else "no assessments completed yet"
+
+
+def _top_scores(scores: Dict[str, Any], limit: int = 3) -> str:
+    numeric = [(k, v) for k, v in scores.items() if isinstance(v, (int, float))]
+    numeric.sort(key=lambda item: item[1], reverse=True)
+    return ", ".join(f"{k.replace('_', ' ')} {v:g}" for k, v in numeric[:limit])
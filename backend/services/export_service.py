@@ -0,0 +1,351 @@
+"""Streaming table exports for analytics.
+
+Rows are read with ``yield_per`` (a server-side cursor where the driver
+supports one) in fixed-size batches of plain column tuples, so no ORM objects
+accumulate and memory stays flat however large the table is. Each batch is
+encoded and handed on before the next one is fetched. Exports are ordered by
+id and can be limited to an id range, so an interrupted export resumes from
+the last id it wrote.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import csv
+import io
+import json
+
+from models import Assessment, SkillEvaluation, CareerRecommendation
+from services.assessment_service import score_aptitude_rule_based
+from services.psychometrics import get_instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar formats need optional-export-requirements.txt
+    pa = None
+
+FORMATS = ("ndjson", "csv", "parquet", "arrow")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 50000
+
+
+def _assessment_score_columns() -> List[str]:
+    """Every category the scorers produce, so flattened columns are fixed before any row is read"""
+    categories = list(score_aptitude_rule_based({}, []))
+    categories += get_instrument("interest").traits
+    categories += get_instrument("personality").traits
+    return list(dict.fromkeys(categories))
+
+
+ASSESSMENT_SCORE_COLUMNS = _assessment_score_columns()
+
+
+def _flatten_assessment(row: Dict[str, Any]) -> Dict[str, Any]:
+    scores = dict(row.pop("scores") or {})
+    row.pop("questions", None)
+    for category in ASSESSMENT_SCORE_COLUMNS:
+        value = scores.pop(category, None)
+        row[f"score_{category}"] = float(value) if isinstance(value, (int, float)) else None
+    row["extra_scores"] = json.dumps(scores) if scores else None
+    return row
+
+
+def _flatten_skill_evaluation(row: Dict[str, Any]) -> Dict[str, Any]:
+    for group in ("technical_skills", "soft_skills", "industry_skills"):
+        skills = row.get(group) or {}
+        levels = [v for v in skills.values() if isinstance(v, (int, float))]
+        row[f"{group}_count"] = len(levels)
+        row[f"{group}_mean"] = sum(levels) / len(levels) if levels else None
+        row[group] = json.dumps(skills)
+    gaps = row.get("skill_gaps") or {}
+    row["priority_gap_skills"] = ",".join(g.get("skill", "") for g in gaps.get("priority_skills", []) if isinstance(g, dict))
+    row["skill_gaps"] = json.dumps(gaps)
+    return row
+
+
+def _flatten_recommendation(row: Dict[str, Any]) -> Dict[str, Any]:
+    careers = row.get("recommended_careers") or []
+    for rank in range(1, 4):
+        career = careers[rank - 1] if len(careers) >= rank and isinstance(careers[rank - 1], dict) else {}
+        row[f"career_{rank}_title"] = career.get("title")
+        row[f"career_{rank}_score"] = career.get("overall_score")
+    for field in ("recommended_careers", "career_progression_path", "skill_development_plan", "market_trend_analysis"):
+        row[field] = json.dumps(row.get(field) or ([] if field == "recommended_careers" else {}))
+    return row
+
+
+# table -> (model, flattener, flattened columns with types for CSV headers and Arrow schemas)
+EXPORTS: Dict[str, Tuple[Any, Callable[[Dict[str, Any]], Dict[str, Any]], List[Tuple[str, str]]]] = {
+    "assessments": (
+        Assessment,
+        _flatten_assessment,
+        [("id", "int"), ("user_id", "int"), ("assessment_type", "str"), ("total_score", "float"), ("completed_at", "datetime")]
+        + [(f"score_{category}", "float") for category in ASSESSMENT_SCORE_COLUMNS]
+        + [("extra_scores", "str")],
+    ),
+    "skill_evaluations": (
+        SkillEvaluation,
+        _flatten_skill_evaluation,
+        [("id", "int"), ("user_id", "int"), ("overall_score", "float"), ("evaluated_at", "datetime")]
+        + [(f"{group}_{stat}", kind) for group in ("technical_skills", "soft_skills", "industry_skills")
+           for stat, kind in (("count", "int"), ("mean", "float"))]
+        + [("priority_gap_skills", "str"), ("technical_skills", "str"), ("soft_skills", "str"),
+           ("industry_skills", "str"), ("skill_gaps", "str")],
+    ),
+    "career_recommendations": (
+        CareerRecommendation,
+        _flatten_recommendation,
+        [("id", "int"), ("user_id", "int"), ("skill_match_score", "float"), ("interest_alignment_score", "float"),
+         ("overall_recommendation_score", "float"), ("generated_at", "datetime")]
+        + [(f"career_{rank}_{field}", kind) for rank in range(1, 4) for field, kind in (("title", "str"), ("score", "float"))]
+        + [("rationale", "str"), ("recommended_careers", "str"), ("career_progression_path", "str"),
+           ("skill_development_plan", "str"), ("market_trend_analysis", "str")],
+    ),
+}
+
+
+def validate_export(table: str, fmt: str) -> None:
+    if table not in EXPORTS:
+        raise ValueError(f"Unknown export table: {table}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{fmt} export requires pyarrow (see optional-export-requirements.txt)")
+
+
+class ExportService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def stream(
+        self,
+        table: str,
+        fmt: str = "ndjson",
+        after_id: int | None = None,
+        until_id: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        include_header: bool = True,
+    ) -> Iterator[bytes]:
+        """Encoded export of ``table`` rows with ``after_id < id <= until_id``, one chunk per batch"""
+        validate_export(table, fmt)
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+        _, _, columns = EXPORTS[table]
+        encoder = _ENCODERS[fmt](columns, include_header)
+        for batch in self.batches(table, after_id, until_id, batch_size):
+            chunk = encoder.encode(batch)
+            if chunk:
+                yield chunk
+        tail = encoder.close()
+        if tail:
+            yield tail
+
+    def batches(
+        self,
+        table: str,
+        after_id: int | None = None,
+        until_id: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Flattened rows in id order, ``batch_size`` at a time"""
+        model, flatten, _ = EXPORTS[table]
+        statement = select(*model.__table__.columns).order_by(model.id)
+        if after_id is not None:
+            statement = statement.where(model.id > after_id)
+        if until_id is not None:
+            statement = statement.where(model.id <= until_id)
+
+        result = self.db.execute(statement.execution_options(yield_per=batch_size))
+        try:
+            for partition in result.mappings().partitions():
+                yield [flatten(dict(row)) for row in partition]
+        finally:
+            result.close()
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class _NDJSONEncoder:
+    def __init__(self, columns, include_header):
+        self.names = [name for name, _ in columns]
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps({name: _plain(row.get(name)) for name in self.names}, ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _CSVEncoder:
+    def __init__(self, columns, include_header):
+        self.names = [name for name, _ in columns]
+        self.pending_header = include_header
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self.pending_header:
+            writer.writerow(self.names)
+            self.pending_header = False
+        for row in batch:
+            writer.writerow(["" if row.get(name) is None else _plain(row.get(name)) for name in self.names])
+        return buffer.getvalue().encode("utf-8")
+
+    def close(self) -> bytes:
+        # Header-only file for an empty export
+        return self.encode([]) if self.pending_header else b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every batch"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class _ArrowEncoder:
+    """Parquet (one row group per batch) or Arrow IPC stream (one record batch per batch)"""
+
+    ARROW_TYPES = {"int": "int64", "float": "float64", "str": "string"}
+
+    def __init__(self, columns, include_header, parquet: bool):
+        self.schema = pa.schema([
+            (name, pa.timestamp("us", tz="UTC") if kind == "datetime" else pa.type_for_alias(self.ARROW_TYPES[kind]))
+            for name, kind in columns
+        ])
+        self.sink = _ChunkSink()
+        if parquet:
+            self.writer = pq.ParquetWriter(self.sink, self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        rows = [{name: _to_utc(row.get(name)) for name in self.schema.names} for row in batch]
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+def _to_utc(value: Any) -> Any:
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # Naive timestamps from SQLite's CURRENT_TIMESTAMP are UTC
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+_ENCODERS = {
+    "ndjson": _NDJSONEncoder,
+    "csv": _CSVEncoder,
+    "parquet": lambda columns, include_header: _ArrowEncoder(columns, include_header, parquet=True),
+    "arrow": lambda columns, include_header: _ArrowEncoder(columns, include_header, parquet=False),
+}
+
+
+def prepare_resume(path: str, fmt: str) -> int | None:
+    """Highest id already written to an NDJSON or CSV export file.
+
+    A trailing partial record left by an interrupted export is truncated so
+    appending continues on a clean line.
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError("Resuming is supported for ndjson and csv files; pass an explicit after_id for columnar formats")
+    if fmt == "csv":
+        # Quoted CSV fields may contain newlines, so the last newline need not end a record
+        position, last_id = _csv_resume_point(path)
+        with open(path, "rb+") as f:
+            f.truncate(position)
+        return last_id
+
+    with open(path, "rb+") as f:
+        f.seek(0, io.SEEK_END)
+        end = f.tell()
+        position = end
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            f.truncate(position)
+
+    line = _last_line(path, position)
+    return json.loads(line)["id"] if line else None
+
+
+def _csv_resume_point(path: str) -> Tuple[int, int | None]:
+    """Byte offset just past the last complete CSV record, and that record's id.
+
+    ``csv.writer`` quotes fields containing newlines and doubles embedded
+    quotes, so a newline ends a record only when the record so far holds an
+    even number of quote characters.
+    """
+    end, last_id = 0, None
+    offset, in_quotes, first_field = 0, False, b""
+    with open(path, "rb") as f:
+        for line in f:
+            if not in_quotes:
+                first_field = line.split(b",", 1)[0]
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            offset += len(line)
+            if line.endswith(b"\n") and not in_quotes:
+                end = offset
+                if first_field.isdigit():
+                    last_id = int(first_field)
+    return end, last_id
+
+
+def _last_line(path: str, end: int) -> bytes:
+    """Last non-empty line before byte offset ``end``, reading backwards in blocks"""
+    with open(path, "rb") as f:
+        position = end
+        block = b""
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + block
+            if b"\n" in block.rstrip(b"\r\n"):
+                break
+    lines = [line for line in block.splitlines() if line.strip()]
+    return lines[-1] if lines else b""
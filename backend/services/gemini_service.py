@@ -1,28 +1,42 @@
-import google.generativeai as genai
-import os
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Tuple
 import json
 import logging
+import time
+
+from metrics import observe_llm_call, observe_stream_chunk
+from services.llm_backends import LLMBackend, extractive_summary, get_llm_backend
+from services.json_stream import JSONStreamParser
 
 class GeminiService:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            # Fall back gracefully when no API key is configured
-            logging.warning("GEMINI_API_KEY not set. GeminiService will use fallback recommendations.")
-            self.model = None
-            return
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    """AI features for the app. Model calls go through the backend selected by LLM_BACKEND"""
+
+    def __init__(self, backend: LLMBackend | None = None):
+        self.backend = backend or get_llm_backend()
+    
+    def chat(self, prompt: str) -> str:
+        """Return a complete chat answer for ``prompt``"""
+        if not self.backend.available:
+            raise RuntimeError("LLM backend not configured")
+        return self.backend.chat(prompt)
+    
+    def score_aptitude(self, prompt: str, answers: Dict[str, Any], questions: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Score aptitude answers per category (0-100). Raises when the backend cannot answer"""
+        if not self.backend.available:
+            raise RuntimeError("LLM backend not configured")
+        return self.backend.generate_json(
+            prompt, "aptitude_scores", {"answers": answers, "questions": questions}
+        )
     
     def stream_chat(self, prompt: str):
         """Yield model tokens incrementally for real-time chat."""
+        started = time.perf_counter()
         try:
-            if self.model is None:
+            if not self.backend.available:
                 # Fallback streaming when no API key/model configured
                 fallback = "I'm running in fallback mode. Configure GEMINI_API_KEY to enable live AI responses."
+                observe_llm_call("stream_chat", started, fallback=True)
                 for chunk in [fallback]:
+                    observe_stream_chunk(chunk)
                     yield chunk
                 return
 
@@ -30,17 +44,53 @@ class GeminiService:
                 yield "Please provide a valid question or message."
                 return
 
-            stream = self.model.generate_content(prompt, stream=True)
-            for event in stream:
-                # Each event may contain text; yield as soon as available
-                text = getattr(event, 'text', None)
-                if text:
-                    yield text
+            for text in self.backend.stream(prompt):
+                observe_stream_chunk(text)
+                yield text
+            observe_llm_call("stream_chat", started)
         except Exception as e:
             logging.error(f"Error in stream_chat: {e}")
+            observe_llm_call("stream_chat", started, fallback=True)
             # Graceful degradation: send a short error message to the client
             yield f"[Error generating response: {str(e)[:100]}]"
     
+    def summarize_conversation(
+        self,
+        previous_summary: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 300
+    ) -> str:
+        """Fold ``messages`` into ``previous_summary`` for bounded chat context"""
+        transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+        prompt = f"""
+        Update the running summary of a career guidance conversation.
+        Keep facts about the user's goals, background, constraints and advice already given.
+        Stay under {max_tokens * 3 // 4} words.
+        
+        Current summary: {previous_summary or "(none)"}
+        
+        New messages:
+        {transcript}
+        
+        Format as JSON: {{"summary": "updated summary"}}
+        """
+        
+        started = time.perf_counter()
+        try:
+            if not self.backend.available:
+                raise RuntimeError("Gemini model not configured; using fallback.")
+            result = self.backend.generate_json(
+                prompt,
+                "conversation_summary",
+                {"previous_summary": previous_summary, "messages": messages, "max_tokens": max_tokens},
+            )
+            observe_llm_call("summarize_conversation", started)
+            return str(result.get("summary", "")) or extractive_summary(previous_summary, messages, max_tokens)
+        except Exception as e:
+            logging.error(f"Error in summarize_conversation: {e}")
+            observe_llm_call("summarize_conversation", started, fallback=True)
+            return extractive_summary(previous_summary, messages, max_tokens)
+    
     def analyze_aptitude_results(self, aptitude_scores: Dict[str, float]) -> Dict[str, Any]:
         """Analyze aptitude test results using Gemini AI"""
         prompt = f"""
@@ -64,21 +114,21 @@ class GeminiService:
         }}
         """
         
+        started = time.perf_counter()
         try:
-            if self.model is None:
+            if not self.backend.available:
                 raise RuntimeError("Gemini model not configured; using fallback.")
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise ValueError("Empty response from Gemini API")
-            
             # Parse and validate JSON response
-            result = json.loads(response.text)
+            result = self.backend.generate_json(prompt, "aptitude_analysis", {"aptitude_scores": aptitude_scores})
+            observe_llm_call("analyze_aptitude_results", started)
             return self._validate_aptitude_analysis(result)
         except (json.JSONDecodeError, ValueError) as e:
             logging.error(f"Failed to parse Gemini response: {e}")
+            observe_llm_call("analyze_aptitude_results", started, fallback=True)
             return self._get_fallback_aptitude_analysis()
         except Exception as e:
             logging.error(f"Error in analyze_aptitude_results: {e}")
+            observe_llm_call("analyze_aptitude_results", started, fallback=True)
             return self._get_fallback_aptitude_analysis()
     
     def generate_career_recommendations(
@@ -90,7 +140,89 @@ class GeminiService:
     ) -> Dict[str, Any]:
         """Generate comprehensive career recommendations using Gemini AI"""
         
-        prompt = f"""
+        prompt = self._career_recommendations_prompt(user_profile, aptitude_scores, interest_scores, skill_evaluation)
+        
+        started = time.perf_counter()
+        try:
+            if not self.backend.available:
+                raise RuntimeError("Gemini model not configured; using fallback.")
+            # Parse and validate JSON response
+            result = self.backend.generate_json(
+                prompt,
+                "career_recommendations",
+                {
+                    "user_profile": user_profile,
+                    "aptitude_scores": aptitude_scores,
+                    "interest_scores": interest_scores,
+                    "skill_evaluation": skill_evaluation,
+                },
+            )
+            observe_llm_call("generate_career_recommendations", started)
+            return self._validate_career_recommendations(result)
+        except (json.JSONDecodeError, ValueError) as e:
+            logging.error(f"Failed to parse Gemini response: {e}")
+            observe_llm_call("generate_career_recommendations", started, fallback=True)
+            return self.get_fallback_recommendations(user_profile, aptitude_scores, interest_scores)
+        except Exception as e:
+            logging.error(f"Error in generate_career_recommendations: {e}")
+            observe_llm_call("generate_career_recommendations", started, fallback=True)
+            return self.get_fallback_recommendations(user_profile, aptitude_scores, interest_scores)
+    
+    def stream_career_recommendations(
+        self,
+        user_profile: Dict[str, Any],
+        aptitude_scores: Dict[str, float],
+        interest_scores: Dict[str, float],
+        skill_evaluation: Dict[str, Any]
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``("career", career)`` as each recommended career is decoded, then ``("result", recommendations)``.
+
+        The model is asked for JSON and its output parsed as it streams. If the
+        document turns out unparseable, careers already decoded are kept and
+        only the missing sections come from the fallback.
+        """
+        prompt = self._career_recommendations_prompt(user_profile, aptitude_scores, interest_scores, skill_evaluation)
+        context = {
+            "user_profile": user_profile,
+            "aptitude_scores": aptitude_scores,
+            "interest_scores": interest_scores,
+            "skill_evaluation": skill_evaluation,
+        }
+        parser = JSONStreamParser("recommended_careers")
+        careers: List[Dict[str, Any]] = []
+        started = time.perf_counter()
+        try:
+            if not self.backend.available:
+                raise RuntimeError("Gemini model not configured; using fallback.")
+            for chunk in self.backend.stream_json(prompt, "career_recommendations", context):
+                observe_stream_chunk(chunk)
+                for career in parser.feed(chunk):
+                    if isinstance(career, dict):
+                        careers.append(career)
+                        yield "career", career
+            result = self._validate_career_recommendations(parser.result())
+            observe_llm_call("stream_career_recommendations", started)
+        except Exception as e:
+            logging.error(f"Error in stream_career_recommendations: {e}")
+            observe_llm_call("stream_career_recommendations", started, fallback=True)
+            result = self.get_fallback_recommendations(user_profile, aptitude_scores, interest_scores)
+            if careers:
+                result["recommended_careers"] = careers
+
+        if not careers:
+            # Fallback careers, or ones the incremental pass could not isolate
+            for career in result["recommended_careers"]:
+                yield "career", career
+        yield "result", result
+
+    def _career_recommendations_prompt(
+        self,
+        user_profile: Dict[str, Any],
+        aptitude_scores: Dict[str, float],
+        interest_scores: Dict[str, float],
+        skill_evaluation: Dict[str, Any]
+    ) -> str:
+        return f"""
         Generate comprehensive career recommendations based on the following user profile and assessments:
         
         User Profile:
@@ -99,6 +231,7 @@ class GeminiService:
         - Industry: {user_profile.get('industry', 'Not specified')}
         - Education: {user_profile.get('educational_background', 'Not specified')}
         - Experience: {user_profile.get('years_of_experience', 0)} years
+        - Personality Traits: {json.dumps(user_profile.get('personality_traits') or {})}
         
         Aptitude Scores: {json.dumps(aptitude_scores, indent=2)}
         Interest Scores: {json.dumps(interest_scores, indent=2)}
@@ -136,23 +269,6 @@ class GeminiService:
             "rationale": "Detailed explanation of recommendations"
         }}
         """
-        
-        try:
-            if self.model is None:
-                raise RuntimeError("Gemini model not configured; using fallback.")
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise ValueError("Empty response from Gemini API")
-            
-            # Parse and validate JSON response
-            result = json.loads(response.text)
-            return self._validate_career_recommendations(result)
-        except (json.JSONDecodeError, ValueError) as e:
-            logging.error(f"Failed to parse Gemini response: {e}")
-            return self.get_fallback_recommendations(user_profile, aptitude_scores, interest_scores)
-        except Exception as e:
-            logging.error(f"Error in generate_career_recommendations: {e}")
-            return self.get_fallback_recommendations(user_profile, aptitude_scores, interest_scores)
     
     def get_fallback_recommendations(
         self, 
@@ -221,21 +337,21 @@ class GeminiService:
         }}
         """
         
+        started = time.perf_counter()
         try:
-            if self.model is None:
+            if not self.backend.available:
                 raise RuntimeError("Gemini model not configured; using fallback.")
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise ValueError("Empty response from Gemini API")
-            
             # Parse and validate JSON response
-            result = json.loads(response.text)
+            result = self.backend.generate_json(prompt, "skill_gaps", {"current_skills": current_skills, "target_role": target_role})
+            observe_llm_call("analyze_skill_gaps", started)
             return self._validate_skill_gaps_analysis(result)
         except (json.JSONDecodeError, ValueError) as e:
             logging.error(f"Failed to parse Gemini response: {e}")
+            observe_llm_call("analyze_skill_gaps", started, fallback=True)
             return self._get_fallback_skill_gaps()
         except Exception as e:
             logging.error(f"Error in analyze_skill_gaps: {e}")
+            observe_llm_call("analyze_skill_gaps", started, fallback=True)
             return self._get_fallback_skill_gaps()
     
     def _validate_aptitude_analysis(self, data: Dict[str, Any]) -> Dict[str, Any]:
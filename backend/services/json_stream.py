@@ -0,0 +1,106 @@
+"""Incremental parsing of a streamed JSON object.
+
+``JSONStreamParser`` is fed model output chunk by chunk and returns each
+element of one top-level array (e.g. ``recommended_careers``) as soon as its
+closing bracket arrives, without waiting for the rest of the document. It
+tracks only string/escape state and container nesting, so each character is
+looked at once. Text before the first ``{`` (a markdown fence, a preamble)
+and anything after the top-level object closes is ignored.
+"""
+import json
+from typing import Any, Dict, List
+
+from services.llm_backends import parse_json_response
+
+
+class JSONStreamParser:
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._text: List[str] = []
+        self._length = 0
+        self._start = -1  # Offset of the top-level "{"
+        self._end = -1  # Offset just past the matching "}"
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key: str | None = None  # Latest string at depth 1, i.e. the key before ":"
+        self._in_target = False
+        self._element_start = -1
+
+    @property
+    def finished(self) -> bool:
+        return self._end != -1
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume ``chunk``; return the array elements it completed"""
+        completed = []
+        offset = self._length
+        self._text.append(chunk)
+        self._length += len(chunk)
+        if self.finished:
+            return completed
+
+        for i, char in enumerate(chunk):
+            position = offset + i
+            if self._start == -1:
+                if char == "{":
+                    self._start = position
+                    self._stack.append("{")
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = self._slice(self._string_start, position + 1, chunk, offset)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char in "{[":
+                if char == "[" and len(self._stack) == 1 and self._last_key == json.dumps(self.array_key):
+                    self._in_target = True
+                elif self._in_target and len(self._stack) == 2:
+                    self._element_start = position
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._in_target and len(self._stack) == 2 and self._element_start != -1:
+                    text = self._slice(self._element_start, position + 1, chunk, offset)
+                    self._element_start = -1
+                    try:
+                        completed.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        pass  # Malformed element; the final parse decides what survives
+                elif self._in_target and len(self._stack) == 1:
+                    self._in_target = False
+                if not self._stack:
+                    self._end = position + 1
+                    break
+        return completed
+
+    def result(self) -> Dict[str, Any]:
+        """The whole document once the stream has ended; raises ValueError when it is not valid JSON"""
+        text = "".join(self._text)
+        if self.finished:
+            try:
+                return json.loads(text[self._start:self._end])
+            except json.JSONDecodeError:
+                pass
+        return parse_json_response(text)
+
+    def _slice(self, start: int, end: int, chunk: str, chunk_offset: int) -> str:
+        if start >= chunk_offset:
+            return chunk[start - chunk_offset:end - chunk_offset]
+        # Spans earlier chunks; joining is rare (only for elements and keys split across chunks)
+        joined = "".join(self._text)
+        self._text = [joined]
+        return joined[start:end]
@@ -0,0 +1,372 @@
+"""LLM backends behind a single chat / stream / structured-JSON interface.
+
+``GeminiService`` talks to whichever backend ``LLM_BACKEND`` selects:
+
+- ``gemini`` (default): Google Gemini via ``google.generativeai``
+- ``local``: deterministic rule-based answers computed from the local scoring
+  logic and career catalog; no network, answers in microseconds
+- ``openai_compatible``: a self-hosted model server exposing the OpenAI chat
+  completions API, e.g. llama.cpp or vLLM on localhost
+
+Backends raise on failure; ``GeminiService`` owns the fallback behaviour.
+"""
+from abc import ABC, abstractmethod
+import json
+import logging
+import os
+import re
+import urllib.request
+from typing import Any, Dict, Iterator, List
+
+from services.career_catalog import CAREER_CATALOG, find_career
+from services.skill_normalizer import normalize_skill_levels
+
+_json_fence_pattern = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def parse_json_response(text: str) -> Dict[str, Any]:
+    """Parse model output as JSON, tolerating markdown fences and surrounding prose"""
+    if not text:
+        raise ValueError("Empty response from LLM backend")
+    cleaned = _json_fence_pattern.sub("", text.strip())
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(cleaned[start:end + 1])
+
+
+def extractive_summary(previous_summary: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """First sentence of every message appended to the previous summary, keeping the newest text within budget"""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        first_sentence = re.split(r"(?<=[.!?])\s", message["content"].strip(), maxsplit=1)[0]
+        lines.append(f"{message['role']}: {first_sentence[:300]}")
+    summary = " ".join(lines)
+    max_chars = max(200, max_tokens * 4)
+    return summary if len(summary) <= max_chars else "..." + summary[-max_chars:]
+
+
+class LLMBackend(ABC):
+    """Interface implemented by every backend"""
+
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def chat(self, prompt: str) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def generate_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a JSON object for ``task``.
+
+        ``prompt`` is the natural-language request for model backends;
+        ``context`` carries the same inputs in structured form for backends
+        that compute the answer directly.
+        """
+
+    def stream_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Iterator[str]:
+        """Yield the JSON answer for ``task`` as it is generated; backends that compute it send one piece"""
+        yield json.dumps(self.generate_json(prompt, task, context))
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: str | None = None, model_name: str | None = None):
+        import google.generativeai as genai
+
+        api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self.model_name = model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        if not api_key:
+            # Fall back gracefully when no API key is configured
+            logging.warning("GEMINI_API_KEY not set. GeminiService will use fallback recommendations.")
+            self.model = None
+            return
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def chat(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt)
+        if not response.text:
+            raise ValueError("Empty response from Gemini API")
+        return response.text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for event in self.model.generate_content(prompt, stream=True):
+            # Each event may contain text; yield as soon as available
+            text = getattr(event, "text", None)
+            if text:
+                yield text
+
+    def generate_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.model.generate_content(
+            prompt, generation_config={"response_mime_type": "application/json"}
+        )
+        return parse_json_response(response.text)
+
+    def stream_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Iterator[str]:
+        for event in self.model.generate_content(
+            prompt, stream=True, generation_config={"response_mime_type": "application/json"}
+        ):
+            text = getattr(event, "text", None)
+            if text:
+                yield text
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Self-hosted model server speaking the OpenAI ``/chat/completions`` protocol"""
+
+    name = "openai_compatible"
+
+    def __init__(self, base_url: str | None = None, model_name: str | None = None, timeout: float | None = None):
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL", "http://localhost:8080/v1")).rstrip("/")
+        self.model_name = model_name or os.getenv("LLM_MODEL", "local-model")
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.api_key = os.getenv("LLM_API_KEY", "")
+
+    def _post(self, payload: Dict[str, Any]):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(payload).encode("utf-8"),
+            headers=headers,
+            method="POST",
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _payload(self, prompt: str, **extra) -> Dict[str, Any]:
+        return {"model": self.model_name, "messages": [{"role": "user", "content": prompt}], **extra}
+
+    def chat(self, prompt: str) -> str:
+        with self._post(self._payload(prompt)) as response:
+            body = json.loads(response.read().decode("utf-8"))
+        return body["choices"][0]["message"]["content"]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        return self._stream(self._payload(prompt, stream=True))
+
+    def _stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        with self._post(payload) as response:
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    def generate_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        payload = self._payload(prompt, response_format={"type": "json_object"})
+        with self._post(payload) as response:
+            body = json.loads(response.read().decode("utf-8"))
+        return parse_json_response(body["choices"][0]["message"]["content"])
+
+    def stream_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Iterator[str]:
+        return self._stream(self._payload(prompt, stream=True, response_format={"type": "json_object"}))
+
+
+class LocalBackend(LLMBackend):
+    """Deterministic template/rule-based backend.
+
+    Answers are derived from the structured ``context`` using the same scoring
+    rules as the rest of the app, so results are stable across runs and cost
+    no network round trip.
+    """
+
+    name = "local"
+
+    CHAT_TOPICS = [
+        (("resume", "cv"), "Keep your resume to one or two pages, lead with measurable achievements and tailor the skills section to each job description."),
+        (("interview",), "Prepare three short stories that show problem solving, teamwork and learning from failure, and research the company's products before the interview."),
+        (("salary", "pay", "negotiat"), "Research market ranges for the role and location, anchor on the value you bring, and negotiate the whole package rather than base pay alone."),
+        (("switch", "change", "transition"), "Map the skills that transfer from your current role, close the largest gap with a focused course or project, and talk to people already doing the target job."),
+        (("skill", "learn", "course"), "Pick one or two priority skills from your skill gap report, practise them through small projects, and review progress every few weeks."),
+    ]
+    DEFAULT_CHAT = (
+        "Start from your assessment results: your strongest aptitudes and interests point to the careers on your "
+        "recommendations page. Use the skill gap report to choose what to learn next."
+    )
+
+    def chat(self, prompt: str) -> str:
+        text = (prompt or "").lower()
+        for keywords, answer in self.CHAT_TOPICS:
+            if any(keyword in text for keyword in keywords):
+                return answer
+        return self.DEFAULT_CHAT
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for word in re.findall(r"\S+\s*", self.chat(prompt)):
+            yield word
+
+    def generate_json(self, prompt: str, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        handler = getattr(self, f"_task_{task}", None)
+        if handler is None:
+            raise ValueError(f"Local backend does not support task: {task}")
+        return handler(**context)
+
+    def _task_conversation_summary(
+        self, previous_summary: str, messages: List[Dict[str, str]], max_tokens: int
+    ) -> Dict[str, str]:
+        return {"summary": extractive_summary(previous_summary, messages, max_tokens)}
+
+    def _task_aptitude_scores(self, answers: Dict[str, Any], questions: List[Dict[str, Any]]) -> Dict[str, float]:
+        from services.assessment_service import score_aptitude_rule_based
+
+        return score_aptitude_rule_based(answers, questions)
+
+    def _task_aptitude_analysis(self, aptitude_scores: Dict[str, float]) -> Dict[str, Any]:
+        ranked = sorted(aptitude_scores.items(), key=lambda item: item[1], reverse=True)
+        strengths = [name.replace("_", " ").title() for name, _ in ranked[:2]]
+        weaknesses = [name.replace("_", " ").title() for name, _ in ranked[2:][-2:]]
+        careers = self._rank_careers(aptitude_scores, {}, {})[:3]
+        return {
+            "strengths": strengths,
+            "improvement_areas": weaknesses,
+            "suitable_careers": sorted({career["industry"] for career, _, _ in careers}),
+            "recommended_roles": [career["title"] for career, _, _ in careers],
+            "analysis_summary": f"Strongest in {', '.join(strengths) or 'no measured area yet'}.",
+        }
+
+    def _task_career_recommendations(
+        self,
+        user_profile: Dict[str, Any],
+        aptitude_scores: Dict[str, float],
+        interest_scores: Dict[str, float],
+        skill_evaluation: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        user_skills: Dict[str, Any] = {}
+        for group in ("technical_skills", "soft_skills", "industry_skills"):
+            user_skills.update(skill_evaluation.get(group) or {})
+        # Catalog requirements use canonical names
+        user_skills = normalize_skill_levels(user_skills)
+
+        ranked = self._rank_careers(aptitude_scores, interest_scores, user_skills)[:3]
+        recommended = []
+        missing: List[str] = []
+        for career, skill_match, interest_alignment in ranked:
+            recommended.append({
+                "title": career["title"],
+                "industry": career["industry"],
+                "skill_match_score": round(skill_match, 2),
+                "interest_alignment_score": round(interest_alignment, 2),
+                "overall_score": round(0.6 * skill_match + 0.4 * interest_alignment, 2),
+                "description": career["description"],
+                "required_skills": list(career["required_skills"]),
+                "growth_potential": career["growth_potential"],
+                "salary_range": career["salary_range"],
+            })
+            for skill, level in career["required_skills"].items():
+                current = user_skills.get(skill)
+                if (not isinstance(current, (int, float)) or current < level) and skill not in missing:
+                    missing.append(skill)
+
+        top = recommended[0]["title"] if recommended else "your target role"
+        return {
+            "recommended_careers": recommended,
+            "career_progression_path": {
+                "short_term": [f"Strengthen {skill}" for skill in missing[:2]] or ["Build a portfolio project"],
+                "long_term": [f"Senior {top}", "Team Lead"],
+            },
+            "skill_development_plan": {
+                "priority_skills": missing[:3],
+                "learning_resources": ["Online courses", "Hands-on projects", "Mentorship"],
+                "timeline": "6-12 months",
+            },
+            "market_trend_analysis": {
+                "industry_trends": ["Automation", "Data-driven decision making"],
+                "demand_forecast": ranked[0][0]["growth_potential"] if ranked else "Medium",
+                "emerging_roles": [career["title"] for career, _, _ in ranked[1:]],
+            },
+            "rationale": (
+                f"Ranked {len(CAREER_CATALOG)} careers by skill match (60%) and interest and aptitude alignment (40%); "
+                f"{top} scored highest."
+            ),
+        }
+
+    def _task_skill_gaps(self, current_skills: Dict[str, Any], target_role: str) -> Dict[str, Any]:
+        career = find_career(target_role)
+        required = career["required_skills"] if career else {}
+        missing = [skill for skill in required if skill not in current_skills]
+        to_improve = [
+            skill for skill, level in required.items()
+            if isinstance(current_skills.get(skill), (int, float)) and current_skills[skill] < level
+        ]
+        priority = sorted(missing + to_improve, key=lambda skill: -(required[skill] - (current_skills.get(skill) or 0)))
+        return {
+            "missing_skills": missing,
+            "skills_to_improve": to_improve,
+            "learning_recommendations": [f"Take a structured course in {skill}" for skill in priority[:3]],
+            "priority_order": priority,
+            "estimated_timeline": "3-6 months" if len(priority) <= 2 else "6-12 months",
+        }
+
+    @staticmethod
+    def _rank_careers(
+        aptitude_scores: Dict[str, float], interest_scores: Dict[str, float], user_skills: Dict[str, Any]
+    ):
+        """Score every catalog career. Returns (career, skill_match, interest_alignment) best first"""
+        max_interest = max([v for v in interest_scores.values() if isinstance(v, (int, float))] + [0]) or 1.0
+        ranked = []
+        for career in CAREER_CATALOG:
+            required = career["required_skills"]
+            skill_match = sum(
+                min(user_skills[skill] / level, 1.0)
+                for skill, level in required.items()
+                if isinstance(user_skills.get(skill), (int, float))
+            ) / len(required)
+            aptitude_fit = sum(
+                weight * float(aptitude_scores.get(category) or 0) / 100.0
+                for category, weight in career["aptitude_weights"].items()
+            )
+            interest_fit = sum(
+                weight * float(interest_scores.get(category) or 0) / max_interest
+                for category, weight in career["interest_weights"].items()
+            )
+            interest_alignment = (aptitude_fit + interest_fit) / 2 if interest_scores else aptitude_fit
+            ranked.append((career, skill_match, interest_alignment))
+        ranked.sort(key=lambda item: (0.6 * item[1] + 0.4 * item[2], item[0]["title"]), reverse=True)
+        return ranked
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "local": LocalBackend,
+    "openai_compatible": OpenAICompatibleBackend,
+}
+
+_default_backend: LLMBackend | None = None
+
+
+def get_llm_backend(name: str | None = None) -> LLMBackend:
+    """Backend selected by ``name`` or ``LLM_BACKEND``. The default instance is created once per process"""
+    global _default_backend
+    if name is None and _default_backend is not None:
+        return _default_backend
+
+    backend_name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend_name}'. Choose one of: {', '.join(BACKENDS)}")
+    backend = BACKENDS[backend_name]()
+    if name is None:
+        _default_backend = backend
+    return backend
@@ -0,0 +1,375 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import IntegrityError
+from models import ScoreSketch, Assessment, User, InstrumentRelease
+from schemas import AssessmentResponse
+from quantile_sketch import TDigest
+from services.archive_service import ArchiveService
+from services.psychometrics import INSTRUMENTS, get_instrument
+from database import SessionLocal
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple, Any
+import itertools
+import logging
+import os
+import threading
+import time
+
+MAX_UPDATE_ATTEMPTS = 5
+# Row inserted by the worker that runs the startup backfill, so only one does
+BACKFILL_CLAIM_KEY = "__backfill__"
+
+# (instrument, version) pairs this process has confirmed in instrument_releases
+_registered_releases: set = set()
+
+
+class SketchBuffer:
+    """Scores of committed assessments not yet merged into the stored sketches.
+
+    One per worker process. ``PercentileService.flush`` merges it into the
+    ``ScoreSketch`` rows every ``PERCENTILE_FLUSH_SECONDS``; a key whose
+    compare-and-swap keeps conflicting goes back into the buffer for the next
+    flush instead of being dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, str, Dict[str, TDigest]]] = {}
+        self._samples = 0
+        self._merged = 0
+        self._conflicts = 0
+
+    def add(self, key: str, assessment_type: str, cohort: str, scores: Dict[str, float]) -> None:
+        with self._lock:
+            _, _, digests = self._pending.setdefault(key, (assessment_type, cohort, {}))
+            for category, value in scores.items():
+                digests.setdefault(category, TDigest()).add(value)
+            self._samples += 1
+
+    def take(self) -> Dict[str, Tuple[str, str, Dict[str, TDigest]]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._samples = 0
+            return pending
+
+    def restore(self, key: str, assessment_type: str, cohort: str, digests: Dict[str, TDigest]) -> None:
+        """Put back a key that could not be merged, ahead of anything buffered since"""
+        with self._lock:
+            _, _, current = self._pending.setdefault(key, (assessment_type, cohort, {}))
+            for category, digest in digests.items():
+                current.setdefault(category, TDigest()).merge(digest)
+            self._samples += int(max((digest.count for digest in digests.values()), default=0))
+
+    def record_flush(self, merged: int, conflicts: int) -> None:
+        with self._lock:
+            self._merged += merged
+            self._conflicts += conflicts
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending_keys": len(self._pending),
+                "pending_samples": self._samples,
+                "merged": self._merged,
+                "conflicts": self._conflicts,
+            }
+
+
+sketch_buffer = SketchBuffer()
+
+
+class PercentileService:
+    """Percentile ranks of assessment scores from stored t-digest sketches.
+
+    One ``ScoreSketch`` row per assessment type and cohort ("all" plus one per
+    value of each ``PERCENTILE_COHORTS`` user field) holds a digest for every
+    score category, so ranking a score is a primary-key read instead of a scan
+    over ``Assessment.scores``. New scores are buffered per worker
+    (``sketch_buffer``) and merged into the rows periodically with a version
+    compare-and-swap, which keeps the shared ``<type>:all`` row off the
+    request path.
+
+    Interest and personality scores are kept per instrument version
+    (``interest@2024.1:all``), so scores on different scales never share a
+    sketch. Assessments completed before the first release of an instrument
+    (unnormalized sums from the old client-keyed scoring) are left out of the
+    sketches and get no ranks.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.cohort_fields = [
+            field.strip() for field in os.getenv("PERCENTILE_COHORTS", "age_range,industry").split(",")
+            if field.strip() and hasattr(User, field.strip())
+        ]
+        # Below this many samples a rank says more about the sample than the user
+        self.min_sample = int(os.getenv("PERCENTILE_MIN_SAMPLE", "10"))
+        self.etag_seconds = max(1.0, float(os.getenv("PERCENTILE_ETAG_SECONDS", "3600")))
+        self._releases: Dict[str, List[Tuple[datetime, str]]] | None = None
+
+    def register_release(self, instrument: str) -> None:
+        """Record the current version of ``instrument`` as released; call before storing an assessment it scored"""
+        version = get_instrument(instrument).version
+        if (instrument, version) in _registered_releases:
+            return
+        if self.db.get(InstrumentRelease, (instrument, version)) is None:
+            try:
+                # Committed on its own so released_at precedes the assessment's completed_at
+                self.db.add(InstrumentRelease(instrument=instrument, version=version))
+                self.db.commit()
+            except IntegrityError:
+                # Another worker registered it first
+                self.db.rollback()
+        _registered_releases.add((instrument, version))
+        self._releases = None
+
+    def record_assessment(self, assessment: Assessment) -> None:
+        """Buffer a committed assessment's scores for the next ``flush``"""
+        scores = _numeric_scores(assessment.scores)
+        if not scores:
+            return
+        sketch_type = self._sketch_type(assessment.assessment_type, assessment.completed_at)
+        if sketch_type is None:
+            return
+        user = self.db.get(User, assessment.user_id)
+        for key, cohort in self._sketch_keys(sketch_type, user):
+            sketch_buffer.add(key, assessment.assessment_type, cohort, scores)
+
+    def flush(self) -> int:
+        """Merge this worker's buffered scores into the stored sketches; returns how many keys were merged"""
+        merged = conflicts = 0
+        for key, (assessment_type, cohort, digests) in sketch_buffer.take().items():
+            try:
+                if self._merge_digests(key, assessment_type, cohort, digests):
+                    merged += 1
+                    continue
+                conflicts += 1
+                logging.warning(
+                    f"Score sketch {key} still conflicting after {MAX_UPDATE_ATTEMPTS} attempts; retrying next flush"
+                )
+            except Exception as e:
+                self.db.rollback()
+                logging.error(f"Merging score sketch {key} failed: {e}")
+            sketch_buffer.restore(key, assessment_type, cohort, digests)
+        sketch_buffer.record_flush(merged, conflicts)
+        return merged
+
+    def attach_percentiles(self, responses: List[AssessmentResponse], user: User) -> List[AssessmentResponse]:
+        """Fill ``percentiles`` / ``cohort_percentiles`` on responses, loading each sketch row once"""
+        sketch_types = [self._sketch_type(r.assessment_type, r.completed_at) for r in responses]
+        keys = {
+            key: cohort
+            for sketch_type in set(sketch_types) - {None}
+            for key, cohort in self._sketch_keys(sketch_type, user)
+        }
+        if not keys:
+            return responses
+        rows = self.db.execute(
+            select(ScoreSketch.sketch_key, ScoreSketch.sketches).where(ScoreSketch.sketch_key.in_(keys))
+        ).all()
+        sketches = {key: data or {} for key, data in rows}
+        digests: Dict[Tuple[str, str], TDigest] = {}
+
+        for response, sketch_type in zip(responses, sketch_types):
+            if sketch_type is None:
+                continue
+            cohort_percentiles = {}
+            for key, cohort in self._sketch_keys(sketch_type, user):
+                ranks = {}
+                for category, value in _numeric_scores(response.scores).items():
+                    if (key, category) not in digests:
+                        digests[(key, category)] = TDigest.from_dict(sketches.get(key, {}).get(category))
+                    digest = digests[(key, category)]
+                    if digest.count >= self.min_sample:
+                        ranks[category] = round(100 * digest.cdf(value), 1)
+                if not ranks:
+                    continue
+                if cohort == "all":
+                    response.percentiles = ranks
+                else:
+                    cohort_percentiles[cohort.split("=", 1)[0]] = ranks
+            response.cohort_percentiles = cohort_percentiles or None
+        return responses
+
+    def sketch_epoch(self, user: User) -> Tuple[Any, ...]:
+        """Coarse validator part for attached percentiles: the user's cohorts and a time bucket.
+
+        Every assessment anywhere moves the shared sketches, so versioning on
+        them would change every user's ETag on every submission. Population
+        ranks drift slowly; cached bodies may carry ranks up to
+        ``PERCENTILE_ETAG_SECONDS`` old.
+        """
+        cohorts = [cohort for _, cohort in self._sketch_keys("", user)]
+        versions = [get_instrument(name).version for name in sorted(INSTRUMENTS)]
+        return (",".join(cohorts), *versions, int(time.time() // self.etag_seconds))
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute every sketch from assessment history (hot and archived) in one streaming pass.
+
+        Rows are replaced key by key through the same compare-and-swap as
+        ``flush``, so workers can keep flushing meanwhile. A key first created
+        by a flush during the scan gets the rebuilt history merged into it; a
+        key that existed and was flushed during the scan is replaced with the
+        rebuilt digests (counted as a conflict, since those flushed scores may
+        be missing until the next rebuild).
+        """
+        versions_at_start = dict(self.db.execute(select(ScoreSketch.sketch_key, ScoreSketch.version)).all())
+        self.db.commit()
+
+        cohort_columns = [getattr(User, field) for field in self.cohort_fields]
+        rows = self.db.query(
+            Assessment.assessment_type, Assessment.completed_at, Assessment.scores, *cohort_columns
+        ).join(User, User.id == Assessment.user_id).yield_per(batch_size)
+        archived_rows = ArchiveService(self.db).iter_archived_assessment_scores(cohort_columns, batch_size)
+
+        digests: Dict[str, Dict[str, TDigest]] = {}
+        cohorts: Dict[str, Tuple[str, str]] = {}
+        processed = 0
+        for assessment_type, completed_at, scores, *cohort_values in itertools.chain(rows, archived_rows):
+            scores = _numeric_scores(scores)
+            sketch_type = self._sketch_type(assessment_type, completed_at)
+            if not scores or sketch_type is None:
+                continue
+            user_fields = dict(zip(self.cohort_fields, cohort_values))
+            for key, cohort in self._keys_for(sketch_type, user_fields):
+                cohorts[key] = (assessment_type, cohort)
+                per_category = digests.setdefault(key, {})
+                for category, value in scores.items():
+                    per_category.setdefault(category, TDigest()).add(value)
+            processed += 1
+        self.db.commit()
+
+        conflicts = 0
+        for key, per_category in digests.items():
+            assessment_type, cohort = cohorts[key]
+            sketches = {category: digest.to_dict() for category, digest in per_category.items()}
+            if key not in versions_at_start:
+                if not self._write_sketch(key, assessment_type, cohort, sketches, None):
+                    # A flush created the row during the scan; keep its scores and add the history
+                    self._merge_digests(key, assessment_type, cohort, per_category)
+                continue
+            version = versions_at_start[key]
+            for _ in range(MAX_UPDATE_ATTEMPTS):
+                if self._write_sketch(key, assessment_type, cohort, sketches, version):
+                    break
+                conflicts += 1
+                logging.warning(f"Score sketch {key} was flushed during the rebuild; replacing it anyway")
+                version = self.db.execute(
+                    select(ScoreSketch.version).where(ScoreSketch.sketch_key == key)
+                ).scalar()
+                self.db.commit()
+            else:
+                logging.error(f"Score sketch {key} kept conflicting; left as flushed, rerun the rebuild")
+
+        # Sketches with no scores left in history, unless a flush has written to them since
+        for key, version in versions_at_start.items():
+            if key not in digests:
+                self.db.execute(delete(ScoreSketch).where(ScoreSketch.sketch_key == key, ScoreSketch.version == version))
+        self.db.commit()
+        sketch_buffer.record_flush(0, conflicts)
+        logging.info(f"Rebuilt {len(digests)} score sketches from {processed} assessments")
+        return processed
+
+    def rebuild_if_empty(self) -> None:
+        """Backfill sketches for databases that have assessments but no sketches yet.
+
+        Safe to call from every worker at startup: the first one to insert the
+        backfill claim row runs the rebuild, the others skip it.
+        """
+        if self.db.query(ScoreSketch.sketch_key).first() is not None or self.db.query(Assessment.id).first() is None:
+            return
+        if not self._write_sketch(BACKFILL_CLAIM_KEY, "", "", {}, None):
+            return
+        self.rebuild()
+
+    def _write_sketch(self, key: str, assessment_type: str, cohort: str, sketches: Dict[str, Any],
+                      version: int | None) -> bool:
+        """Insert the row for ``key`` (``version`` None) or replace it if still at ``version``; commits, False on a lost race"""
+        if version is None:
+            try:
+                self.db.execute(insert(ScoreSketch).values(
+                    sketch_key=key, assessment_type=assessment_type, cohort=cohort,
+                    sketches=sketches, version=0
+                ))
+                self.db.commit()
+                return True
+            except IntegrityError:
+                self.db.rollback()
+                return False
+        result = self.db.execute(
+            update(ScoreSketch)
+            .where(ScoreSketch.sketch_key == key, ScoreSketch.version == version)
+            .values(sketches=sketches, version=version + 1)
+        )
+        self.db.commit()
+        return bool(result.rowcount)
+
+    def _merge_digests(self, key: str, assessment_type: str, cohort: str, digests: Dict[str, TDigest]) -> bool:
+        """Merge ``digests`` into the row for ``key`` and commit; False if every attempt lost the race"""
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            row = self.db.execute(
+                select(ScoreSketch.sketches, ScoreSketch.version).where(ScoreSketch.sketch_key == key)
+            ).first()
+            sketches = dict(row.sketches or {}) if row else {}
+            for category, digest in digests.items():
+                stored = TDigest.from_dict(sketches.get(category))
+                stored.merge(digest)
+                sketches[category] = stored.to_dict()
+            # Another worker may create or update the row first; merge into theirs
+            if self._write_sketch(key, assessment_type, cohort, sketches, row.version if row else None):
+                return True
+        return False
+
+    def _sketch_type(self, assessment_type: str, completed_at: datetime | None) -> str | None:
+        """Sketch namespace for a score: the type, versioned for instruments; None if it predates every release"""
+        if assessment_type not in INSTRUMENTS:
+            return assessment_type
+        if self._releases is None:
+            self._releases = {}
+            for instrument, version, released_at in self.db.execute(
+                select(InstrumentRelease.instrument, InstrumentRelease.version, InstrumentRelease.released_at)
+                .order_by(InstrumentRelease.released_at)
+            ):
+                self._releases.setdefault(instrument, []).append((_utc(released_at), version))
+        completed = _utc(completed_at) if completed_at is not None else None
+        version = None
+        for released_at, release_version in self._releases.get(assessment_type, []):
+            if completed is not None and released_at > completed:
+                break
+            version = release_version
+        return f"{assessment_type}@{version}" if version else None
+
+    def _sketch_keys(self, sketch_type: str, user: User | None) -> List[Tuple[str, str]]:
+        user_fields = {field: getattr(user, field, None) for field in self.cohort_fields}
+        return self._keys_for(sketch_type, user_fields)
+
+    def _keys_for(self, sketch_type: str, user_fields: Dict[str, Any]) -> List[Tuple[str, str]]:
+        keys = [(f"{sketch_type}:all", "all")]
+        for field, value in user_fields.items():
+            if value is None or not str(value).strip():
+                continue
+            cohort = f"{field}={str(value).strip().lower()}"[:200]
+            keys.append((f"{sketch_type}:{cohort}", cohort))
+        return keys
+
+
+def _utc(moment: datetime) -> datetime:
+    """Naive UTC, so SQLite's naive and other backends' aware timestamps compare"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _numeric_scores(scores: Dict[str, Any] | None) -> Dict[str, float]:
+    return {
+        category: float(value)
+        for category, value in (scores or {}).items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def flush_score_sketches() -> int:
+    """Periodic task: merge the worker's buffered scores in its own session"""
+    db = SessionLocal()
+    try:
+        return PercentileService(db).flush()
+    finally:
+        db.close()
@@ -0,0 +1,220 @@
+"""Server-keyed scoring for the interest and personality instruments.
+
+Each instrument is a list of Likert items. Every item loads on one or more
+traits (cross-loadings allowed), and some are reverse-keyed. The client only
+sends the response per item id (``{"E1": 4, ...}``). Keys, weights and
+reversal live here, so the client cannot choose what an answer counts towards.
+
+An instrument is compiled once per version into an item x trait weight
+matrix. Reverse keying is folded in: with x the responses rescaled to 0..1, m
+the answered-item mask and r the reverse mask, the trait score is
+
+    ((x*m) @ W_signed + m @ W_reverse) / (m @ |W|)
+
+where W_signed = (1 - 2r) * W and W_reverse = r * W. The numerator is one
+product of ``[x*m | m]`` with the stacked matrix. Scores are 0-100 weighted
+means over the answered items, so unanswered items don't drag a trait down; a
+trait with no answered item is left out of the scores rather than scored 0. A
+batch of answer sets is one matrix-matrix product. Without numpy the same
+sums run over the sparse item rows.
+
+Answers in the old client-keyed shape (``{"q1": {"openness": 4}}``) are
+rejected with ``ValueError``: they let the client pick the trait an answer
+counts towards.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional (see requirements.txt)
+    np = None
+
+INTEREST_CATEGORIES = ["technology", "business", "healthcare", "education", "arts", "science", "engineering", "social_work"]
+BIG_FIVE_TRAITS = ["openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism"]
+
+
+def _item(item_id: str, text: str, keys: Dict[str, float], reverse: bool = False) -> Dict[str, Any]:
+    return {"id": item_id, "text": text, "keys": keys, "reverse": reverse}
+
+
+INSTRUMENTS: Dict[str, Dict[str, Any]] = {
+    "interest": {
+        "version": "2024.1",
+        "prompt": "How much would you enjoy this activity?",
+        "scale": (1, 5),  # 1 = strongly dislike, 5 = strongly enjoy
+        "traits": INTEREST_CATEGORIES,
+        "items": [
+            _item("T1", "Write software or automate a task with code", {"technology": 1.0, "engineering": 0.3}),
+            _item("T2", "Set up and troubleshoot computers or networks", {"technology": 1.0}),
+            _item("T3", "Spend a day configuring software settings", {"technology": 1.0}, reverse=True),
+            _item("B1", "Run a small business or side project", {"business": 1.0}),
+            _item("B2", "Negotiate a deal or pitch an idea", {"business": 1.0, "social_work": 0.2}),
+            _item("B3", "Analyse budgets and sales figures", {"business": 0.7, "science": 0.3}),
+            _item("H1", "Care for people who are ill or injured", {"healthcare": 1.0, "social_work": 0.3}),
+            _item("H2", "Learn how the human body works", {"healthcare": 0.7, "science": 0.3}),
+            _item("H3", "Work in a hospital or clinic", {"healthcare": 1.0}),
+            _item("ED1", "Explain a difficult topic to someone", {"education": 1.0}),
+            _item("ED2", "Plan lessons or training sessions", {"education": 1.0}),
+            _item("ED3", "Mentor someone newer than you", {"education": 0.7, "social_work": 0.3}),
+            _item("A1", "Draw, paint or design graphics", {"arts": 1.0}),
+            _item("A2", "Write stories, scripts or music", {"arts": 1.0}),
+            _item("A3", "Design the look and feel of an app", {"arts": 0.6, "technology": 0.4}),
+            _item("S1", "Run experiments and record the results", {"science": 1.0}),
+            _item("S2", "Read research about how nature works", {"science": 1.0}),
+            _item("S3", "Work through statistics to test an idea", {"science": 0.6, "technology": 0.2, "business": 0.2}),
+            _item("EN1", "Design and build machines or electronic devices", {"engineering": 1.0, "technology": 0.4}),
+            _item("EN2", "Work out why a structure or mechanism fails", {"engineering": 1.0, "science": 0.3}),
+            _item("EN3", "Use technical drawings or CAD tools", {"engineering": 0.8, "arts": 0.2}),
+            _item("SW1", "Help people through a difficult time", {"social_work": 1.0, "healthcare": 0.2}),
+            _item("SW2", "Organise community or volunteer work", {"social_work": 1.0}),
+            _item("SW3", "Advocate for people who are treated unfairly", {"social_work": 1.0}),
+        ],
+    },
+    # Mini-IPIP (Donnellan et al., 2006): 20 public-domain IPIP items, 4 per Big Five trait
+    "personality": {
+        "version": "mini-ipip.1",
+        "prompt": "How accurately does this describe you?",
+        "scale": (1, 5),  # 1 = very inaccurate, 5 = very accurate
+        "traits": BIG_FIVE_TRAITS,
+        "items": [
+            _item("E1", "Am the life of the party", {"extraversion": 1.0}),
+            _item("A1", "Sympathize with others' feelings", {"agreeableness": 1.0}),
+            _item("C1", "Get chores done right away", {"conscientiousness": 1.0}),
+            _item("N1", "Have frequent mood swings", {"neuroticism": 1.0}),
+            _item("O1", "Have a vivid imagination", {"openness": 1.0}),
+            _item("E2", "Don't talk a lot", {"extraversion": 1.0}, reverse=True),
+            _item("A2", "Am not interested in other people's problems", {"agreeableness": 1.0}, reverse=True),
+            _item("C2", "Often forget to put things back in their proper place", {"conscientiousness": 1.0}, reverse=True),
+            _item("N2", "Am relaxed most of the time", {"neuroticism": 1.0}, reverse=True),
+            _item("O2", "Am not interested in abstract ideas", {"openness": 1.0}, reverse=True),
+            _item("E3", "Talk to a lot of different people at parties", {"extraversion": 1.0}),
+            _item("A3", "Feel others' emotions", {"agreeableness": 1.0}),
+            _item("C3", "Like order", {"conscientiousness": 1.0}),
+            _item("N3", "Get upset easily", {"neuroticism": 1.0}),
+            _item("O3", "Have difficulty understanding abstract ideas", {"openness": 1.0}, reverse=True),
+            _item("E4", "Keep in the background", {"extraversion": 1.0}, reverse=True),
+            _item("A4", "Am not really interested in others", {"agreeableness": 1.0}, reverse=True),
+            _item("C4", "Make a mess of things", {"conscientiousness": 1.0}, reverse=True),
+            _item("N4", "Seldom feel blue", {"neuroticism": 1.0}, reverse=True),
+            _item("O4", "Do not have a good imagination", {"openness": 1.0}, reverse=True),
+        ],
+    },
+}
+
+
+class CompiledInstrument:
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.version = spec["version"]
+        self.traits: List[str] = list(spec["traits"])
+        self.low, self.high = spec["scale"]
+        items = spec["items"]
+        self.item_index = {item["id"]: i for i, item in enumerate(items)}
+        trait_index = {trait: t for t, trait in enumerate(self.traits)}
+        # Sparse rows: item -> [(trait index, weight)], scored directly when numpy is missing
+        self._rows = [[(trait_index[trait], float(weight)) for trait, weight in item["keys"].items()] for item in items]
+        self._reverse = [bool(item["reverse"]) for item in items]
+
+        if np is not None:
+            weights = np.zeros((len(items), len(self.traits)))
+            for i, row in enumerate(self._rows):
+                for t, weight in row:
+                    weights[i, t] = weight
+            reverse = np.array(self._reverse, dtype=float)[:, None]
+            # [x*m | m] @ stacked -> reverse-keyed weighted sums in one product
+            self._stacked = np.vstack([(1.0 - 2.0 * reverse) * weights, reverse * weights])
+            self._abs_weights = np.abs(weights)
+
+    def score(self, answers: Dict[str, Any]) -> Dict[str, float]:
+        return self.score_many([answers])[0]
+
+    def score_many(self, answer_sets: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Trait scores (0-100) for each answer set; traits without an answered item are omitted"""
+        parsed = [self._vectorize(answers) for answers in answer_sets]
+        if np is not None:
+            numerators, denominators = self._matrix_sums(parsed)
+        else:
+            sums = [self._sparse_sums(responses) for responses in parsed]
+            numerators = [numerator for numerator, _ in sums]
+            denominators = [denominator for _, denominator in sums]
+
+        return [
+            {
+                trait: round(100.0 * float(numerator[t]) / float(denominator[t]), 2)
+                for t, trait in enumerate(self.traits)
+                if denominator[t]
+            }
+            for numerator, denominator in zip(numerators, denominators)
+        ]
+
+    def _vectorize(self, answers: Dict[str, Any]) -> Dict[int, float]:
+        """Item responses rescaled to 0..1 by item index"""
+        responses: Dict[int, float] = {}
+        for item_id, value in (answers or {}).items():
+            if isinstance(value, dict):
+                raise ValueError(
+                    f"Answer '{item_id}' must be a single response on the {self.low}-{self.high} scale, "
+                    f"not trait values; see /api/assessments/instruments/{self.name}"
+                )
+            index = self.item_index.get(str(item_id))
+            scaled = self._rescale(value)
+            if index is not None and scaled is not None:
+                responses[index] = scaled
+        return responses
+
+    def _rescale(self, value: Any) -> float | None:
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+        # Out-of-range responses are clamped to the scale
+        return (min(max(value, self.low), self.high) - self.low) / (self.high - self.low)
+
+    def _matrix_sums(self, batch: List[Dict[int, float]]):
+        item_count = len(self._reverse)
+        answered = np.zeros((len(batch), item_count))
+        values = np.zeros((len(batch), item_count))
+        for row, responses in enumerate(batch):
+            if responses:
+                indices = np.fromiter(responses.keys(), dtype=np.intp, count=len(responses))
+                answered[row, indices] = 1.0
+                values[row, indices] = np.fromiter(responses.values(), dtype=float, count=len(responses))
+        return np.hstack([values, answered]) @ self._stacked, answered @ self._abs_weights
+
+    def _sparse_sums(self, responses: Dict[int, float]) -> Tuple[List[float], List[float]]:
+        numerator = [0.0] * len(self.traits)
+        denominator = [0.0] * len(self.traits)
+        for index, value in responses.items():
+            if self._reverse[index]:
+                value = 1.0 - value
+            for t, weight in self._rows[index]:
+                numerator[t] += weight * value
+                denominator[t] += abs(weight)
+        return numerator, denominator
+
+    def describe(self) -> Dict[str, Any]:
+        """Public form of the instrument for clients: items and scale, without keys"""
+        spec = INSTRUMENTS[self.name]
+        return {
+            "name": self.name,
+            "version": self.version,
+            "prompt": spec["prompt"],
+            "scale": {"min": self.low, "max": self.high},
+            "traits": self.traits,
+            "items": [{"id": item["id"], "text": item["text"]} for item in spec["items"]],
+        }
+
+
+@lru_cache(maxsize=None)
+def _compile(name: str, version: str) -> CompiledInstrument:
+    return CompiledInstrument(name, INSTRUMENTS[name])
+
+
+def get_instrument(name: str) -> CompiledInstrument:
+    """Compiled instrument, cached per (name, version)"""
+    if name not in INSTRUMENTS:
+        raise ValueError(f"Unknown instrument '{name}'; expected one of {', '.join(sorted(INSTRUMENTS))}")
+    return _compile(name, INSTRUMENTS[name]["version"])
@@ -1,9 +1,22 @@
 from sqlalchemy.orm import Session
-from models import CareerRecommendation, User, Assessment, SkillEvaluation
-from schemas import CareerRecommendationResponse
+from sqlalchemy import func
+from database import SessionLocal
+from models import CareerRecommendation, RecommendationInput, User, UserScoreSnapshot
+from schemas import CareerRecommendationResponse, LatestRecommendationResponse
 from services.gemini_service import GeminiService
-from typing import List, Dict, Any
+from services.score_snapshot_service import ScoreSnapshotService
+from services.skill_normalizer import normalize_skill_levels
+from typing import List, Dict, Any, Iterator, Tuple
+import hashlib
 import json
+import logging
+import threading
+
+# Users whose recommendations are being regenerated in this process
+_regenerating: set = set()
+_regenerating_lock = threading.Lock()
+
+PROFILE_FIELDS = ("age_range", "current_job_role", "industry", "educational_background", "years_of_experience")
 
 class RecommendationService:
     def __init__(self, db: Session):
@@ -11,20 +24,36 @@ class RecommendationService:
         self.gemini_service = GeminiService()
     
     def generate_recommendations(self, user_id: int) -> CareerRecommendationResponse:
-        # Get user profile
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise ValueError("User not found")
+        (user_profile, aptitude_scores, interest_scores, skill_evaluation), input_key = self._recommendation_inputs(user_id)
         
-        # Get latest assessments
-        latest_assessment = self.db.query(Assessment).filter(
-            Assessment.user_id == user_id
-        ).order_by(Assessment.completed_at.desc()).first()
-        
-        # Get latest skill evaluation
-        latest_skill_eval = self.db.query(SkillEvaluation).filter(
-            SkillEvaluation.user_id == user_id
-        ).order_by(SkillEvaluation.evaluated_at.desc()).first()
+        # Generate recommendations using Gemini AI
+        ai_recommendations = self.gemini_service.generate_career_recommendations(
+            user_profile, aptitude_scores, interest_scores, skill_evaluation
+        )
+        return self._save_recommendation(user_id, ai_recommendations, input_key)
+
+    def stream_recommendations(self, user_id: int) -> Iterator[Tuple[str, Any]]:
+        """Yield ``("career", career)`` as the model produces them, then ``("recommendation", stored response)``"""
+        inputs, input_key = self._recommendation_inputs(user_id)
+        ai_recommendations: Dict[str, Any] = {}
+        for kind, data in self.gemini_service.stream_career_recommendations(*inputs):
+            if kind == "career":
+                yield kind, data
+            else:
+                ai_recommendations = data
+        yield "recommendation", self._save_recommendation(user_id, ai_recommendations, input_key)
+
+    def _recommendation_inputs(self, user_id: int) -> Tuple[Tuple[Dict[str, Any], Dict[str, float], Dict[str, float], Dict[str, Any]], str]:
+        """User profile, aptitude scores, interest scores and skill evaluation for the prompt, and their input key"""
+        # User profile and latest scores of every type in one primary-key read
+        row = self.db.query(User, UserScoreSnapshot).outerjoin(
+            UserScoreSnapshot, UserScoreSnapshot.user_id == User.id
+        ).filter(User.id == user_id).first()
+        if not row:
+            raise ValueError("User not found")
+        user, snapshot = row
+        if snapshot is None:
+            snapshot = ScoreSnapshotService(self.db).get_snapshot(user_id)
         
         # Prepare data for AI analysis
         user_profile = {
@@ -32,23 +61,21 @@ class RecommendationService:
             "current_job_role": user.current_job_role,
             "industry": user.industry,
             "educational_background": user.educational_background,
-            "years_of_experience": user.years_of_experience
+            "years_of_experience": user.years_of_experience,
+            "personality_traits": snapshot.personality_scores or {}
         }
         
-        aptitude_scores = latest_assessment.scores if latest_assessment else {}
-        interest_scores = {}  # This would come from interest assessment
+        aptitude_scores = snapshot.aptitude_scores or {}
+        interest_scores = snapshot.interest_scores or {}
         
         skill_evaluation = {
-            "technical_skills": latest_skill_eval.technical_skills if latest_skill_eval else {},
-            "soft_skills": latest_skill_eval.soft_skills if latest_skill_eval else {},
-            "industry_skills": latest_skill_eval.industry_skills if latest_skill_eval else {}
+            "technical_skills": snapshot.technical_skills or {},
+            "soft_skills": snapshot.soft_skills or {},
+            "industry_skills": snapshot.industry_skills or {}
         }
-        
-        # Generate recommendations using Gemini AI
-        ai_recommendations = self.gemini_service.generate_career_recommendations(
-            user_profile, aptitude_scores, interest_scores, skill_evaluation
-        )
-        
+        return (user_profile, aptitude_scores, interest_scores, skill_evaluation), input_key(user, snapshot)
+
+    def _save_recommendation(self, user_id: int, ai_recommendations: Dict[str, Any], input_key: str) -> CareerRecommendationResponse:
         # Calculate weighted scores
         skill_match_score = 0.6  # 60% weight
         interest_alignment_score = 0.4  # 40% weight
@@ -68,11 +95,48 @@ class RecommendationService:
         )
         
         self.db.add(db_recommendation)
+        self.db.flush()
+        # Key of the inputs read before generation: changes made while the model ran make it stale
+        self.db.merge(RecommendationInput(user_id=user_id, recommendation_id=db_recommendation.id, input_key=input_key))
         self.db.commit()
         self.db.refresh(db_recommendation)
         
         return CareerRecommendationResponse.model_validate(db_recommendation)
     
+    def get_latest_recommendation(self, user_id: int) -> LatestRecommendationResponse:
+        """Latest stored recommendation and whether the user's inputs changed since it was generated.
+
+        One indexed read of the newest row with the key of the inputs it was
+        generated from, compared with the key of the current profile and score
+        snapshot (primary-key reads).
+        """
+        row = self.db.query(CareerRecommendation, RecommendationInput).outerjoin(
+            RecommendationInput,
+            (RecommendationInput.user_id == CareerRecommendation.user_id)
+            & (RecommendationInput.recommendation_id == CareerRecommendation.id)
+        ).filter(
+            CareerRecommendation.user_id == user_id
+        ).order_by(CareerRecommendation.generated_at.desc(), CareerRecommendation.id.desc()).first()
+
+        if row is None:
+            return LatestRecommendationResponse(status="missing", regenerating=is_regenerating(user_id))
+
+        recommendation, inputs = row
+        user, snapshot = self.db.query(User, UserScoreSnapshot).outerjoin(
+            UserScoreSnapshot, UserScoreSnapshot.user_id == User.id
+        ).filter(User.id == user_id).one()
+        if inputs is not None:
+            stale = inputs.input_key != input_key(user, snapshot)
+        else:
+            # Generated before input keys were recorded: fall back to update times
+            changed = [t for t in (getattr(snapshot, "updated_at", None), user.updated_at) if t is not None]
+            stale = bool(changed) and max(changed) > recommendation.generated_at
+        return LatestRecommendationResponse(
+            status="stale" if stale else "fresh",
+            regenerating=is_regenerating(user_id),
+            recommendation=CareerRecommendationResponse.model_validate(recommendation)
+        )
+
     def get_user_recommendations(self, user_id: int) -> List[CareerRecommendationResponse]:
         """Get all recommendations for a user"""
         recommendations = self.db.query(CareerRecommendation).filter(
@@ -81,6 +145,14 @@ class RecommendationService:
         
         return [CareerRecommendationResponse.model_validate(rec) for rec in recommendations]
     
+    def recommendations_version(self, user_id: int) -> Tuple[Any, ...]:
+        """Validator for the user's recommendation list (served by the user/generated_at index)"""
+        return tuple(self.db.query(
+            func.count(CareerRecommendation.id),
+            func.max(CareerRecommendation.id),
+            func.max(CareerRecommendation.generated_at)
+        ).filter(CareerRecommendation.user_id == user_id).one())
+
     def calculate_career_match_score(
         self, 
         user_skills: Dict[str, Any], 
@@ -89,6 +161,10 @@ class RecommendationService:
         """Calculate how well user skills match career requirements"""
         if not user_skills or not career_requirements:
             return 0.0
+
+        # Evaluations keep skill names as entered; match on canonical names
+        user_skills = normalize_skill_levels(user_skills)
+        career_requirements = normalize_skill_levels(career_requirements)
         
         total_match = 0
         total_requirements = 0
@@ -102,3 +178,39 @@ class RecommendationService:
                 total_requirements += 1
         
         return total_match / total_requirements if total_requirements > 0 else 0.0
+
+
+def input_key(user: User, snapshot: UserScoreSnapshot | None) -> str:
+    """Version of a user's recommendation inputs: the snapshot's source row ids and a hash of the profile"""
+    ids = [
+        getattr(snapshot, column, None)
+        for column in ("aptitude_assessment_id", "interest_assessment_id", "personality_assessment_id", "skill_evaluation_id")
+    ]
+    profile = json.dumps([getattr(user, field) for field in PROFILE_FIELDS], default=str)
+    return ":".join(str(value or 0) for value in ids) + ":" + hashlib.sha1(profile.encode("utf-8")).hexdigest()[:16]
+
+
+def is_regenerating(user_id: int) -> bool:
+    return user_id in _regenerating
+
+
+def claim_regeneration(user_id: int) -> bool:
+    """Mark a background regeneration as started; False if one is already running for the user"""
+    with _regenerating_lock:
+        if user_id in _regenerating:
+            return False
+        _regenerating.add(user_id)
+        return True
+
+
+def regenerate_recommendations(user_id: int) -> None:
+    """Background task: generate a new recommendation in its own session, then release the claim"""
+    db = SessionLocal()
+    try:
+        RecommendationService(db).generate_recommendations(user_id)
+    except Exception as e:
+        logging.error(f"Background recommendation refresh failed for user {user_id}: {e}")
+    finally:
+        db.close()
+        with _regenerating_lock:
+            _regenerating.discard(user_id)
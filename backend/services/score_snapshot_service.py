@@ -0,0 +1,87 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+from models import UserScoreSnapshot, Assessment, SkillEvaluation
+
+ASSESSMENT_TYPES = ("aptitude", "interest", "personality")
+SKILL_FIELDS = ("technical_skills", "soft_skills", "industry_skills", "skill_gaps")
+
+
+class ScoreSnapshotService:
+    """Maintains ``UserScoreSnapshot``, the per-user row of latest scores.
+
+    ``record_*`` are called after the source row is added but before the
+    caller commits, so the snapshot and the assessment/evaluation land in the
+    same transaction. Results are only applied when their id is newer than the
+    one already stored, so a slow older write cannot overwrite a newer one.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_assessment(self, assessment: Assessment) -> None:
+        if assessment.assessment_type not in ASSESSMENT_TYPES:
+            return
+        self.db.flush()
+        snapshot = self._get_or_create(assessment.user_id)
+        id_field = f"{assessment.assessment_type}_assessment_id"
+        if (getattr(snapshot, id_field) or 0) > assessment.id:
+            return
+        setattr(snapshot, id_field, assessment.id)
+        setattr(snapshot, f"{assessment.assessment_type}_scores", assessment.scores or {})
+        snapshot.updated_at = func.now()
+
+    def record_skill_evaluation(self, evaluation: SkillEvaluation) -> None:
+        self.db.flush()
+        snapshot = self._get_or_create(evaluation.user_id)
+        if (snapshot.skill_evaluation_id or 0) > evaluation.id:
+            return
+        snapshot.skill_evaluation_id = evaluation.id
+        for field in SKILL_FIELDS:
+            setattr(snapshot, field, getattr(evaluation, field) or {})
+        snapshot.overall_skill_score = evaluation.overall_score
+        snapshot.updated_at = func.now()
+
+    def get_snapshot(self, user_id: int) -> UserScoreSnapshot:
+        """Primary-key read; users who predate the table are backfilled from their history once"""
+        snapshot = self.db.get(UserScoreSnapshot, user_id)
+        if snapshot is None:
+            snapshot = self.rebuild(user_id)
+            self.db.commit()
+        return snapshot
+
+    def rebuild(self, user_id: int) -> UserScoreSnapshot:
+        """Recompute the snapshot from the assessment and skill evaluation tables"""
+        snapshot = self._get_or_create(user_id)
+        for assessment_type in ASSESSMENT_TYPES:
+            latest = self.db.query(Assessment).filter(
+                Assessment.user_id == user_id,
+                Assessment.assessment_type == assessment_type
+            ).order_by(Assessment.id.desc()).first()
+            setattr(snapshot, f"{assessment_type}_assessment_id", latest.id if latest else None)
+            setattr(snapshot, f"{assessment_type}_scores", latest.scores if latest else None)
+
+        evaluation = self.db.query(SkillEvaluation).filter(
+            SkillEvaluation.user_id == user_id
+        ).order_by(SkillEvaluation.id.desc()).first()
+        snapshot.skill_evaluation_id = evaluation.id if evaluation else None
+        for field in SKILL_FIELDS:
+            setattr(snapshot, field, getattr(evaluation, field) if evaluation else None)
+        snapshot.overall_skill_score = evaluation.overall_score if evaluation else None
+        snapshot.updated_at = func.now()
+        self.db.flush()
+        return snapshot
+
+    def _get_or_create(self, user_id: int) -> UserScoreSnapshot:
+        snapshot = self.db.get(UserScoreSnapshot, user_id, with_for_update=True)
+        if snapshot is not None:
+            return snapshot
+        snapshot = UserScoreSnapshot(user_id=user_id)
+        try:
+            # Savepoint so losing a race to create the row doesn't roll back the caller's insert
+            with self.db.begin_nested():
+                self.db.add(snapshot)
+        except IntegrityError:
+            snapshot = self.db.get(UserScoreSnapshot, user_id, with_for_update=True, populate_existing=True)
+        return snapshot
+
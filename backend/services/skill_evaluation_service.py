@@ -1,9 +1,15 @@
 from sqlalchemy.orm import Session
-from models import SkillEvaluation
+from models import SkillEvaluation, UserScoreSnapshot
 from schemas import SkillEvaluationCreate, SkillEvaluationResponse
-from typing import Dict, Any
+from services.score_snapshot_service import ScoreSnapshotService
+from services.skill_gap_analyzer import SkillGapAnalyzer, get_role_profile
+from services.skill_normalizer import normalize_skill_levels
+from typing import Dict, Any, Iterator, List
 import json
 
+# Oracle caps IN lists at 1000 expressions (ORA-01795)
+MAX_IN_LIST = 1000
+
 class SkillEvaluationService:
     def __init__(self, db: Session):
         self.db = db
@@ -25,71 +31,57 @@ class SkillEvaluationService:
         )
         
         self.db.add(db_evaluation)
+        ScoreSnapshotService(self.db).record_skill_evaluation(db_evaluation)
         self.db.commit()
         self.db.refresh(db_evaluation)
         
         return SkillEvaluationResponse.model_validate(db_evaluation)
     
     def analyze_skill_gaps(self, skill_data: SkillEvaluationCreate) -> Dict[str, Any]:
-        """Analyze skill gaps based on current skills"""
-        gaps = {
-            "technical_gaps": [],
-            "soft_skill_gaps": [],
-            "industry_gaps": [],
-            "priority_skills": [],
-            "development_areas": []
-        }
-        
-        # Analyze technical skills
-        technical_skills = skill_data.technical_skills
-        if isinstance(technical_skills, dict):
-            for skill, level in technical_skills.items():
-                if isinstance(level, (int, float)) and level < 3:  # Assuming 1-5 scale
-                    gaps["technical_gaps"].append({
-                        "skill": skill,
-                        "current_level": level,
-                        "target_level": 4,
-                        "gap": 4 - level
-                    })
-        
-        # Analyze soft skills
-        soft_skills = skill_data.soft_skills
-        if isinstance(soft_skills, dict):
-            for skill, level in soft_skills.items():
-                if isinstance(level, (int, float)) and level < 3:
-                    gaps["soft_skill_gaps"].append({
-                        "skill": skill,
-                        "current_level": level,
-                        "target_level": 4,
-                        "gap": 4 - level
-                    })
-        
-        # Analyze industry skills
-        industry_skills = skill_data.industry_skills
-        if isinstance(industry_skills, dict):
-            for skill, level in industry_skills.items():
-                if isinstance(level, (int, float)) and level < 3:
-                    gaps["industry_gaps"].append({
-                        "skill": skill,
-                        "current_level": level,
-                        "target_level": 4,
-                        "gap": 4 - level
-                    })
-        
-        # Prioritize skills based on gap size
-        all_gaps = []
-        all_gaps.extend(gaps["technical_gaps"])
-        all_gaps.extend(gaps["soft_skill_gaps"])
-        all_gaps.extend(gaps["industry_gaps"])
-        
-        # Sort by gap size (largest gaps first)
-        all_gaps.sort(key=lambda x: x["gap"], reverse=True)
-        gaps["priority_skills"] = all_gaps[:5]  # Top 5 priority skills
-        
-        return gaps
+        """Analyze skill gaps against the target role, or a flat target level when none is given"""
+        role = get_role_profile(skill_data.target_role) if skill_data.target_role else None
+        return SkillGapAnalyzer(role).analyze(skill_data.model_dump())
+    
+    def analyze_user_gaps(self, user_id: int, role_title: str) -> Dict[str, Any]:
+        """Gaps between the user's latest skill evaluation and a catalog role"""
+        snapshot = ScoreSnapshotService(self.db).get_snapshot(user_id)
+        return SkillGapAnalyzer(get_role_profile(role_title)).analyze({
+            "technical_skills": snapshot.technical_skills or {},
+            "soft_skills": snapshot.soft_skills or {},
+            "industry_skills": snapshot.industry_skills or {}
+        })
+    
+    def gap_report(self, role_title: str, user_ids: List[int] | None = None, top_k: int = 5) -> Dict[str, Any]:
+        """Training-needs report: every user's latest skills against one role in a single pass"""
+        analyzer = SkillGapAnalyzer(get_role_profile(role_title), top_k=top_k)
+        return analyzer.analyze_batch(
+            (user_id, {"technical_skills": technical, "soft_skills": soft, "industry_skills": industry})
+            for user_id, technical, soft, industry in self._latest_skills(user_ids)
+        )
+
+    def _latest_skills(self, user_ids: List[int] | None) -> Iterator[Any]:
+        """Snapshot skill rows ordered by user, querying a selection in IN lists of at most MAX_IN_LIST ids"""
+        query = self.db.query(
+            UserScoreSnapshot.user_id,
+            UserScoreSnapshot.technical_skills,
+            UserScoreSnapshot.soft_skills,
+            UserScoreSnapshot.industry_skills
+        ).filter(UserScoreSnapshot.skill_evaluation_id.isnot(None)).order_by(UserScoreSnapshot.user_id)
+        if user_ids is None:
+            yield from query.yield_per(1000)
+            return
+        # Sorted chunks keep the merged rows ordered by user
+        ids = sorted(set(user_ids))
+        for start in range(0, len(ids), MAX_IN_LIST):
+            yield from query.filter(UserScoreSnapshot.user_id.in_(ids[start:start + MAX_IN_LIST])).yield_per(1000)
     
     def calculate_overall_score(self, skill_data: SkillEvaluationCreate) -> float:
         """Calculate overall skill score"""
+        # Count a skill entered under two names ("python3", "Py") once, at its highest level
+        skill_data = skill_data.model_copy(update={
+            group: normalize_skill_levels(getattr(skill_data, group))
+            for group in ("technical_skills", "soft_skills", "industry_skills")
+        })
         total_score = 0
         total_skills = 0
         
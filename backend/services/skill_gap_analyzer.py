@@ -0,0 +1,246 @@
+"""Skill-gap analysis against role requirement profiles.
+
+A role profile maps each required skill to an index and keeps the required
+levels as an array, so one user's gaps are ``max(required - current, 0)`` over
+that array and a whole population's gaps are the same operation on a
+users x skills matrix. Top-k priorities use a partial sort (``argpartition``,
+or ``heapq.nlargest`` when numpy is not installed).
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+import heapq
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional (see requirements.txt)
+    np = None
+
+from services.career_catalog import CAREER_CATALOG, SOFT_SKILLS
+from services.skill_normalizer import normalize_skill_levels
+
+# Skill evaluation group -> key of its gap list in the analysis
+SKILL_GROUPS = {
+    "technical_skills": "technical_gaps",
+    "soft_skills": "soft_skill_gaps",
+    "industry_skills": "industry_gaps",
+}
+
+# Without a target role every rated skill is measured against the same level
+DEFAULT_TARGET_LEVEL = 4
+DEFAULT_GAP_THRESHOLD = 3  # Skills rated below this (1-5 scale) count as gaps
+
+
+class RoleProfile:
+    def __init__(self, title: str, required_skills: Dict[str, float]):
+        self.title = title
+        self.skills = list(required_skills)
+        self.index = {skill.lower(): i for i, skill in enumerate(self.skills)}
+        levels = [float(level) for level in required_skills.values()]
+        self.levels = np.array(levels) if np is not None else levels
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"title": self.title, "required_skills": dict(zip(self.skills, _as_list(self.levels)))}
+
+
+@lru_cache(maxsize=1)
+def role_profiles() -> Dict[str, RoleProfile]:
+    return {career["title"].lower(): RoleProfile(career["title"], career["required_skills"]) for career in CAREER_CATALOG}
+
+
+def get_role_profile(title: str) -> RoleProfile:
+    profile = role_profiles().get((title or "").strip().lower())
+    if profile is None:
+        raise ValueError(f"Unknown role: {title}")
+    return profile
+
+
+class SkillGapAnalyzer:
+    def __init__(self, role: RoleProfile | None = None, top_k: int = 5):
+        self.role = role
+        self.top_k = top_k
+
+    def analyze(self, skills_by_group: Dict[str, Any]) -> Dict[str, Any]:
+        """Gap analysis for one user, in the shape stored on ``SkillEvaluation.skill_gaps``"""
+        gaps = {key: [] for key in SKILL_GROUPS.values()}
+        gaps["priority_skills"] = []
+        gaps["development_areas"] = []
+        skills_by_group = _canonical(skills_by_group)
+
+        if self.role is None:
+            entries = self._default_gaps(skills_by_group)
+        else:
+            entries = self._role_gaps(skills_by_group, gaps)
+
+        for group_key, entry in entries:
+            gaps[group_key].append(entry)
+        gaps["priority_skills"] = _top_k([entry for _, entry in entries], self.top_k)
+        return gaps
+
+    def analyze_batch(self, users: Iterable[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Gaps of many users against the role in one pass, with a per-skill training-needs summary.
+
+        ``users`` yields ``(user_id, skills_by_group)``; levels are gathered
+        into a users x role-skills matrix and the gaps computed at once.
+        """
+        if self.role is None:
+            raise ValueError("Batch gap analysis needs a target role")
+        user_ids: List[int] = []
+        rows: List[List[float]] = []
+        for user_id, skills_by_group in users:
+            flat = _flatten(_canonical(skills_by_group))
+            user_ids.append(user_id)
+            rows.append([flat.get(skill.lower(), (None, 0.0, skill))[1] for skill in self.role.skills])
+
+        required = _as_list(self.role.levels)
+        if np is not None:
+            current = np.array(rows, dtype=float).reshape(len(rows), len(required))
+            gap_matrix = np.clip(self.role.levels - current, 0, None)
+            readiness = np.minimum(current, self.role.levels).sum(axis=1) / self.role.levels.sum()
+            users_with_gap = (gap_matrix > 0).sum(axis=0)
+            mean_gap = gap_matrix.mean(axis=0) if len(rows) else np.zeros(len(required))
+            # Partial sort of every row at once gives each user's k-th largest gap
+            k = min(self.top_k, len(required))
+            gap_rows = gap_matrix.tolist()
+            if k and len(rows):
+                thresholds = (-np.partition(-gap_matrix, k - 1, axis=1)[:, k - 1]).tolist()
+                top_rows = [_select_top(gaps, threshold, k) for gaps, threshold in zip(gap_rows, thresholds)]
+            else:
+                top_rows = [[] for _ in rows]
+            readiness = readiness.tolist()
+            users_with_gap = users_with_gap.tolist()
+            mean_gap = mean_gap.tolist()
+        else:
+            gap_rows = [[max(r - c, 0.0) for r, c in zip(required, row)] for row in rows]
+            top_rows = [_top_indices(gaps, self.top_k) for gaps in gap_rows]
+            readiness = [sum(min(c, r) for c, r in zip(row, required)) / sum(required) for row in rows]
+            users_with_gap = [sum(1 for gaps in gap_rows if gaps[i] > 0) for i in range(len(required))]
+            mean_gap = [sum(gaps[i] for gaps in gap_rows) / len(rows) if rows else 0.0 for i in range(len(required))]
+
+        per_user = []
+        for user_id, row, gaps, top, ready in zip(user_ids, rows, gap_rows, top_rows, readiness):
+            per_user.append({
+                "user_id": user_id,
+                "readiness": round(ready, 3),
+                "priority_skills": [
+                    {"skill": self.role.skills[i], "current_level": row[i], "target_level": required[i], "gap": gaps[i]}
+                    for i in top
+                ],
+            })
+
+        training_needs = sorted(
+            (
+                {
+                    "skill": skill,
+                    "target_level": required[i],
+                    "users_with_gap": int(users_with_gap[i]),
+                    "share_with_gap": round(users_with_gap[i] / len(rows), 3) if rows else 0.0,
+                    "mean_gap": round(mean_gap[i], 3),
+                }
+                for i, skill in enumerate(self.role.skills)
+            ),
+            key=lambda need: (need["users_with_gap"], need["mean_gap"]),
+            reverse=True,
+        )
+        return {
+            "role": self.role.title,
+            "users": len(user_ids),
+            "training_needs": training_needs,
+            "user_gaps": per_user,
+        }
+
+    def _default_gaps(self, skills_by_group: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        entries = []
+        for group, group_key in SKILL_GROUPS.items():
+            skills = skills_by_group.get(group)
+            if not isinstance(skills, dict):
+                continue
+            names = [name for name, level in skills.items() if _is_level(level)]
+            levels = [float(skills[name]) for name in names]
+            if np is not None:
+                levels_array = np.array(levels, dtype=float)
+                selected = np.flatnonzero(levels_array < DEFAULT_GAP_THRESHOLD).tolist()
+            else:
+                selected = [i for i, level in enumerate(levels) if level < DEFAULT_GAP_THRESHOLD]
+            for i in selected:
+                entries.append((group_key, _gap_entry(names[i], skills[names[i]], DEFAULT_TARGET_LEVEL)))
+        return entries
+
+    def _role_gaps(self, skills_by_group: Dict[str, Any], gaps: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        flat = _flatten(skills_by_group)
+        current_levels = [flat.get(skill.lower(), (None, 0.0, skill))[1] for skill in self.role.skills]
+        required = _as_list(self.role.levels)
+        if np is not None:
+            gap_values = np.clip(self.role.levels - np.array(current_levels), 0, None)
+            selected = np.flatnonzero(gap_values > 0).tolist()
+        else:
+            selected = [i for i, (r, c) in enumerate(zip(required, current_levels)) if r > c]
+
+        entries = []
+        for i in selected:
+            skill = self.role.skills[i]
+            group = flat.get(skill.lower(), (_default_group(skill),))[0]
+            entries.append((SKILL_GROUPS[group], _gap_entry(skill, current_levels[i], required[i])))
+
+        # Rated skills the role does not require are worth keeping but not prioritising
+        gaps["development_areas"] = [name for key, (_, _, name) in flat.items() if key not in self.role.index]
+        gaps["target_role"] = self.role.title
+        gaps["readiness"] = round(
+            sum(min(c, r) for c, r in zip(current_levels, required)) / sum(required), 3
+        ) if required else 1.0
+        return entries
+
+
+def _canonical(skills_by_group: Dict[str, Any]) -> Dict[str, Any]:
+    """Skill groups with canonical skill names; evaluations are stored with the names as entered"""
+    return {group: normalize_skill_levels(skills_by_group.get(group)) for group in SKILL_GROUPS}
+
+
+def _flatten(skills_by_group: Dict[str, Any]) -> Dict[str, Tuple[str, float, str]]:
+    """Lower-cased skill name -> (group, level, original name) across all groups"""
+    flat = {}
+    for group in SKILL_GROUPS:
+        skills = skills_by_group.get(group)
+        if isinstance(skills, dict):
+            for name, level in skills.items():
+                if _is_level(level):
+                    flat[name.lower()] = (group, float(level), name)
+    return flat
+
+
+def _default_group(skill: str) -> str:
+    return "soft_skills" if skill in SOFT_SKILLS else "technical_skills"
+
+
+def _is_level(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _gap_entry(skill: str, current: float, target: float) -> Dict[str, Any]:
+    return {"skill": skill, "current_level": current, "target_level": target, "gap": target - current}
+
+
+def _top_k(entries: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Largest gaps first, without sorting every entry"""
+    return [entries[i] for i in _top_indices([entry["gap"] for entry in entries], k)]
+
+
+def _top_indices(values: List[float], k: int) -> List[int]:
+    """Indices of the k largest positive values, largest first and ties in original order"""
+    if k <= 0:
+        return []
+    if np is not None and len(values) > k:
+        threshold = float(-np.partition(-np.array(values, dtype=float), k - 1)[k - 1])
+        return _select_top(values, threshold, k)
+    positive = [i for i, value in enumerate(values) if value > 0]
+    return sorted(heapq.nlargest(k, positive, key=lambda i: (values[i], -i)), key=lambda i: (-values[i], i))
+
+
+def _select_top(values: List[float], threshold: float, k: int) -> List[int]:
+    """Given the k-th largest value, pick the top k positive values with ties broken by position"""
+    above = [i for i, value in enumerate(values) if value > threshold and value > 0]
+    ties = [i for i, value in enumerate(values) if value == threshold and value > 0][:k - len(above)]
+    return sorted(above + ties, key=lambda i: (-values[i], i))
+
+
+def _as_list(values) -> List[float]:
+    return values.tolist() if np is not None and hasattr(values, "tolist") else list(values)
@@ -0,0 +1,322 @@
+"""Map free-form skill names onto a canonical vocabulary.
+
+Every canonical name and alias is embedded as a hashed character n-gram
+vector (2- and 3-grams with word boundaries, signed feature hashing, L2
+normalised). The matrix is written once to ``SKILL_INDEX_DIR`` as a ``.npy``
+file and opened memory-mapped, so worker processes share one copy through the
+page cache. Lookups take the cosine top-k for a whole batch of names in one
+matrix product; resolved names are kept in an LRU cache in front of the index.
+Everything runs locally. Without numpy the same vectors are compared as
+sparse dicts.
+
+A fuzzy (non-alias) match also has to line up word by word with the name it
+matched: the same words up to spacing, a plural ending or a one-letter typo.
+N-gram similarity alone pairs names that share most letters but mean
+different things ("Product Management" / "Project Management").
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional (see requirements.txt)
+    np = None
+
+from services.career_catalog import CAREER_CATALOG
+
+# Canonical skill -> aliases and common spellings (matched exactly after normalisation)
+SKILL_VOCABULARY: Dict[str, List[str]] = {
+    "Python": ["py", "python3", "python 3", "cpython"],
+    "JavaScript": ["js", "ecmascript", "es6", "javascript es6"],
+    "TypeScript": ["ts"],
+    "Java": ["java se", "java ee", "core java"],
+    "C++": ["cpp", "c plus plus"],
+    "C#": ["csharp", "c sharp", "dotnet", ".net"],
+    "Go": ["golang"],
+    "Rust": ["rustlang"],
+    "SQL": ["structured query language", "mysql", "postgresql", "postgres", "sql server", "oracle sql", "pl sql"],
+    "HTML": ["html5"],
+    "CSS": ["css3", "scss", "sass"],
+    "React": ["reactjs", "react js", "react.js"],
+    "Node.js": ["node", "nodejs", "node js"],
+    "Programming": ["coding", "software development", "software engineering"],
+    "System Design": ["systems design", "software architecture", "system architecture"],
+    "Cloud Computing": ["cloud", "cloud services"],
+    "AWS": ["amazon web services"],
+    "Azure": ["microsoft azure"],
+    "Docker": ["containers", "containerization"],
+    "Kubernetes": ["k8s"],
+    "Git": ["github", "version control"],
+    "Linux": ["unix", "bash", "shell scripting"],
+    "DevOps": ["ci cd", "continuous integration"],
+    "Cybersecurity": ["information security", "infosec", "security"],
+    "Networking": ["computer networks", "network administration"],
+    "Machine Learning": ["ml", "machine-learning", "statistical learning"],
+    "Deep Learning": ["dl", "neural networks"],
+    "Natural Language Processing": ["nlp"],
+    "Statistics": ["stats", "statistical analysis"],
+    "Data Analysis": ["data analytics", "analytics"],
+    "Data Visualization": ["data visualisation", "dataviz", "data viz", "visualization"],
+    "Excel": ["microsoft excel", "ms excel", "spreadsheets"],
+    "Tableau": [],
+    "Power BI": ["powerbi"],
+    "CAD": ["autocad", "computer aided design", "solidworks"],
+    "Physics": [],
+    "Biology": [],
+    "Project Management": ["pm", "project planning", "pmp"],
+    "Agile": ["scrum", "kanban"],
+    "Requirements Analysis": ["requirements gathering", "business analysis"],
+    "Stakeholder Management": ["stakeholder engagement"],
+    "Communication": ["communication skills", "verbal communication", "written communication"],
+    "Public Speaking": ["presentation skills", "presenting"],
+    "Writing": ["technical writing", "copywriting"],
+    "Content Creation": ["content writing", "content marketing"],
+    "Marketing": ["digital marketing"],
+    "Sales": [],
+    "Negotiation": [],
+    "Finance": ["financial analysis"],
+    "Accounting": ["bookkeeping"],
+    "Healthcare IT": ["health it", "health informatics"],
+    "E-commerce": ["ecommerce", "online retail"],
+    "Patient Care": ["clinical care"],
+    "Case Management": [],
+    "Subject Knowledge": ["subject matter expertise", "domain knowledge"],
+    "Leadership": ["team leadership", "people management"],
+    "Teamwork": ["collaboration", "team work", "team player"],
+    "Problem Solving": ["problem-solving", "troubleshooting"],
+    "Critical Thinking": ["analytical thinking"],
+    "Creativity": ["creative thinking", "innovation"],
+    "Time Management": ["prioritization", "organisation", "organization"],
+    "Adaptability": ["flexibility"],
+    "Empathy": ["emotional intelligence"],
+    "Patience": [],
+    "Design Tools": ["figma", "adobe creative suite", "photoshop", "illustrator"],
+    "Typography": [],
+    "UX Design": ["ux", "user experience", "ui ux", "ui/ux"],
+}
+for _career in CAREER_CATALOG:
+    for _skill in _career["required_skills"]:
+        SKILL_VOCABULARY.setdefault(_skill, [])
+
+DIMENSIONS = 4096
+
+
+def normalize_text(name: str) -> str:
+    """Lower-case, unify separators and collapse whitespace ("Machine-Learning" -> "machine learning")"""
+    text = (name or "").strip().lower()
+    text = re.sub(r"[_\-/]+", " ", text)
+    return re.sub(r"\s+", " ", text)
+
+
+def _ngram_features(text: str) -> Dict[int, float]:
+    padded = f"^{text}$"
+    features: Dict[int, float] = {}
+    for n in (2, 3):
+        for i in range(len(padded) - n + 1):
+            # crc32 is stable across processes, unlike hash()
+            h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+            index = h % DIMENSIONS
+            features[index] = features.get(index, 0.0) + (1.0 if (h >> 16) & 1 else -1.0)
+    norm = sum(v * v for v in features.values()) ** 0.5 or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+
+def _words_align(query: str, text: str) -> bool:
+    """Same words up to spacing ("java script"), a plural ending or a one-letter typo per word"""
+    if query.replace(" ", "") == text.replace(" ", ""):
+        return True
+    query_words, text_words = query.split(), text.split()
+    return len(query_words) == len(text_words) and all(map(_same_word, query_words, text_words))
+
+
+def _same_word(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    shorter, longer = sorted((a, b), key=len)
+    # Short words ("go", "git", "sql") are too easy to turn into another word with one edit
+    if len(shorter) < 4:
+        return False
+    if longer.startswith(shorter) and len(longer) - len(shorter) <= 2:
+        return True
+    return _within_one_edit(shorter, longer)
+
+
+def _within_one_edit(shorter: str, longer: str) -> bool:
+    """One insertion, substitution or swap of adjacent letters turns ``shorter`` into ``longer``"""
+    if len(longer) - len(shorter) > 1:
+        return False
+    i = 0
+    while i < len(shorter) and shorter[i] == longer[i]:
+        i += 1
+    if len(shorter) < len(longer):
+        return shorter[i:] == longer[i + 1:]
+    return shorter[i + 1:] == longer[i + 1:] or (
+        shorter[i + 2:] == longer[i + 2:] and shorter[i:i + 2] == longer[i:i + 2][::-1]
+    )
+
+
+class SkillIndex:
+    def __init__(self, vocabulary: Dict[str, List[str]] | None = None, index_dir: str | None = None,
+                 threshold: float | None = None, cache_size: int = 4096):
+        self.vocabulary = vocabulary or SKILL_VOCABULARY
+        self.index_dir = Path(index_dir or os.getenv("SKILL_INDEX_DIR", Path(__file__).resolve().parent.parent / "skill_index"))
+        # Below this cosine similarity a name is kept as entered
+        self.threshold = threshold if threshold is not None else float(os.getenv("SKILL_MATCH_THRESHOLD", "0.75"))
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str | None, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Each row is one canonical name or alias; _row_skill maps it back to the canonical name
+        self._row_text: List[str] = []
+        self._row_skill: List[str] = []
+        self._exact: Dict[str, str] = {}
+        self._texts_by_skill: Dict[str, List[str]] = {}
+        for skill, aliases in self.vocabulary.items():
+            for text in [skill, *aliases]:
+                key = normalize_text(text)
+                if key and key not in self._exact:
+                    self._exact[key] = skill
+                    self._row_text.append(key)
+                    self._row_skill.append(skill)
+                    self._texts_by_skill.setdefault(skill, []).append(key)
+        self._matrix = None
+
+    def warm(self) -> None:
+        """Build or open the index now instead of on the first unmatched name"""
+        if np is not None:
+            self._load_matrix()
+        else:
+            self._sparse_rows()
+
+    def resolve(self, name: str) -> str:
+        return self.resolve_many([name])[0]
+
+    def resolve_many(self, names: List[str]) -> List[str]:
+        """Canonical name for each input, or the input itself when nothing is close enough"""
+        keys = [normalize_text(name) for name in names]
+        resolved: Dict[str, Tuple[str | None, float]] = {}
+        misses = []
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    resolved[key] = self._cache[key]
+                elif key in self._exact:
+                    resolved[key] = (self._exact[key], 1.0)
+                elif key and key not in resolved:
+                    misses.append(key)
+
+        if misses:
+            unique = list(dict.fromkeys(misses))
+            for key, (match, score) in zip(unique, self.top_k(unique, k=1)):
+                close = score >= self.threshold and any(
+                    _words_align(key, text) for text in self._texts_by_skill.get(match, [])
+                )
+                resolved[key] = (match, score) if close else (None, score)
+            with self._lock:
+                for key in unique:
+                    self._cache[key] = resolved[key]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [
+            (resolved.get(key, (None, 0.0))[0] or (name.strip() if isinstance(name, str) else name))
+            for name, key in zip(names, keys)
+        ]
+
+    def top_k(self, texts: List[str], k: int = 3) -> List[Tuple[str, float]] | List[List[Tuple[str, float]]]:
+        """Best canonical match for each text (k=1) or the k best as (skill, cosine) lists"""
+        queries = [_ngram_features(normalize_text(text)) for text in texts]
+        if np is not None:
+            matrix = self._load_matrix()
+            query_matrix = np.zeros((len(queries), DIMENSIONS), dtype=np.float32)
+            for row, features in enumerate(queries):
+                query_matrix[row, list(features)] = list(features.values())
+            scores = query_matrix @ matrix.T
+            results = [self._best(row_scores.tolist(), k) for row_scores in scores]
+        else:
+            vectors = self._sparse_rows()
+            results = [
+                self._best([sum(value * vector.get(index, 0.0) for index, value in q.items()) for vector in vectors], k)
+                for q in queries
+            ]
+        return [r[0] if r else (None, 0.0) for r in results] if k == 1 else results
+
+    def _best(self, row_scores: List[float], k: int) -> List[Tuple[str, float]]:
+        # Several rows (aliases) share a canonical skill; keep each skill's best score
+        best: Dict[str, float] = {}
+        if np is not None and len(row_scores) > k * 4:
+            candidates = np.argpartition(-np.array(row_scores), k * 4 - 1)[:k * 4].tolist()
+        else:
+            candidates = range(len(row_scores))
+        for row in candidates:
+            skill = self._row_skill[row]
+            if row_scores[row] > best.get(skill, -1.0):
+                best[skill] = row_scores[row]
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def _sparse_rows(self) -> List[Dict[int, float]]:
+        if self._matrix is None:
+            self._matrix = [_ngram_features(text) for text in self._row_text]
+        return self._matrix
+
+    def _load_matrix(self):
+        if self._matrix is not None:
+            return self._matrix
+        fingerprint = hashlib.sha256(json.dumps([DIMENSIONS, self._row_text]).encode("utf-8")).hexdigest()[:16]
+        path = self.index_dir / f"skills-{fingerprint}.npy"
+        if not path.exists():
+            matrix = self._vectors()
+            try:
+                self._save(path, matrix)
+            except OSError as e:
+                # Read-only deployments still work, each process just keeps its own copy
+                logging.warning(f"Could not write skill index to {path}: {e}")
+                self._matrix = matrix
+                return self._matrix
+        self._matrix = np.load(path, mmap_mode="r")
+        return self._matrix
+
+    def _vectors(self):
+        matrix = np.zeros((len(self._row_text), DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(self._row_text):
+            features = _ngram_features(text)
+            matrix[row, list(features)] = list(features.values())
+        return matrix
+
+    def _save(self, path: Path, matrix) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent workers never open a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+        logging.info(f"Built skill index {path.name} ({len(self._row_text)} names)")
+
+
+skill_index = SkillIndex()
+
+
+def normalize_skill_levels(skills: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Rename skills to canonical names; when several names collapse into one, keep the highest level"""
+    if not isinstance(skills, dict) or not skills:
+        return skills or {}
+    names = list(skills)
+    normalized: Dict[str, Any] = {}
+    for name, canonical in zip(names, skill_index.resolve_many(names)):
+        level = skills[name]
+        current = normalized.get(canonical)
+        if current is None or (
+            isinstance(level, (int, float)) and isinstance(current, (int, float)) and level > current
+        ):
+            normalized[canonical] = level
+    return normalized
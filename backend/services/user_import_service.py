@@ -0,0 +1,156 @@
+"""Bulk user import for onboarding institutions.
+
+Rows are processed in batches: validated with ``UserCreate``, checked for
+existing accounts with one ``email IN (...)`` query per batch, hashed across a
+process pool and inserted with a single executemany per transaction. Every
+input row gets a result entry (created, duplicate or invalid).
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import ValidationError
+from passlib.hash import bcrypt
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+import csv
+import json
+import logging
+import multiprocessing
+import os
+
+from models import User
+from schemas import UserCreate
+
+# Oracle caps IN lists at 1000 expressions
+MAX_BATCH_SIZE = 1000
+USER_FIELDS = (
+    "email", "full_name", "age_range", "current_job_role", "industry",
+    "educational_background", "years_of_experience",
+)
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Rows from a CSV (with header) or NDJSON text stream"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            # Empty CSV cells mean "not provided"
+            yield {key: value for key, value in row.items() if key and value not in (None, "")}
+    elif fmt == "ndjson":
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Reported as an invalid row rather than aborting the import
+                    yield line.strip()
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    # Top-level so the process pool can pickle it
+    return [_hash_password(password, rounds) for password in passwords]
+
+
+class UserImportService:
+    def __init__(self, db: Session, workers: int | None = None, batch_size: int = 500):
+        self.db = db
+        self.workers = workers or int(os.getenv("BULK_IMPORT_WORKERS", multiprocessing.cpu_count()))
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        # Hashes below the login cost (12) are upgraded on the user's first successful login
+        self.bcrypt_rounds = int(os.getenv("BULK_IMPORT_BCRYPT_ROUNDS", "12"))
+
+    def import_users(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        results: List[Dict[str, Any]] = []
+        seen_emails = set()
+        # Spawned workers avoid forking a process that has database connections and threads
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            batch = []
+            for row_number, row in enumerate(rows, start=1):
+                batch.append((row_number, row))
+                if len(batch) >= self.batch_size:
+                    results.extend(self._import_batch(batch, seen_emails, pool))
+                    batch = []
+            if batch:
+                results.extend(self._import_batch(batch, seen_emails, pool))
+
+        summary = {status: 0 for status in ("created", "duplicate", "invalid")}
+        for result in results:
+            summary[result["status"]] += 1
+        return {"total": len(results), **summary, "rows": results}
+
+    def _import_batch(self, batch, seen_emails: set, pool: ProcessPoolExecutor) -> List[Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        valid: List[tuple] = []
+        for row_number, row in batch:
+            if not isinstance(row, dict):
+                results[row_number] = {"row": row_number, "email": None, "status": "invalid", "error": "Not a JSON object"}
+                continue
+            try:
+                user = UserCreate.model_validate(row)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+                results[row_number] = {"row": row_number, "email": row.get("email"), "status": "invalid", "error": error}
+                continue
+            if user.email in seen_emails:
+                results[row_number] = {"row": row_number, "email": user.email, "status": "duplicate", "error": "Repeated in import"}
+                continue
+            seen_emails.add(user.email)
+            valid.append((row_number, user))
+
+        if valid:
+            existing = set(self.db.execute(
+                select(User.email).where(User.email.in_([user.email for _, user in valid]))
+            ).scalars())
+            to_create = []
+            for row_number, user in valid:
+                if user.email in existing:
+                    results[row_number] = {"row": row_number, "email": user.email, "status": "duplicate", "error": "User with this email already exists"}
+                else:
+                    to_create.append((row_number, user))
+
+            if to_create:
+                hashes = self._hash_all([user.password for _, user in to_create], pool)
+                records = [
+                    {**{field: getattr(user, field) for field in USER_FIELDS}, "hashed_password": hashed}
+                    for (_, user), hashed in zip(to_create, hashes)
+                ]
+                for (row_number, user), status, error in self._insert(records, to_create):
+                    results[row_number] = {"row": row_number, "email": user.email, "status": status}
+                    if error:
+                        results[row_number]["error"] = error
+
+        return [results[row_number] for row_number, _ in batch]
+
+    def _hash_all(self, passwords: List[str], pool: ProcessPoolExecutor) -> List[str]:
+        chunk = max(1, -(-len(passwords) // self.workers))
+        chunks = [passwords[i:i + chunk] for i in range(0, len(passwords), chunk)]
+        hashed = []
+        for part in pool.map(_hash_passwords, chunks, [self.bcrypt_rounds] * len(chunks)):
+            hashed.extend(part)
+        return hashed
+
+    def _insert(self, records: List[Dict[str, Any]], to_create: List[tuple]):
+        """One executemany per batch; on a conflict (a concurrent signup) fall back to row-by-row"""
+        try:
+            self.db.execute(insert(User), records)
+            self.db.commit()
+            return [(item, "created", None) for item in to_create]
+        except IntegrityError:
+            self.db.rollback()
+            logging.warning("Bulk user insert hit a conflict; retrying the batch row by row")
+
+        outcomes = []
+        for record, item in zip(records, to_create):
+            try:
+                self.db.execute(insert(User), [record])
+                self.db.commit()
+                outcomes.append((item, "created", None))
+            except IntegrityError:
+                self.db.rollback()
+                outcomes.append((item, "duplicate", "User with this email already exists"))
+        return outcomes
@@ -7,7 +7,8 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 import os
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below min_rounds (e.g. from a bulk import) are re-hashed on the next successful login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__min_rounds=12)
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable not set. Please set it in your .env file.")
@@ -49,8 +50,14 @@ class UserService:
         login_email = user_data.email or user_data.username
         user = self.db.query(User).filter(User.email == login_email).first()
 
-        if not user or not pwd_context.verify(user_data.password, user.hashed_password):
+        if not user or not user.hashed_password:
             raise ValueError("Incorrect email or password")
+        verified, new_hash = pwd_context.verify_and_update(user_data.password, user.hashed_password)
+        if not verified:
+            raise ValueError("Incorrect email or password")
+        if new_hash:
+            user.hashed_password = new_hash
+            self.db.commit()
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = self.create_access_token(
             data={"sub": user.email}, expires_delta=access_token_expires
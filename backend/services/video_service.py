@@ -0,0 +1,299 @@
+"""YouTube video recommendations for careers and skills.
+
+Lookups go through a persistent TTL cache (``VideoCache`` rows keyed by the
+normalized career or canonical skill name), so repeated requests and other
+workers share results and API quota. On a miss, the topic searches run
+concurrently and the details of every video they found (duration, view and
+like counts) are fetched in one ``videos.list`` call per 50 ids. A career's
+list is composed from its own search plus its top required skills, so skill
+results are reused across careers.
+
+``YOUTUBE_API_ENDPOINT`` points the client at another server, e.g. a local
+stub of the Data API for tests.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+import logging
+import os
+import re
+import threading
+import time
+
+from database import SessionLocal
+from models import VideoCache
+from schemas import CareerRecommendationResponse
+from services.career_catalog import find_career
+from services.skill_normalizer import normalize_text, skill_index
+
+# videos.list accepts at most 50 ids per call
+MAX_IDS_PER_CALL = 50
+EDUCATION_CATEGORY_ID = "27"
+CAREER_SKILL_TOPICS = 3  # Required skills (highest level first) searched alongside a career
+
+
+class YouTubeClient:
+    """Thin wrapper over the YouTube Data API v3 client"""
+
+    def __init__(self, api_key: str, endpoint: str | None = None):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        # httplib2 connections are not thread-safe, so each search thread gets its own service
+        self._local = threading.local()
+
+    def _service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            from googleapiclient.discovery import build
+            client_options = {"api_endpoint": self.endpoint} if self.endpoint else None
+            service = build(
+                "youtube", "v3", developerKey=self.api_key, cache_discovery=False,
+                static_discovery=True, client_options=client_options
+            )
+            self._local.service = service
+        return service
+
+    def search_ids(self, query: str, max_results: int) -> List[str]:
+        response = self._service().search().list(
+            part="id", q=query, type="video", maxResults=max_results,
+            videoEmbeddable="true", safeSearch="strict"
+        ).execute()
+        return [item["id"]["videoId"] for item in response.get("items", []) if item.get("id", {}).get("videoId")]
+
+    def video_details(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        details = {}
+        for start in range(0, len(video_ids), MAX_IDS_PER_CALL):
+            response = self._service().videos().list(
+                part="snippet,contentDetails,statistics",
+                id=",".join(video_ids[start:start + MAX_IDS_PER_CALL]),
+                maxResults=MAX_IDS_PER_CALL
+            ).execute()
+            for item in response.get("items", []):
+                details[item["id"]] = item
+        return details
+
+    def most_popular(self, max_results: int, category_id: str, region: str) -> List[Dict[str, Any]]:
+        response = self._service().videos().list(
+            part="snippet,contentDetails,statistics", chart="mostPopular",
+            videoCategoryId=category_id, regionCode=region, maxResults=max_results
+        ).execute()
+        return response.get("items", [])
+
+
+@lru_cache(maxsize=1)
+def get_youtube_client() -> YouTubeClient | None:
+    api_key = os.getenv("YOUTUBE_API_KEY")
+    if not api_key:
+        logging.info("YOUTUBE_API_KEY is not set; video recommendations are served from cache only")
+        return None
+    return YouTubeClient(api_key, os.getenv("YOUTUBE_API_ENDPOINT") or None)
+
+
+class VideoService:
+    def __init__(self, db: Session, client: YouTubeClient | None = None):
+        self.db = db
+        self.client = client or get_youtube_client()
+        self.ttl = float(os.getenv("VIDEO_CACHE_TTL_HOURS", "24")) * 3600
+        self.results_per_topic = int(os.getenv("VIDEO_RESULTS_PER_TOPIC", "5"))
+        self.search_concurrency = int(os.getenv("VIDEO_SEARCH_CONCURRENCY", "4"))
+
+    def career_videos(self, title: str) -> List[Dict[str, Any]]:
+        topics = _career_topics(title)
+        return _compose(topics, self._resolve(topics))
+
+    def skill_videos(self, name: str) -> List[Dict[str, Any]]:
+        topics = [_skill_topic(name)]
+        return _compose(topics, self._resolve(topics))
+
+    def trending_videos(self) -> List[Dict[str, Any]]:
+        key = "trending"
+        cached = self._load([key])
+        if key in cached and cached[key][1] > time.time():
+            return cached[key][0]
+        if self.client is None:
+            return cached.get(key, ([], 0))[0]
+        try:
+            items = self.client.most_popular(
+                self.results_per_topic * 2, EDUCATION_CATEGORY_ID, os.getenv("VIDEO_REGION", "US")
+            )
+        except Exception as e:
+            logging.error(f"Trending video lookup failed: {e}")
+            return cached.get(key, ([], 0))[0]
+        videos = [_to_video(item, None, "trending") for item in items]
+        self._store({key: videos})
+        return videos
+
+    def attach_cached(self, recommendations: List[CareerRecommendationResponse]) -> List[str]:
+        """Fill ``video_recommendations`` from the cache only (one query, no API calls).
+
+        Returns the career titles that had nothing cached, for a background warm-up.
+        """
+        per_response = [
+            [career.get("title") for career in (rec.recommended_careers or [])[:3] if isinstance(career, dict) and career.get("title")]
+            for rec in recommendations
+        ]
+        topics_by_title = {title: _career_topics(title) for titles in per_response for title in titles}
+        cached = self._load([key for topics in topics_by_title.values() for key, _, _ in topics])
+        found = {key: videos for key, (videos, _) in cached.items()}
+
+        missing = []
+        for rec, titles in zip(recommendations, per_response):
+            videos = []
+            for title in titles:
+                topics = topics_by_title[title]
+                if not all(key in cached and cached[key][1] > time.time() for key, _, _ in topics):
+                    missing.append(title)
+                videos.extend(_compose(topics, found)[:self.results_per_topic])
+            rec.video_recommendations = videos or None
+        return list(dict.fromkeys(missing)) if self.client is not None else []
+
+    def warm_careers(self, titles: List[str]) -> None:
+        """Resolve every topic of several careers in one batch (shared searches and detail lookups)"""
+        topics = list({key: (key, query, tag) for title in titles for key, query, tag in _career_topics(title)}.values())
+        self._resolve(topics)
+
+    def _resolve(self, topics: List[Tuple[str, str, str]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Videos per topic key: fresh cache hits as they are, misses searched concurrently with one batched detail lookup"""
+        cached = self._load([key for key, _, _ in topics])
+        now = time.time()
+        results = {key: videos for key, (videos, expires_at) in cached.items() if expires_at > now}
+        misses = [(key, query, tag) for key, query, tag in topics if key not in results]
+        if not misses or self.client is None:
+            # Without an API key, expired entries are better than nothing
+            return {**{key: videos for key, (videos, _) in cached.items()}, **results}
+
+        def search(query: str):
+            try:
+                return self.client.search_ids(query, self.results_per_topic)
+            except Exception as e:
+                logging.error(f"Video search failed for '{query}': {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.search_concurrency, len(misses)))) as pool:
+            found_ids = list(pool.map(search, [query for _, query, _ in misses]))
+
+        all_ids = list(dict.fromkeys(video_id for ids in found_ids if ids for video_id in ids))
+        try:
+            details = self.client.video_details(all_ids) if all_ids else {}
+        except Exception as e:
+            logging.error(f"Video detail lookup failed for {len(all_ids)} videos: {e}")
+            details = None
+
+        fresh = {}
+        for (key, _, tag), ids in zip(misses, found_ids):
+            if ids is None or details is None:
+                if key in cached:
+                    results[key] = cached[key][0]
+                continue
+            category = "career" if key.startswith("career:") else "skill"
+            skill = tag if category == "skill" else None
+            fresh[key] = [_to_video(details[video_id], skill, category) for video_id in ids if video_id in details]
+        if fresh:
+            self._store(fresh)
+        results.update(fresh)
+        return results
+
+    def _load(self, keys: List[str]) -> Dict[str, Tuple[List[Dict[str, Any]], float]]:
+        if not keys:
+            return {}
+        rows = self.db.execute(
+            select(VideoCache.cache_key, VideoCache.videos, VideoCache.expires_at).where(VideoCache.cache_key.in_(set(keys)))
+        ).all()
+        return {key: (videos or [], expires_at) for key, videos, expires_at in rows}
+
+    def _store(self, entries: Dict[str, List[Dict[str, Any]]]) -> None:
+        expires_at = time.time() + self.ttl
+        for key, videos in entries.items():
+            result = self.db.execute(
+                update(VideoCache).where(VideoCache.cache_key == key).values(videos=videos, expires_at=expires_at)
+            )
+            if result.rowcount:
+                continue
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(VideoCache).values(cache_key=key, videos=videos, expires_at=expires_at))
+            except IntegrityError:
+                # Another worker cached the same topic first; its result is just as good
+                pass
+        self.db.commit()
+
+
+def warm_career_videos(titles: List[str]) -> None:
+    """Background task: fill the cache for careers shown without videos"""
+    db = SessionLocal()
+    try:
+        VideoService(db).warm_careers(titles)
+    except Exception as e:
+        logging.error(f"Video cache warm-up failed for {titles}: {e}")
+    finally:
+        db.close()
+
+
+def _cache_key(kind: str, name: str) -> str:
+    return f"{kind}:{normalize_text(name)}"[:255]
+
+
+def _skill_topic(name: str) -> Tuple[str, str, str]:
+    skill = skill_index.resolve(name)
+    return _cache_key("skill", skill), f"{skill} tutorial", skill
+
+
+def _career_topics(title: str) -> List[Tuple[str, str, str]]:
+    """(cache key, search query, tag) for the career itself and its top required skills"""
+    career = find_career(title)
+    name = career["title"] if career else title.strip()
+    topics = [(_cache_key("career", name), f"{name} career overview", name)]
+    if career:
+        skills = sorted(career["required_skills"].items(), key=lambda item: item[1], reverse=True)
+        topics += [_skill_topic(skill) for skill, _ in skills[:CAREER_SKILL_TOPICS]]
+    return topics
+
+
+def _compose(topics: List[Tuple[str, str, str]], videos_by_key: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Interleave the topics' lists (best result of each topic first), dropping repeats"""
+    lists = [videos_by_key.get(key, []) for key, _, _ in topics]
+    composed, seen = [], set()
+    for rank in range(max((len(videos) for videos in lists), default=0)):
+        for videos in lists:
+            if rank < len(videos) and videos[rank]["video_id"] not in seen:
+                seen.add(videos[rank]["video_id"])
+                composed.append(videos[rank])
+    return composed
+
+
+def _to_video(item: Dict[str, Any], skill: str | None, category: str) -> Dict[str, Any]:
+    """API resource -> ``schemas.VideoRecommendation`` fields"""
+    snippet = item.get("snippet", {})
+    statistics = item.get("statistics", {})
+    thumbnails = snippet.get("thumbnails", {})
+    thumbnail = next((thumbnails[size]["url"] for size in ("high", "medium", "default") if size in thumbnails), "")
+    return {
+        "video_id": item["id"],
+        "title": snippet.get("title", ""),
+        "description": (snippet.get("description") or "")[:500],
+        "thumbnail": thumbnail,
+        "channel_title": snippet.get("channelTitle", ""),
+        "published_at": snippet.get("publishedAt", ""),
+        "url": f"https://www.youtube.com/watch?v={item['id']}",
+        "duration": _format_duration(item.get("contentDetails", {}).get("duration", "")),
+        "view_count": int(statistics.get("viewCount", 0)),
+        "like_count": int(statistics.get("likeCount", 0)),
+        "skill": skill,
+        "category": category,
+    }
+
+
+_duration_pattern = re.compile(r"^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$")
+
+
+def _format_duration(iso_duration: str) -> str:
+    """ISO 8601 duration (PT1H2M3S) -> 1:02:03"""
+    match = _duration_pattern.match(iso_duration or "")
+    if not match or not iso_duration:
+        return ""
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    hours += days * 24
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
@@ -0,0 +1,162 @@
+"""Per-request SQL profiling for development and staging.
+
+Enable with ``SQL_PROFILING=true``. Every statement issued while serving a
+request is recorded with its duration and the application call site that
+triggered it. At the end of the request, repeated statements of the same shape
+(the classic N+1 pattern from lazy-loaded relationships or per-entity queries)
+are logged, as are statements slower than ``SQL_SLOW_QUERY_MS``. With
+``SQL_PROFILE_HEADER=true`` a summary is also returned in ``X-SQL-Profile``.
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("sql_profiler")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "sql_request_profile", default=None
+)
+
+_literal_pattern = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_list_pattern = re.compile(r"\(\s*(?:\?|:\w+|%\(\w+\)s)(?:\s*,\s*(?:\?|:\w+|%\(\w+\)s))*\s*\)")
+_whitespace_pattern = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so queries differing only in literals/IN-list length compare equal"""
+    shape = _literal_pattern.sub("?", statement)
+    shape = _in_list_pattern.sub("(?)", shape)
+    return _whitespace_pattern.sub(" ", shape).strip()
+
+
+def _call_site() -> str:
+    """First stack frame inside the application (outside SQLAlchemy and this module)"""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        if frame.filename.startswith("<"):
+            continue  # Code generated at runtime, e.g. SQLAlchemy's decorator wrappers
+        filename = os.path.abspath(frame.filename)
+        if (
+            filename.startswith(BACKEND_DIR)
+            and "site-packages" not in filename
+            and filename != os.path.abspath(__file__)
+        ):
+            return f"{os.path.relpath(filename, BACKEND_DIR)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class RequestProfile:
+    def __init__(self, label: str):
+        self.label = label
+        self.statements: List[Dict[str, object]] = []
+
+    def record(self, statement: str, duration: float, call_site: str) -> None:
+        self.statements.append({
+            "statement": statement,
+            "shape": statement_shape(statement),
+            "duration_ms": duration * 1000.0,
+            "call_site": call_site,
+        })
+
+    @property
+    def total_ms(self) -> float:
+        return sum(s["duration_ms"] for s in self.statements)
+
+    def repeated_shapes(self, threshold: int) -> Dict[str, int]:
+        counts = Counter(s["shape"] for s in self.statements)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def summary_header(self, threshold: int) -> str:
+        return (
+            f"queries={len(self.statements)}; time_ms={self.total_ms:.1f}; "
+            f"repeated_shapes={len(self.repeated_shapes(threshold))}"
+        )
+
+
+class SQLProfiler:
+    def __init__(self):
+        self.enabled = os.getenv("SQL_PROFILING", "false").lower() == "true"
+        self.slow_query_ms = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+        self.n_plus_one_threshold = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+        self.emit_header = os.getenv("SQL_PROFILE_HEADER", "false").lower() == "true"
+
+    def instrument(self, engine) -> None:
+        """Attach statement listeners to ``engine``. No-op unless profiling is enabled"""
+        if not self.enabled:
+            return
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("profiler_query_start")
+            if not starts:
+                return
+            duration = time.perf_counter() - starts.pop()
+            call_site = _call_site()
+            if duration * 1000.0 >= self.slow_query_ms:
+                logger.warning(
+                    f"Slow query ({duration * 1000.0:.1f} ms) at {call_site}: {_whitespace_pattern.sub(' ', statement)[:500]}"
+                )
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.record(statement, duration, call_site)
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(exception_context):
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("profiler_query_start"):
+                conn.info["profiler_query_start"].pop()
+
+    def report(self, profile: RequestProfile) -> None:
+        for shape, count in profile.repeated_shapes(self.n_plus_one_threshold).items():
+            sites = sorted({s["call_site"] for s in profile.statements if s["shape"] == shape})
+            logger.warning(
+                f"Possible N+1 in {profile.label}: statement ran {count} times from {', '.join(sites)}: {shape[:300]}"
+            )
+        logger.debug(f"{profile.label}: {profile.summary_header(self.n_plus_one_threshold)}")
+
+
+sql_profiler = SQLProfiler()
+
+
+class SQLProfilerMiddleware:
+    """Pure ASGI middleware that opens a statement profile for each HTTP request"""
+
+    def __init__(self, app, profiler: SQLProfiler = sql_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{scope['method']} {scope['path']}")
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.profiler.emit_header:
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"x-sql-profile",
+                    profile.summary_header(self.profiler.n_plus_one_threshold).encode("latin-1"),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            self.profiler.report(profile)
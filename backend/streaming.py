@@ -0,0 +1,195 @@
+"""Cancellable chat streaming and Server-Sent Events framing.
+
+LLM backends expose synchronous token generators. ``cancellable_stream``
+drives such a generator on a worker thread and hands chunks to the event loop
+through a queue. When the client goes away (the response task is cancelled or
+``request.is_disconnected()`` turns true) the worker closes the upstream
+generator before pulling another token, so no quota is spent on answers nobody
+will read.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from fastapi import Request
+
+from metrics import observe_stream_cancelled, observe_stream_frame, observe_time_to_first_token
+
+_DONE = object()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx and similar proxies from buffering the event stream
+    "X-Accel-Buffering": "no",
+    "Connection": "keep-alive",
+}
+
+
+class _Producer:
+    """Runs a sync generator on a worker thread, stopping as soon as ``cancel`` is set"""
+
+    def __init__(self, make_iterator: Callable[[], Iterator[str]], loop: asyncio.AbstractEventLoop):
+        self.make_iterator = make_iterator
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.cancelled = threading.Event()
+
+    def run(self) -> None:
+        iterator = self.make_iterator()
+        try:
+            for chunk in iterator:
+                if self.cancelled.is_set():
+                    break
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, chunk)
+        except BaseException as e:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, e)
+        finally:
+            # Closing the generator releases the upstream HTTP stream immediately
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            if not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, _DONE)
+
+
+async def cancellable_stream(
+    request: Request,
+    make_iterator: Callable[[], Iterator[str]],
+    poll_interval: float = 1.0,
+    pool=None,
+) -> AsyncIterator[object]:
+    """Yield chunks from ``make_iterator()``, or ``None`` every ``poll_interval`` seconds while idle.
+
+    The idle ``None`` ticks let callers emit heartbeats. The upstream generator
+    is cancelled when the consumer stops iterating or the client disconnects.
+    The generator runs on ``pool`` (a ``workloads.WorkloadPool``, admitted by
+    the caller before the response started) or the loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    producer = _Producer(make_iterator, loop)
+    if pool is not None:
+        worker = asyncio.wrap_future(pool.submit(producer.run, shed=False))
+    else:
+        worker = loop.run_in_executor(None, producer.run)
+    started = time.perf_counter()
+    first_token = True
+    finished = False
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(producer.queue.get(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield None
+                continue
+            if item is _DONE:
+                finished = True
+                break
+            if isinstance(item, BaseException):
+                finished = True
+                raise item
+            if first_token:
+                observe_time_to_first_token(time.perf_counter() - started)
+                first_token = False
+            yield item
+    finally:
+        if not finished:
+            producer.cancelled.set()
+            observe_stream_cancelled()
+        # Let the worker finish closing the upstream stream without blocking the response
+        worker.add_done_callback(lambda f: f.exception())
+
+
+def sse_event(data: dict, event: str | None = None) -> str:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_chat_events(
+    request: Request,
+    make_iterator: Callable[[], Iterator[str]],
+    heartbeat_interval: float | None = None,
+    flush_interval: float | None = None,
+    max_frame_chars: int = 2048,
+    pool=None,
+) -> AsyncIterator[str]:
+    """Server-Sent Events for a chat answer.
+
+    Tiny token chunks are coalesced into one ``token`` event per
+    ``flush_interval`` (or once ``max_frame_chars`` is buffered) to cut frames
+    and syscalls. A ``: ping`` comment is sent after ``heartbeat_interval``
+    seconds of silence so proxies keep the connection open. The stream ends
+    with a ``done`` event.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = float(os.getenv("CHAT_SSE_HEARTBEAT_SECONDS", "15"))
+    if flush_interval is None:
+        flush_interval = float(os.getenv("CHAT_SSE_FLUSH_MS", "50")) / 1000.0
+
+    buffer: list[str] = []
+    buffered_chars = 0
+    last_flush = time.perf_counter()
+    last_sent = last_flush
+
+    # Tick at the flush interval while tokens are buffered, otherwise often
+    # enough to send heartbeats on time
+    poll_interval = max(0.01, min(flush_interval or heartbeat_interval, heartbeat_interval))
+
+    yield ": stream open\n\n"
+    async for chunk in cancellable_stream(request, make_iterator, poll_interval, pool):
+        now = time.perf_counter()
+        if chunk is not None:
+            buffer.append(chunk)
+            buffered_chars += len(chunk)
+        if buffer and (buffered_chars >= max_frame_chars or now - last_flush >= flush_interval):
+            text = "".join(buffer)
+            buffer.clear()
+            buffered_chars = 0
+            last_flush = last_sent = now
+            observe_stream_frame()
+            yield sse_event({"text": text}, event="token")
+        elif chunk is None and now - last_sent >= heartbeat_interval:
+            last_sent = now
+            yield ": ping\n\n"
+
+    if buffer:
+        observe_stream_frame()
+        yield sse_event({"text": "".join(buffer)}, event="token")
+    yield sse_event({"finished": True}, event="done")
+
+
+async def sse_events(
+    request: Request,
+    make_iterator: Callable[[], Iterator[tuple]],
+    heartbeat_interval: float | None = None,
+    pool=None,
+) -> AsyncIterator[str]:
+    """Server-Sent Events for a stream of ``(event, data)`` pairs.
+
+    Every pair is sent as its own frame the moment it is produced (objects are
+    already coarse, so nothing is coalesced), with ``: ping`` heartbeats while
+    the producer is busy. An ``error`` event is sent if the producer fails.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = float(os.getenv("CHAT_SSE_HEARTBEAT_SECONDS", "15"))
+
+    yield ": stream open\n\n"
+    try:
+        async for item in cancellable_stream(request, make_iterator, heartbeat_interval, pool):
+            if item is None:
+                yield ": ping\n\n"
+                continue
+            event, data = item
+            observe_stream_frame()
+            yield sse_event(data, event=event)
+    except Exception as e:
+        logging.error(f"Event stream failed: {e}")
+        yield sse_event({"detail": "Generation failed"}, event="error")
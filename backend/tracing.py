@@ -0,0 +1,314 @@
+"""Per-request phase timing: ``Server-Timing`` header and sampled trace spans.
+
+``TracingMiddleware`` opens a ``Trace`` for every HTTP request. Spans are
+recorded for the phases a slow request is usually stuck in:
+
+- ``auth``: ``get_current_user`` (token verification and the user lookup)
+- ``db``: every SQL statement (engine events, see ``instrument``)
+- ``llm``: every model call (reported by ``metrics.observe_llm_call``)
+- ``endpoint`` / ``serialize``: the route function, then response-model
+  validation and JSON encoding (``TracedRoute``)
+
+Totals per phase go out in ``Server-Timing``. A sample of traces
+(``TRACE_SAMPLE_RATE``, plus every request slower than ``TRACE_SLOW_MS``) is
+written to ``TRACE_EXPORT_PATH`` as OTLP JSON, one ``ExportTraceServiceRequest``
+per line, through a queue so file I/O stays off the request path. Recording a
+span is a perf_counter read and a list append; statements issued outside a
+request are ignored.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+PHASE_KINDS = {"db": KIND_CLIENT, "llm": KIND_CLIENT}
+MAX_SPANS = 500  # Per trace; phase totals keep counting past it
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("request_trace", default=None)
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start = time.perf_counter()
+        self.start_unix_ns = time.time_ns()
+        self.end: float | None = None
+        self.status_code = 0
+        self.attributes: Dict[str, Any] = {}
+        self.spans: List[tuple] = []  # (phase, name, start, end, attributes)
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.endpoint_end: float | None = None
+
+    def add(self, phase: str, name: str, start: float, end: float, attributes: Dict[str, Any] | None = None) -> None:
+        self.totals[phase] = self.totals.get(phase, 0.0) + (end - start)
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((phase, name, start, end, attributes))
+
+    def server_timing(self, until: float) -> str:
+        entries = []
+        for phase, total in self.totals.items():
+            entry = f"{phase};dur={total * 1000:.1f}"
+            if self.counts[phase] > 1:
+                entry += f';desc="{self.counts[phase]} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={(until - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_otlp(self, service_name: str) -> Dict[str, Any]:
+        def unix_ns(moment: float) -> str:
+            return str(self.start_unix_ns + int((moment - self.start) * 1e9))
+
+        spans = [{
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": KIND_SERVER,
+            "startTimeUnixNano": unix_ns(self.start),
+            "endTimeUnixNano": unix_ns(self.end or time.perf_counter()),
+            "attributes": _otlp_attributes({**self.attributes, "http.response.status_code": self.status_code}),
+            # OTLP status: 2 = error, 0 = unset
+            "status": {"code": 2 if self.status_code >= 500 else 0},
+        }]
+        for phase, name, start, end, attributes in self.spans:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": os.urandom(8).hex(),
+                "parentSpanId": self.span_id,
+                "name": name,
+                "kind": PHASE_KINDS.get(phase, KIND_INTERNAL),
+                "startTimeUnixNano": unix_ns(start),
+                "endTimeUnixNano": unix_ns(end),
+                "attributes": _otlp_attributes({"phase": phase, **(attributes or {})}),
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+
+def _otlp_attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    attributes = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        attributes.append({"key": key, "value": typed})
+    return attributes
+
+
+def record_span(phase: str, name: str, start: float, end: float | None = None, attributes: Dict[str, Any] | None = None) -> None:
+    """Add a finished span (perf_counter times) to the current request's trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(phase, name, start, end if end is not None else time.perf_counter(), attributes)
+
+
+def traced(phase: str, name: str | None = None):
+    """Decorator recording each call of a sync or async function as a span (also works on FastAPI dependencies)"""
+    def decorator(func: Callable):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record_span(phase, span_name, start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_span(phase, span_name, start)
+        return wrapper
+    return decorator
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        self.emit_header = os.getenv("SERVER_TIMING_HEADER", "true").lower() == "true"
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+        self.slow_seconds = float(os.getenv("TRACE_SLOW_MS", "1000")) / 1000.0
+        self.service_name = os.getenv("TRACE_SERVICE_NAME", "career-guidance-api")
+        self.export_path = os.getenv("TRACE_EXPORT_PATH", "")
+        self._exporter: logging.Logger | None = None
+        self._listener: logging.handlers.QueueListener | None = None
+
+    def instrument(self, engine) -> None:
+        """Record a ``db`` span for every statement executed while a request is being traced"""
+        if not self.enabled:
+            return
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("trace_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("trace_query_start")
+            if not starts:
+                return
+            start = starts.pop()
+            if _current_trace.get() is not None:
+                operation = statement.lstrip().split(" ", 1)[0].upper() or "OTHER"
+                record_span("db", f"db {operation}", start, attributes={"db.statement": statement[:300]})
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(exception_context):
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("trace_query_start"):
+                conn.info["trace_query_start"].pop()
+
+    def export(self, trace: Trace) -> None:
+        """Queue ``trace`` for the export file when it is sampled or slow"""
+        if not self.export_path:
+            return
+        duration = (trace.end or time.perf_counter()) - trace.start
+        if duration < self.slow_seconds and random.random() >= self.sample_rate:
+            return
+        if self._exporter is None:
+            self._start_exporter()
+        self._exporter.info(json.dumps(trace.to_otlp(self.service_name), separators=(",", ":")))
+
+    def _start_exporter(self) -> None:
+        file_handler = logging.handlers.RotatingFileHandler(
+            self.export_path,
+            maxBytes=int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("TRACE_EXPORT_BACKUPS", "5")),
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.Queue = queue.Queue(-1)
+        self._listener = logging.handlers.QueueListener(records, file_handler)
+        self._listener.start()
+        exporter = logging.getLogger("tracing.export")
+        exporter.propagate = False
+        exporter.setLevel(logging.INFO)
+        exporter.addHandler(logging.handlers.QueueHandler(records))
+        self._exporter = exporter
+
+    def shutdown(self) -> None:
+        """Flush queued traces to the file"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._exporter = None
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware that opens a trace for each HTTP request"""
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+                if self.tracer.emit_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing(time.perf_counter()).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            # The error response is sent further out, by Starlette's ServerErrorMiddleware
+            trace.status_code = trace.status_code or 500
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace.end = time.perf_counter()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None)
+            if route_path:
+                # Route templates keep span names low-cardinality; the concrete path is an attribute
+                trace.name = f"{scope['method']} {route_path}"
+            trace.attributes.update({"http.request.method": scope["method"], "url.path": scope["path"]})
+            self.tracer.export(trace)
+
+
+class TracedRoute(APIRoute):
+    """Route class timing the endpoint function and, separately, response serialization"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint_end(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            response = await handler(request)
+            trace = _current_trace.get()
+            if trace is not None and trace.endpoint_end is not None:
+                record_span("serialize", "serialize response", trace.endpoint_end)
+            return response
+
+        return traced_handler
+
+
+def _mark_endpoint_end(endpoint: Callable) -> Callable:
+    """Wrap an endpoint to record an ``endpoint`` span and when it returned"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_endpoint(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _finish_endpoint(endpoint, start)
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _finish_endpoint(endpoint, start)
+    return sync_endpoint
+
+
+def _finish_endpoint(endpoint: Callable, start: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.endpoint_end = time.perf_counter()
+        trace.add("endpoint", endpoint.__name__, start, trace.endpoint_end)
@@ -0,0 +1,136 @@
+"""Separate worker pools for LLM-bound and CRUD work.
+
+Blocking calls used to share one threadpool, or ran straight on the event
+loop, so a burst of slow Gemini requests stalled cheap profile and list reads.
+LLM-bound work (aptitude scoring, recommendation generation, chat streams and
+summaries) now runs on its own bounded ``ThreadPoolExecutor``. Sync CRUD
+routes keep Starlette's default threadpool, sized by ``CRUD_THREADPOOL_SIZE``.
+
+The LLM pool admits at most ``LLM_POOL_WORKERS + LLM_POOL_QUEUE`` calls at a
+time. Anything beyond that is rejected at once with 503 and ``Retry-After``
+instead of piling up, and a queued call that has waited longer than
+``LLM_POOL_QUEUE_TIMEOUT_SECONDS`` is dropped the same way before it starts.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from anyio import to_thread
+from fastapi import HTTPException, status
+
+from metrics import observe_pool_wait
+
+
+class WorkloadPool:
+    def __init__(self, name: str, workers: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._rejected = {"saturated": 0, "queue_timeout": 0}
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return self._active + self._queued < self.workers + self.queue_size
+
+    def check_capacity(self) -> None:
+        """Raise 503 when the pool and its queue are full (for streams, before the response starts)"""
+        if not self.has_capacity():
+            self._reject("saturated")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, shed: bool = True, **kwargs: Any) -> Any:
+        """Run ``fn`` on this pool; with ``shed`` a full pool or an expired queue wait raises 503"""
+        return await asyncio.wrap_future(self.submit(fn, *args, shed=shed, **kwargs))
+
+    def submit(self, fn: Callable[..., Any], *args: Any, shed: bool = True, **kwargs: Any) -> Future:
+        with self._lock:
+            saturated = self._active + self._queued >= self.workers + self.queue_size
+            if not (saturated and shed):
+                self._queued += 1
+        if saturated and shed:
+            self._reject("saturated")
+
+        # Context (request trace, etc.) follows the call onto the worker thread
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._call, time.perf_counter(), shed, fn, *args, **kwargs)
+        future = self.executor.submit(call)
+        future.add_done_callback(self._on_cancelled)
+        return future
+
+    def _call(self, submitted: float, shed: bool, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self._queued -= 1
+            expired = shed and waited > self.queue_timeout
+            if not expired:
+                self._active += 1
+        observe_pool_wait(self.name, waited)
+        if expired:
+            self._reject("queue_timeout")
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _on_cancelled(self, future: Future) -> None:
+        # A call cancelled while still queued never reaches _call
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _reject(self, reason: str) -> None:
+        with self._lock:
+            self._rejected[reason] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is busy, please retry shortly",
+            headers={"Retry-After": str(max(1, int(self.queue_timeout)))},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queued": self._queued,
+                "rejected": dict(self._rejected),
+            }
+
+
+llm_pool = WorkloadPool(
+    "llm",
+    workers=int(os.getenv("LLM_POOL_WORKERS", "8")),
+    queue_size=int(os.getenv("LLM_POOL_QUEUE", "16")),
+    queue_timeout=float(os.getenv("LLM_POOL_QUEUE_TIMEOUT_SECONDS", "10")),
+)
+
+_crud_limiter = None
+
+
+def configure_crud_pool() -> None:
+    """Size Starlette's default threadpool (sync routes, dependencies, background tasks); call inside the event loop"""
+    global _crud_limiter
+    _crud_limiter = to_thread.current_default_thread_limiter()
+    _crud_limiter.total_tokens = int(os.getenv("CRUD_THREADPOOL_SIZE", "40"))
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {"llm": llm_pool.stats()}
+    if _crud_limiter is not None:
+        stats["crud"] = {
+            "workers": _crud_limiter.total_tokens,
+            "active": _crud_limiter.borrowed_tokens,
+            "queued": _crud_limiter.statistics().tasks_waiting,
+            "rejected": {},
+        }
+    return stats